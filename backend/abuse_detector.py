@@ -1,12 +1,116 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Any
 import re
-from collections import defaultdict
+from collections import OrderedDict, deque
+import itertools
 import logging
+import threading
 import os
+import sys
 
 logger = logging.getLogger(__name__)
 
+HISTORY_WINDOW = 24 * 3600  # seconds of per-IP request counts kept for analytics
+RECENT_ACTIVITY = 10  # requests kept per IP for get_ip_analytics
+ABUSE_SCORE_HALF_LIFE = float(os.environ.get('ABUSE_SCORE_HALF_LIFE', '3600'))  # seconds, 0 disables decay
+ABUSE_MAX_TRACKED_IPS = max(1, int(os.environ.get('ABUSE_MAX_TRACKED_IPS', '100000')))  # at least the IP being checked
+ABUSE_EVICTION_SAMPLE = 8  # least recently seen IPs compared when one has to go
+
+
+def _now() -> float:
+    # Same clock as the naive UTC ISO timestamps requests carry, parsed with fromisoformat
+    return datetime.utcnow().timestamp()
+
+
+def _expire(timestamps: deque, cutoff: float):
+    while timestamps and timestamps[0] <= cutoff:
+        timestamps.popleft()
+
+
+class IPActivity:
+    """One IP's abuse score and recent requests, as sliding windows of numeric timestamps.
+
+    Each detector keeps only the timestamps its window needs and drops expired
+    ones from the front as new requests arrive, so a check costs amortized O(1)
+    however busy the IP is. The 24h request count is kept in per-minute buckets
+    and recent activity as tuples, so an IP costs a bounded amount of memory.
+    The score decays exponentially with the configured half-life.
+    """
+
+    __slots__ = ('score', 'score_at', 'request_buckets', 'request_count', 'rapid', 'errors',
+                 'domain_requests', 'domain_counts', 'recent')
+
+    def __init__(self, now: float):
+        self.score = 0.0
+        self.score_at = now
+        self.request_buckets = deque()  # [minute, count] over HISTORY_WINDOW
+        self.request_count = 0
+        self.rapid = deque()  # requests in the rapid_requests window
+        self.errors = None  # failed requests in the error_spam window, from the first failure on
+        self.domain_requests = deque()  # (timestamp, domain) in the repeated_domains window
+        self.domain_counts: Dict[str, int] = {}
+        self.recent = deque(maxlen=RECENT_ACTIVITY)  # (timestamp, domain, score, flags, error)
+
+    def current_score(self, now: float, half_life: float) -> float:
+        if half_life <= 0 or now <= self.score_at or not self.score:
+            return self.score
+        return self.score * 0.5 ** ((now - self.score_at) / half_life)
+
+    def add_score(self, score: float, now: float, half_life: float) -> float:
+        self.score = self.current_score(now, half_life) + score
+        self.score_at = max(now, self.score_at)
+        return self.score
+
+    def expire_requests(self, now: float):
+        cutoff = (now - HISTORY_WINDOW) // 60
+        buckets = self.request_buckets
+        while buckets and buckets[0][0] <= cutoff:
+            self.request_count -= buckets.popleft()[1]
+
+    def expire(self, now: float, windows: Dict[str, float]):
+        self.expire_requests(now)
+        _expire(self.rapid, now - windows['rapid_requests'])
+        if self.errors:
+            _expire(self.errors, now - windows['error_spam'])
+        cutoff = now - windows['repeated_domains']
+        domain_requests = self.domain_requests
+        while domain_requests and domain_requests[0][0] <= cutoff:
+            domain = domain_requests.popleft()[1]
+            count = self.domain_counts[domain] - 1
+            if count:
+                self.domain_counts[domain] = count
+            else:
+                del self.domain_counts[domain]
+
+    def record(self, now: float, domain: str, error: bool, activity: tuple):
+        minute = now // 60
+        if self.request_buckets and self.request_buckets[-1][0] == minute:
+            self.request_buckets[-1][1] += 1
+        else:
+            self.request_buckets.append([minute, 1])
+        self.request_count += 1
+        self.rapid.append(now)
+        if error:
+            if self.errors is None:
+                self.errors = deque()
+            self.errors.append(now)
+        self.domain_requests.append((now, domain))
+        self.domain_counts[domain] = self.domain_counts.get(domain, 0) + 1
+        self.recent.append(activity)
+
+    def memory_size(self) -> int:
+        """Approximate bytes held by this record (containers and their entries, not shared strings)"""
+        size = sys.getsizeof(self)
+        for container in (self.request_buckets, self.rapid, self.errors, self.domain_requests,
+                          self.domain_counts, self.recent):
+            size += sys.getsizeof(container)
+        size += sum(sys.getsizeof(bucket) for bucket in self.request_buckets)
+        size += sum(sys.getsizeof(entry) for entry in self.domain_requests)
+        size += sum(sys.getsizeof(entry) for entry in self.recent)
+        size += sys.getsizeof(0.0) * (len(self.rapid) + len(self.errors or ()) + len(self.domain_requests))
+        return size
+
+
 class AbuseDetector:
     def __init__(self):
         # Get environment to adjust sensitivity
@@ -84,115 +188,103 @@ class AbuseDetector:
                 }
             }
         
-        self.ip_scores = defaultdict(int)
-        self.ip_history = defaultdict(list)
+        self.windows = {name: self.suspicious_patterns[name]['window']
+                        for name in ('rapid_requests', 'repeated_domains', 'error_spam')}
+        self.score_half_life = ABUSE_SCORE_HALF_LIFE
+        self.max_tracked_ips = ABUSE_MAX_TRACKED_IPS
+        # Least recently seen first; when full, the lowest-scoring of the oldest few is dropped
+        self.ip_activity: 'OrderedDict[str, IPActivity]' = OrderedDict()
+        self.evictions = 0
+        self.lock = threading.Lock()
     
     def clear_all_blocks(self):
         """Clear all IP scores and history - for production emergencies"""
-        self.ip_scores.clear()
-        self.ip_history.clear()
+        with self.lock:
+            self.ip_activity.clear()
         logger.warning("All abuse detection data cleared - production emergency")
     
     def reset_ip_score(self, ip: str):
         """Reset score for a specific IP"""
-        if ip in self.ip_scores:
-            del self.ip_scores[ip]
-        if ip in self.ip_history:
-            del self.ip_history[ip]
+        with self.lock:
+            self.ip_activity.pop(ip, None)
         logger.info(f"Reset abuse detection data for IP {ip}")
     
+    def _evict(self, now: float):
+        """Drop the least risky of the least recently seen IPs"""
+        oldest = itertools.islice(self.ip_activity.items(), ABUSE_EVICTION_SAMPLE)
+        ip = min(oldest, key=lambda item: item[1].current_score(now, self.score_half_life))[0]
+        del self.ip_activity[ip]
+        self.evictions += 1
+    
     def analyze_request(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze request for suspicious behavior"""
         ip = request_data['ip']
+        domain = request_data['domain']
+        error = request_data.get('error')
+        now = datetime.fromisoformat(request_data['timestamp']).timestamp()
         score = 0
         flags = []
         
-        # Check rapid requests
-        if self._check_rapid_requests(ip, request_data['timestamp']):
-            score += self.suspicious_patterns['rapid_requests']['score']
-            flags.append('rapid_requests')
-        
-        # Check repeated domains
-        if self._check_repeated_domains(ip, request_data['domain'], request_data['timestamp']):
-            score += self.suspicious_patterns['repeated_domains']['score']
-            flags.append('repeated_domains')
-        
-        # Check error spam
-        if request_data.get('error') and self._check_error_spam(ip, request_data['timestamp']):
-            score += self.suspicious_patterns['error_spam']['score']
-            flags.append('error_spam')
-        
-        # Check suspicious user agent
-        if self._check_suspicious_user_agent(request_data['user_agent']):
-            score += self.suspicious_patterns['suspicious_user_agents']['score']
-            flags.append('suspicious_user_agent')
-        
-        # Check invalid domains
-        if self._check_invalid_domain(request_data['domain']):
-            score += self.suspicious_patterns['invalid_domains']['score']
-            flags.append('invalid_domain')
-        
-        # Update IP score
-        self.ip_scores[ip] += score
-        
-        # Store request in history
-        self.ip_history[ip].append({
-            'timestamp': request_data['timestamp'],
-            'domain': request_data['domain'],
-            'score': score,
-            'flags': flags,
-            'error': request_data.get('error')
-        })
-        
-        # Clean old history
-        self._clean_old_history(ip)
+        with self.lock:
+            activity = self.ip_activity.get(ip)
+            if activity is None:
+                while len(self.ip_activity) >= self.max_tracked_ips:
+                    self._evict(now)
+                activity = self.ip_activity[ip] = IPActivity(now)
+            else:
+                self.ip_activity.move_to_end(ip)
+            activity.expire(now, self.windows)
+            
+            # Check rapid requests
+            if self._check_rapid_requests(activity):
+                score += self.suspicious_patterns['rapid_requests']['score']
+                flags.append('rapid_requests')
+            
+            # Check repeated domains
+            if self._check_repeated_domains(activity, domain):
+                score += self.suspicious_patterns['repeated_domains']['score']
+                flags.append('repeated_domains')
+            
+            # Check error spam
+            if error and self._check_error_spam(activity):
+                score += self.suspicious_patterns['error_spam']['score']
+                flags.append('error_spam')
+            
+            # Check suspicious user agent
+            if self._check_suspicious_user_agent(request_data['user_agent']):
+                score += self.suspicious_patterns['suspicious_user_agents']['score']
+                flags.append('suspicious_user_agent')
+            
+            # Check invalid domains
+            if self._check_invalid_domain(domain):
+                score += self.suspicious_patterns['invalid_domains']['score']
+                flags.append('invalid_domain')
+            
+            # Update IP score (decayed since its last update)
+            total_score = round(activity.add_score(score, now, self.score_half_life), 2)
+            
+            # Store request in history
+            activity.record(now, domain, bool(error), (request_data['timestamp'], domain, score, tuple(flags), error))
         
         return {
             'score': score,
-            'total_score': self.ip_scores[ip],
+            'total_score': total_score,
             'flags': flags,
-            'risk_level': self._get_risk_level(self.ip_scores[ip]),
-            'action_required': self._should_take_action(self.ip_scores[ip])
+            'risk_level': self._get_risk_level(total_score),
+            'action_required': self._should_take_action(total_score)
         }
     
-    def _check_rapid_requests(self, ip: str, timestamp: str) -> bool:
+    def _check_rapid_requests(self, activity: IPActivity) -> bool:
         """Check for rapid request patterns"""
-        window = self.suspicious_patterns['rapid_requests']['window']
-        threshold = self.suspicious_patterns['rapid_requests']['threshold']
-        
-        cutoff = datetime.fromisoformat(timestamp) - timedelta(seconds=window)
-        recent_requests = [
-            req for req in self.ip_history[ip]
-            if datetime.fromisoformat(req['timestamp']) > cutoff
-        ]
-        
-        return len(recent_requests) > threshold
+        return len(activity.rapid) > self.suspicious_patterns['rapid_requests']['threshold']
     
-    def _check_repeated_domains(self, ip: str, domain: str, timestamp: str) -> bool:
+    def _check_repeated_domains(self, activity: IPActivity, domain: str) -> bool:
         """Check for repeated domain requests"""
-        window = self.suspicious_patterns['repeated_domains']['window']
-        threshold = self.suspicious_patterns['repeated_domains']['threshold']
-        
-        cutoff = datetime.fromisoformat(timestamp) - timedelta(seconds=window)
-        recent_requests = [
-            req for req in self.ip_history[ip]
-            if datetime.fromisoformat(req['timestamp']) > cutoff and req['domain'] == domain
-        ]
-        
-        return len(recent_requests) > threshold
+        return activity.domain_counts.get(domain, 0) > self.suspicious_patterns['repeated_domains']['threshold']
     
-    def _check_error_spam(self, ip: str, timestamp: str) -> bool:
+    def _check_error_spam(self, activity: IPActivity) -> bool:
         """Check for consecutive error patterns"""
-        window = self.suspicious_patterns['error_spam']['window']
-        threshold = self.suspicious_patterns['error_spam']['threshold']
-        
-        cutoff = datetime.fromisoformat(timestamp) - timedelta(seconds=window)
-        recent_errors = [
-            req for req in self.ip_history[ip]
-            if datetime.fromisoformat(req['timestamp']) > cutoff and req.get('error')
-        ]
-        
-        return len(recent_errors) > threshold
+        return len(activity.errors or ()) > self.suspicious_patterns['error_spam']['threshold']
     
     def _check_suspicious_user_agent(self, user_agent: str) -> bool:
         """Check for suspicious user agent patterns"""
@@ -225,42 +317,68 @@ class AbuseDetector:
         """Determine if action should be taken"""
         return score >= 30  # Take action for high/critical risk
     
-    def _clean_old_history(self, ip: str):
-        """Clean old request history"""
-        cutoff = datetime.utcnow() - timedelta(hours=24)
-        self.ip_history[ip] = [
-            req for req in self.ip_history[ip]
-            if datetime.fromisoformat(req['timestamp']) > cutoff
-        ]
-    
     def get_ip_analytics(self, ip: str) -> Dict[str, Any]:
         """Get analytics for a specific IP"""
-        if ip not in self.ip_history:
-            return {
-                'total_requests': 0,
-                'total_score': 0,
-                'risk_level': 'normal',
-                'recent_activity': []
-            }
-        
-        history = self.ip_history[ip]
-        total_score = self.ip_scores.get(ip, 0)
+        now = _now()
+        with self.lock:
+            activity = self.ip_activity.get(ip)
+            if activity is None:
+                return {
+                    'total_requests': 0,
+                    'total_score': 0,
+                    'risk_level': 'normal',
+                    'recent_activity': []
+                }
+            activity.expire_requests(now)
+            total_requests = activity.request_count
+            recent = list(activity.recent)[-total_requests:] if total_requests else []
+            total_score = round(activity.current_score(now, self.score_half_life), 2)
         
         # Get recent activity (last 10 requests)
-        recent_activity = sorted(history, key=lambda x: x['timestamp'], reverse=True)[:10]
+        recent_activity = [
+            {'timestamp': timestamp, 'domain': domain, 'score': score, 'flags': list(flags), 'error': error}
+            for timestamp, domain, score, flags, error in sorted(recent, key=lambda x: x[0], reverse=True)
+        ]
         
         return {
-            'total_requests': len(history),
+            'total_requests': total_requests,
             'total_score': total_score,
             'risk_level': self._get_risk_level(total_score),
             'recent_activity': recent_activity
         }
     
-    def get_ip_score(self, ip: str) -> int:
-        """Get current abuse score for an IP"""
-        return self.ip_scores.get(ip, 0)
+    def get_ip_score(self, ip: str) -> float:
+        """Get current (decayed) abuse score for an IP"""
+        activity = self.ip_activity.get(ip)
+        if activity is None:
+            return 0
+        return round(activity.current_score(_now(), self.score_half_life), 2)
     
     def get_risk_level(self, ip: str) -> str:
         """Get risk level for an IP"""
         score = self.get_ip_score(ip)
         return self._get_risk_level(score)
+    
+    def get_stats(self, sample_size: int = 256) -> Dict[str, Any]:
+        """Tracked IPs, evictions and an estimate of the memory they hold (from a sample of IPs)"""
+        now = _now()
+        with self.lock:
+            tracked = len(self.ip_activity)
+            sample = list(itertools.islice(reversed(self.ip_activity.items()), sample_size))
+            table_bytes = sys.getsizeof(self.ip_activity)
+            evictions = self.evictions
+            # Sized under the lock: analyze_request appends to these records' deques
+            per_ip = (sum(activity.memory_size() + sys.getsizeof(ip) for ip, activity in sample) / len(sample)
+                      if sample else 0)
+            at_risk = sum(1 for _, activity in sample
+                          if self._should_take_action(activity.current_score(now, self.score_half_life)))
+        return {
+            'tracked_ips': tracked,
+            'max_tracked_ips': self.max_tracked_ips,
+            'evictions': evictions,
+            'score_half_life': self.score_half_life,
+            'estimated_memory_bytes': int(table_bytes + per_ip * tracked),
+            'bytes_per_ip': int(per_ip),
+            'sampled_ips': len(sample),
+            'sampled_ips_over_action_threshold': at_risk
+        }
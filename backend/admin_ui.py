@@ -1,6 +1,5 @@
 from flask import Flask, render_template_string, request, jsonify, redirect, url_for
 import os
-import requests
 from datetime import datetime
 
 # Simple admin UI templates
@@ -515,7 +514,7 @@ IP_MANAGEMENT_TEMPLATE = """
             <div class="ip-section">
                 <h2>⭐ Premium IPs</h2>
                 <div id="premium-ips">
-                    <p>Premium IPs are configured via environment variables (PREMIUM_IPS)</p>
+                    <p>Premium IPs are configured via PREMIUM_IPS or the API key registry file (API_KEYS_FILE)</p>
                     <div id="premium-ips-list"></div>
                 </div>
             </div>
@@ -523,7 +522,7 @@ IP_MANAGEMENT_TEMPLATE = """
             <div class="ip-section">
                 <h2>🔑 API Keys</h2>
                 <div id="api-keys">
-                    <p>Valid API keys are configured via environment variables (VALID_API_KEYS)</p>
+                    <p>API keys are configured via VALID_API_KEYS, API_KEYS_FILE or the API_KEYS_COLLECTION Firestore collection</p>
                     <div id="api-keys-list"></div>
                 </div>
             </div>
@@ -786,93 +785,103 @@ IP_MANAGEMENT_TEMPLATE = """
 </html>
 """
 
-def create_admin_ui_routes(app):
-    """Create admin UI routes"""
-    
-    @app.route('/admin/ui/login')
-    def admin_ui_login():
-        """Admin login page"""
-        error = request.args.get('error')
-        return render_template_string(ADMIN_LOGIN_TEMPLATE, error=error)
+def admin_ui_login():
+    """Admin login page"""
+    error = request.args.get('error')
+    return render_template_string(ADMIN_LOGIN_TEMPLATE, error=error)
+
+
+def admin_ui_dashboard():
+    """Admin dashboard page"""
+    # Get real blocked IP count
+    try:
+        from ip_blocker import IPBlocker
+        ip_blocker = IPBlocker()
+        blocked_ips = ip_blocker.get_blocked_ips()
+        blocked_ips_count = len(blocked_ips)
+    except:
+        blocked_ips_count = 0
     
-    @app.route('/admin/ui/dashboard')
-    def admin_ui_dashboard():
-        """Admin dashboard page"""
-        # Get real blocked IP count
-        try:
-            from ip_blocker import IPBlocker
-            ip_blocker = IPBlocker()
-            blocked_ips = ip_blocker.get_blocked_ips()
-            blocked_ips_count = len(blocked_ips)
-        except:
-            blocked_ips_count = 0
-        
-        user = {
-            'name': 'Admin User',
-            'email': 'admin@astraverify.com',
-            'role': 'super_admin'
-        }
-        stats = {
-            'total_domains': 150,
-            'active_selectors': 45,
-            'today_scans': 23,
-            'blocked_ips': blocked_ips_count
+    user = {
+        'name': 'Admin User',
+        'email': 'admin@astraverify.com',
+        'role': 'super_admin'
+    }
+    stats = {
+        'total_domains': 150,
+        'active_selectors': 45,
+        'today_scans': 23,
+        'blocked_ips': blocked_ips_count
+    }
+    return render_template_string(ADMIN_DASHBOARD_TEMPLATE, user=user, stats=stats)
+
+
+def admin_ui_selectors(domain):
+    """DKIM selector management page"""
+    # Mock data for demonstration
+    admin_selectors = [
+        {
+            'selector': 'selector1',
+            'priority': 'high',
+            'added_by': 'admin@astraverify.com',
+            'verification_status': 'verified',
+            'notes': 'Primary DKIM selector'
+        },
+        {
+            'selector': 'selector2',
+            'priority': 'medium',
+            'added_by': 'admin@astraverify.com',
+            'verification_status': 'failed',
+            'notes': 'Backup selector'
         }
-        return render_template_string(ADMIN_DASHBOARD_TEMPLATE, user=user, stats=stats)
+    ]
     
-    @app.route('/admin/ui/selectors/<domain>')
-    def admin_ui_selectors(domain):
-        """DKIM selector management page"""
-        # Mock data for demonstration
-        admin_selectors = [
-            {
-                'selector': 'selector1',
-                'priority': 'high',
-                'added_by': 'admin@astraverify.com',
-                'verification_status': 'verified',
-                'notes': 'Primary DKIM selector'
-            },
-            {
-                'selector': 'selector2',
-                'priority': 'medium',
-                'added_by': 'admin@astraverify.com',
-                'verification_status': 'failed',
-                'notes': 'Backup selector'
-            }
-        ]
-        
-        discovered_selectors = [
-            {
-                'selector': 'google',
-                'source': 'email_analysis',
-                'usage_count': 15,
-                'verification_status': 'verified',
-                'discovery_date': '2024-01-15'
-            }
-        ]
-        
-        brute_force_selectors = {
-            'total': 276,
-            'sample': ['default', 'google', 'selector1', 'selector2', 'k1', 'dkim1', 'mailgun', 'sendgrid', 'zoho', 'yahoo']
+    discovered_selectors = [
+        {
+            'selector': 'google',
+            'source': 'email_analysis',
+            'usage_count': 15,
+            'verification_status': 'verified',
+            'discovery_date': '2024-01-15'
         }
-        
-        return render_template_string(
-            DKIM_SELECTOR_MANAGEMENT_TEMPLATE,
-            domain=domain,
-            admin_selectors=admin_selectors,
-            discovered_selectors=discovered_selectors,
-            brute_force_selectors=brute_force_selectors
-        )
+    ]
     
-    @app.route('/admin/ui/ip-management')
-    def admin_ui_ip_management():
-        """IP management page"""
-        # Mock data for demonstration
-        user = {
-            'name': 'Admin User',
-            'email': 'admin@astraverify.com',
-            'role': 'super_admin'
-        }
-        return render_template_string(IP_MANAGEMENT_TEMPLATE, user=user)
+    brute_force_selectors = {
+        'total': 276,
+        'sample': ['default', 'google', 'selector1', 'selector2', 'k1', 'dkim1', 'mailgun', 'sendgrid', 'zoho', 'yahoo']
+    }
     
+    return render_template_string(
+        DKIM_SELECTOR_MANAGEMENT_TEMPLATE,
+        domain=domain,
+        admin_selectors=admin_selectors,
+        discovered_selectors=discovered_selectors,
+        brute_force_selectors=brute_force_selectors
+    )
+
+
+def admin_ui_ip_management():
+    """IP management page"""
+    # Mock data for demonstration
+    user = {
+        'name': 'Admin User',
+        'email': 'admin@astraverify.com',
+        'role': 'super_admin'
+    }
+    return render_template_string(IP_MANAGEMENT_TEMPLATE, user=user)
+
+
+# URL rules for the admin UI pages (view function names in this module)
+ADMIN_UI_ROUTES = (
+    ('/admin/ui/login', 'admin_ui_login'),
+    ('/admin/ui/dashboard', 'admin_ui_dashboard'),
+    ('/admin/ui/selectors/<domain>', 'admin_ui_selectors'),
+    ('/admin/ui/ip-management', 'admin_ui_ip_management')
+)
+
+
+def create_admin_ui_routes(app):
+    """Create admin UI routes"""
+    for rule, view in ADMIN_UI_ROUTES:
+        app.add_url_rule(rule, view_func=globals()[view])
     return app
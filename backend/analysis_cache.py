@@ -0,0 +1,116 @@
+import os
+import time
+import logging
+import threading
+from functools import wraps
+from typing import Dict, Any, Optional, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_TTL = int(os.environ.get('ANALYSIS_CACHE_TTL', '900'))  # 15 minutes
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.environ.get('ANALYSIS_CACHE_MAX_ENTRIES', '20000'))
+
+
+def _cacheable(result: Dict[str, Any]) -> bool:
+    return not (result.get('timed_out') or result.get('lookup_error'))
+
+
+class AnalysisCache:
+    """TTL cache for per-domain DNS lookup results (mx, spf, dmarc, dkim)"""
+
+    def __init__(self, ttl: int = ANALYSIS_CACHE_TTL, max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache = {}  # (component, domain) -> (expires_at, result)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, component: str, domain: str) -> Optional[Dict[str, Any]]:
+        """Get cached result if available and not expired"""
+        key = (component, domain.lower())
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry and entry[0] > time.time():
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self.cache[key]
+            self.misses += 1
+        return None
+
+    def set(self, component: str, domain: str, result: Dict[str, Any], ttl: Optional[int] = None):
+        """Cache a result for a domain component"""
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        with self.lock:
+            self.cache[(component, domain.lower())] = (expires_at, result)
+            if len(self.cache) > self.max_entries:
+                self._evict()
+
+    def expires_in(self, domain: str, components: Iterable[str]) -> Optional[float]:
+        """Seconds until the first of a domain's components expires, None if any is missing"""
+        now = time.time()
+        remaining = None
+        with self.lock:
+            for component in components:
+                entry = self.cache.get((component, domain.lower()))
+                if not entry or entry[0] <= now:
+                    return None
+                left = entry[0] - now
+                remaining = left if remaining is None else min(remaining, left)
+        return remaining
+
+    def cached(self, component: str) -> Callable:
+        """Decorator caching a single-argument domain lookup; extra arguments other than None
+        (positional or keyword) bypass the cache.
+
+        A 'deadline' keyword is passed through without bypassing the cache. Results that
+        ran out of request time (timed_out) or whose lookup failed (lookup_error) are never
+        cached, so a transient DNS error isn't served for the whole TTL.
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(domain, *args, deadline=None, **kwargs):
+                if any(value is not None for value in (*args, *kwargs.values())):
+                    return func(domain, *args, deadline=deadline, **kwargs)
+                result = self.get(component, domain)
+                if result is None:
+                    result = func(domain, deadline=deadline)
+                    if _cacheable(result):
+                        self.set(component, domain, result)
+                return result
+
+            def refresh(domain):
+                result = func(domain)
+                if _cacheable(result):
+                    self.set(component, domain, result)
+                return result
+
+            wrapper.refresh = refresh
+            return wrapper
+        return decorator
+
+    def _evict(self):
+        """Drop expired entries, then the oldest inserted ones (caller holds the lock)"""
+        now = time.time()
+        for key in [k for k, (expires_at, _) in self.cache.items() if expires_at <= now]:
+            del self.cache[key]
+        overflow = len(self.cache) - self.max_entries
+        if overflow > 0:
+            for key in list(self.cache)[:overflow]:
+                del self.cache[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self.cache),
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
+
+# Global instance for reuse
+analysis_cache = AnalysisCache()
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import functools
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Optional, Tuple
+
+from firestore_config import firestore_manager
+
+logger = logging.getLogger(__name__)
+
+API_KEYS_FILE = os.environ.get('API_KEYS_FILE', '')  # JSON registry file, '' for none
+API_KEYS_COLLECTION = os.environ.get('API_KEYS_COLLECTION', '')  # Firestore collection, '' for none
+API_KEY_RELOAD_INTERVAL = float(os.environ.get('API_KEY_RELOAD_INTERVAL', '0'))  # seconds, 0 disables
+API_KEY_CACHE_SIZE = int(os.environ.get('API_KEY_CACHE_SIZE', '1024'))
+DEFAULT_KEY_TIER = 'authenticated'
+KEY_TIERS = frozenset(('free', 'authenticated', 'premium'))  # tiers the rate limiters define
+# Custom quota fields a key may set, and the algorithms rate_limiter implements (ALGORITHM_*)
+LIMIT_FIELDS = frozenset(('requests_per_minute', 'requests_per_hour', 'requests_per_day', 'burst'))
+LIMIT_ALGORITHMS = frozenset(('fixed_window', 'gcra'))
+
+
+def key_digest(api_key: str) -> str:
+    """SHA-256 hex digest of an API key, which is what the registry stores and loads"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+class TierResolution:
+    """The tier a request resolved to, with the key's custom quota if it has one.
+
+    key_id identifies a registered key in rate limit counters (the first 32 hex
+    digits of its digest) and is None otherwise.
+    """
+
+    __slots__ = ('tier', 'limits', 'key_id', 'name')
+
+    def __init__(self, tier: str, limits: Optional[Dict[str, Any]] = None, key_id: Optional[str] = None,
+                 name: Optional[str] = None):
+        self.tier = tier
+        self.limits = limits
+        self.key_id = key_id
+        self.name = name
+
+    def __repr__(self):
+        return f"TierResolution(tier={self.tier!r}, custom_limits={self.limits is not None}, key={self.name!r})"
+
+
+FREE = TierResolution('free')
+PREMIUM = TierResolution('premium')
+
+
+class RegistrySnapshot:
+    """One loaded version of the registry: key digests and premium IPs in hash lookups"""
+
+    __slots__ = ('keys', 'premium_ips', 'digest', 'generation', 'loaded_at', 'sources')
+
+    def __init__(self, keys: Dict[str, TierResolution], premium_ips: frozenset, generation: int, sources: Tuple):
+        self.keys = MappingProxyType(keys)
+        self.premium_ips = premium_ips
+        self.generation = generation
+        self.loaded_at = time.time()
+        self.sources = sources
+        canonical = json.dumps([sorted((digest, entry.tier, entry.name, entry.limits and dict(entry.limits))
+                                       for digest, entry in keys.items()), sorted(premium_ips)],
+                               sort_keys=True, default=str)
+        self.digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ApiKeyRegistry:
+    """API keys, their tiers and custom quotas, and premium IPs.
+
+    Sources are merged at load time: the legacy VALID_API_KEYS / PREMIUM_IPS
+    environment variables, a JSON file and a Firestore collection. Keys are stored
+    by SHA-256 digest. A reload builds a new snapshot and publishes it with one
+    reference swap, so requests never see a half-loaded registry. Resolved API keys
+    are kept in a small LRU so most requests don't even hash the key; that LRU holds
+    recently presented keys (valid or not) in process memory only, and is cleared
+    on every reload. If the file or Firestore can't be loaded at start-up, the
+    registry starts from the environment variables alone.
+
+    File format:
+        {"keys": [{"sha256": "<hex digest>", "name": "acme", "tier": "premium",
+                   "limits": {"requests_per_minute": 300}}],
+         "premium_ips": ["203.0.113.7"]}
+    Firestore documents carry the same fields as a key entry (the document id is
+    used when sha256 is missing) and are skipped when "active" is false.
+    """
+
+    def __init__(self, path: str = API_KEYS_FILE, collection: str = API_KEYS_COLLECTION,
+                 cache_size: int = API_KEY_CACHE_SIZE):
+        self.path = path
+        self.collection = collection
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        self._lookup = functools.lru_cache(maxsize=cache_size)(self._lookup_key)
+        self._watch_thread = None
+        self._watch_stop = threading.Event()
+        self.last_error = None
+
+    @property
+    def snapshot(self) -> RegistrySnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._load_lock:
+                if self._snapshot is None:
+                    try:
+                        self._snapshot = self._build_snapshot(generation=1)
+                    except Exception as e:
+                        # Serve the environment's keys rather than fail every request; a reload retries the rest
+                        self.last_error = str(e)
+                        logger.error(f"Could not load the API key registry, using VALID_API_KEYS/PREMIUM_IPS only: {e}")
+                        self._snapshot = self._build_snapshot(generation=1, external=False)
+                    logger.info(f"Loaded {len(self._snapshot.keys)} API keys and "
+                                f"{len(self._snapshot.premium_ips)} premium IPs")
+                snapshot = self._snapshot
+        return snapshot
+
+    def resolve(self, api_key: Optional[str] = None, ip: Optional[str] = None) -> TierResolution:
+        """Tier for a request: a registered API key's, else premium for premium IPs, else free"""
+        snapshot = self.snapshot
+        if api_key:
+            resolution = self._lookup(snapshot, api_key)
+            if resolution is not None:
+                return resolution
+        return PREMIUM if ip in snapshot.premium_ips else FREE
+
+    def get_tier(self, api_key: Optional[str] = None, ip: Optional[str] = None) -> str:
+        return self.resolve(api_key, ip).tier
+
+    def is_valid_api_key(self, api_key: str) -> bool:
+        return bool(api_key) and self._lookup(self.snapshot, api_key) is not None
+
+    def is_premium_ip(self, ip: str) -> bool:
+        return ip in self.snapshot.premium_ips
+
+    @staticmethod
+    def _lookup_key(snapshot: RegistrySnapshot, api_key: str) -> Optional[TierResolution]:
+        # Cached per snapshot, so entries from before a reload are never returned after it
+        return snapshot.keys.get(key_digest(api_key))
+
+    def reload(self) -> RegistrySnapshot:
+        """Re-read every source and publish the result if it changed.
+
+        If a source can't be read the current registry stays live and the error
+        is raised to the caller.
+        """
+        with self._load_lock:
+            current = self._snapshot
+            try:
+                candidate = self._build_snapshot(current.generation + 1 if current else 1)
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            self.last_error = None
+            if current is not None and candidate.digest == current.digest:
+                return current
+            self._snapshot = candidate
+            self._lookup.cache_clear()
+            logger.info(f"API key registry reloaded: {len(candidate.keys)} keys, "
+                        f"{len(candidate.premium_ips)} premium IPs (generation {candidate.generation})")
+            return candidate
+
+    def _build_snapshot(self, generation: int, external: bool = True) -> RegistrySnapshot:
+        """Snapshot of every source, or of the environment variables alone when external is False"""
+        keys: Dict[str, TierResolution] = {}
+        premium_ips = set()
+        sources = ['environment']
+
+        # Legacy comma-separated environment variables, parsed once here
+        for api_key in filter(None, (key.strip() for key in os.environ.get('VALID_API_KEYS', '').split(','))):
+            self._add_key(keys, {'sha256': key_digest(api_key)})
+        premium_ips.update(filter(None, (ip.strip() for ip in os.environ.get('PREMIUM_IPS', '').split(','))))
+
+        if self.path and external:
+            with open(self.path) as f:
+                data = json.load(f)
+            for entry in data.get('keys', []):
+                self._add_key(keys, entry)
+            premium_ips.update(data.get('premium_ips', []))
+            sources.append(self.path)
+
+        if self.collection and external:
+            for entry in self._read_firestore():
+                self._add_key(keys, entry)
+            sources.append(f"firestore:{self.collection}")
+
+        return RegistrySnapshot(keys, frozenset(premium_ips), generation, tuple(sources))
+
+    @staticmethod
+    def _add_key(keys: Dict[str, TierResolution], entry: Dict[str, Any]):
+        digest = str(entry.get('sha256', '')).lower()
+        if len(digest) != 64:
+            raise ValueError(f"API key entry {entry.get('name', '')!r} needs a 64-digit sha256 digest")
+        tier = entry.get('tier') or DEFAULT_KEY_TIER
+        if tier not in KEY_TIERS:
+            raise ValueError(f"API key entry {entry.get('name', '')!r} has unknown tier {tier!r}")
+        limits = entry.get('limits')
+        if limits:
+            ApiKeyRegistry._check_limits(entry.get('name', ''), limits)
+        keys[digest] = TierResolution(
+            tier=tier,
+            limits=MappingProxyType(dict(limits)) if limits else None,
+            key_id=digest[:32],
+            name=entry.get('name')
+        )
+
+    @staticmethod
+    def _check_limits(name: str, limits: Dict[str, Any]):
+        """Reject a custom quota the rate limiters couldn't apply"""
+        if not isinstance(limits, dict):
+            raise ValueError(f"API key entry {name!r} limits must be an object")
+        for field, value in limits.items():
+            if field == 'algorithm':
+                if value not in LIMIT_ALGORITHMS:
+                    raise ValueError(f"API key entry {name!r} has unknown algorithm {value!r}")
+            elif field not in LIMIT_FIELDS:
+                raise ValueError(f"API key entry {name!r} has unknown limit {field!r}")
+            elif isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+                raise ValueError(f"API key entry {name!r} limit {field!r} must be a positive integer")
+
+    def _read_firestore(self):
+        db = firestore_manager._get_client()
+        if db is None:
+            raise OSError("Firestore unavailable")
+        for doc in db.collection(self.collection).stream():
+            entry = doc.to_dict()
+            if entry.get('active', True):
+                entry.setdefault('sha256', doc.id)
+                yield entry
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def start_watching(self, interval: float = API_KEY_RELOAD_INTERVAL):
+        """Reload in a background thread: when the file changes, and from Firestore every interval"""
+        if interval <= 0 or not (self.path or self.collection) or (self._watch_thread and self._watch_thread.is_alive()):
+            return
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(target=self._watch, args=(interval,), name='api-key-watcher', daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self):
+        self._watch_stop.set()
+
+    def _watch(self, interval: float):
+        last_stamp = self._stamp() if self.path else None
+        while not self._watch_stop.wait(interval):
+            stamp = self._stamp() if self.path else None
+            if stamp == last_stamp and not self.collection:
+                continue
+            last_stamp = stamp
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"API key registry reload failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        info = self._lookup.cache_info()
+        stats = {
+            'loaded': snapshot is not None,
+            'last_error': self.last_error,
+            'cache_entries': info.currsize,
+            'cache_size': info.maxsize,
+            'cache_hits': info.hits,
+            'cache_misses': info.misses,
+            'cache_hit_rate': info.hits / (info.hits + info.misses) if info.hits + info.misses else 0.0
+        }
+        if snapshot is not None:
+            stats.update({
+                'keys': len(snapshot.keys),
+                'keys_with_custom_limits': sum(1 for entry in snapshot.keys.values() if entry.limits),
+                'premium_ips': len(snapshot.premium_ips),
+                'generation': snapshot.generation,
+                'loaded_at': snapshot.loaded_at,
+                'sources': list(snapshot.sources)
+            })
+        return stats
+
+
+# Global instance
+api_key_registry = ApiKeyRegistry()
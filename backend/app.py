@@ -12,13 +12,15 @@ from email.mime.base import MIMEBase
 from email import encoders
 from firestore_config import firestore_manager
 from dkim_optimizer_sync import dkim_optimizer_sync
+from structured_logging import StructuredLogger, setup_logging, get_request_id
 
 # Configure DNS resolver for better reliability
 dns.resolver.default_resolver = dns.resolver.Resolver(configure=True)
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+setup_logging(logging.INFO)
 logger = logging.getLogger(__name__)
+slog = StructuredLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -119,10 +121,8 @@ def get_mx_details(domain):
         # Sort MX records by priority (lower priority number = higher priority)
         records.sort(key=lambda x: x['priority'])
         
-        # Debug logging
-        logger.info(f"MX records after sorting for {domain}:")
-        for record in records:
-            logger.info(f"  Priority {record['priority']}: {record['server']}")
+        slog.event('mx_records', logging.DEBUG, domain=domain,
+                   records=lambda: [(record['priority'], record['server']) for record in records])
         
         return {
             'has_mx': True,
@@ -1070,14 +1070,12 @@ def complete_dkim_check():
     
     # Add debugging and error handling for security score calculation
     try:
-        logger.info(f"Calculating security score for {domain}")
-        logger.info(f"MX result: {mx_result}")
-        logger.info(f"SPF result: {spf_result}")
-        logger.info(f"DMARC result: {dmarc_result}")
-        logger.info(f"DKIM result: {dkim_result}")
+        request_id = get_request_id(request.headers)
+        slog.payload('scoring_input', domain=domain, request_id=request_id,
+                     mx=mx_result, spf=spf_result, dmarc=dmarc_result, dkim=dkim_result)
         
         security_score = get_security_score(mx_result, spf_result, dmarc_result, dkim_result)
-        logger.info(f"Security score calculated: {security_score}")
+        slog.payload('security_score', domain=domain, request_id=request_id, security_score=security_score)
     except Exception as e:
         logger.error(f"Error calculating security score for {domain}: {e}")
         # Provide a fallback security score
@@ -1262,7 +1260,7 @@ def complete_dkim_check():
         "completed": True
     }
     
-    logger.info(f"DKIM endpoint response for {domain}: {response_data}")
+    slog.payload('dkim_response', domain=domain, request_id=get_request_id(request.headers), response=response_data)
     
     return jsonify(response_data)
 
@@ -7,17 +7,35 @@ import re
 import os
 import smtplib
 import time
-import redis
+import functools
+import importlib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 from firestore_config import firestore_manager
-from dkim_optimizer_sync import dkim_optimizer_sync
+from analysis_cache import analysis_cache
+from domain_analysis import (
+    get_mx_details, get_spf_details, get_dmarc_details, get_dkim_details,
+    get_security_score
+)
+from features import extract_features
+from cache_prewarmer import CachePrewarmer, PREWARM_ENABLED
+from change_detection import ChangeDetector, compute_fingerprint
+from score_cache import score_cache
+from parsers import parser_cache_stats
+from deadline import request_deadline
 
 # Import security components
 from request_logger import RequestLogger
-from rate_limiter import RateLimiter
+from structured_logging import StructuredLogger, setup_logging, get_request_id
+from rate_limiter import (
+    RateLimiter, MemoryWindowCounter, MemoryGCRA, local_window_cache, redis_limiter_for, uses_gcra,
+    check_dimensions, dimension_result, resolved_limits, DIMENSION_IP, DIMENSION_API_KEY, DIMENSION_DOMAIN,
+    DIMENSION_GLOBAL
+)
+from redis_pool import redis_manager
+from api_key_registry import api_key_registry
 from abuse_detector import AbuseDetector
 from ip_blocker import IPBlocker
 
@@ -26,15 +44,17 @@ from config_loader import ConfigLoader
 from scoring_engine import ScoringEngine
 from recommendation_engine import RecommendationEngine
 
-# Import admin UI
-from admin_ui import create_admin_ui_routes
+# Deferred imports and start-up warm-up
+from lazy_imports import LazyView
+from warmup import warmup
 
 # Configure DNS resolver for better reliability
 dns.resolver.default_resolver = dns.resolver.Resolver(configure=True)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (queued, formatted off the request thread)
+setup_logging(logging.INFO)
 logger = logging.getLogger(__name__)
+slog = StructuredLogger(__name__)
 
 app = Flask(__name__)
 
@@ -57,15 +77,18 @@ abuse_detector = AbuseDetector()
 ip_blocker = IPBlocker()
 
 # Initialize scoring system
-config_loader = ConfigLoader('config')
+config_loader = ConfigLoader('config', lazy=True)  # loaded by warm-up or the first analysis
 scoring_engine = ScoringEngine(config_loader)
 recommendation_engine = RecommendationEngine(config_loader)
+config_loader.start_watching()
+change_detector = ChangeDetector(firestore_manager)
 logger.info(f"Starting AstraVerify backend with ENHANCED security in {ENVIRONMENT} environment")
 
 # Admin authentication
 ADMIN_API_KEY = os.environ.get('ADMIN_API_KEY', 'astraverify-admin-2024')
 
-# Rate limiting configuration
+# Rate limiting configuration; a tier may set 'algorithm': 'gcra' (and 'burst')
+# to smooth requests_per_minute instead of counting fixed minute/hour/day windows
 RATE_LIMIT_CONFIG = {
     'free': {
         'requests_per_minute': 10,
@@ -84,16 +107,23 @@ RATE_LIMIT_CONFIG = {
     }
 }
 
-# Initialize Redis for rate limiting
-redis_client = None
-try:
-    redis_url = os.environ.get('REDIS_URL', 'redis://localhost:6379')
-    redis_client = redis.from_url(redis_url, decode_responses=True)
-    redis_client.ping()
-    logger.info("Connected to Redis for enhanced rate limiting")
-except Exception as e:
-    logger.warning(f"Redis not available, using in-memory rate limiting: {e}")
-    redis_client = None
+# Limits on what a request targets rather than who sends it: each analysed domain, and
+# all traffic together. Both are shared by every instance through Redis (per process while
+# it is down). The domain counter is shared by every anonymous caller, so it is set far
+# above what honest traffic to one domain reaches and only trips on scrapers rotating IPs;
+# callers with a registered API key aren't counted against it. None disables a dimension.
+RATE_LIMIT_DIMENSIONS = {
+    'domain': {
+        'requests_per_minute': 600,
+        'requests_per_hour': 10000,
+        'requests_per_day': 100000
+    },
+    'global': {
+        'requests_per_minute': 3000,
+        'requests_per_hour': 100000,
+        'requests_per_day': 1000000
+    }
+}
 
 # Email configuration
 EMAIL_SENDER = 'hi@astraverify.com'
@@ -122,7 +152,8 @@ else:
     STAGING_EMAIL_ENABLED = True
     LOCAL_APP_PASSWORD = 'juek rown cptq zkpo'
 
-# Get email password from environment or GCP Secret Manager
+# Get email password from environment or GCP Secret Manager (looked up once, on first use)
+@functools.lru_cache(maxsize=1)
 def get_email_password():
     """Get email password from environment or GCP Secret Manager"""
     # First try environment variable
@@ -143,8 +174,6 @@ def get_email_password():
         logger.warning(f"Failed to get password from Secret Manager: {e}")
         return None
 
-EMAIL_PASSWORD = get_email_password()
-logger.info(f"Email password configured: {bool(EMAIL_PASSWORD)}")
 
 # Enhanced input validation
 def validate_domain(domain):
@@ -262,26 +291,35 @@ def require_admin_auth(f):
 # Enhanced rate limiting with Redis
 class EnhancedRateLimiter:
     def __init__(self):
-        self.redis_client = redis_client
         self.limits = RATE_LIMIT_CONFIG
+        self.memory_counter = MemoryWindowCounter()
+        self.memory_gcra = MemoryGCRA()
+    
+    @property
+    def redis_client(self):
+        """Shared pooled Redis client; None while Redis is unavailable, falling back to memory"""
+        return redis_manager.client
     
     def get_user_tier(self, api_key=None, ip=None):
         """Determine user tier based on API key or IP reputation"""
-        if api_key and self._is_valid_api_key(api_key):
-            return 'authenticated'
-        elif self._is_premium_ip(ip):
-            return 'premium'
-        return 'free'
-    
-    def _is_valid_api_key(self, api_key):
-        """Check if API key is valid"""
-        valid_keys = os.environ.get('VALID_API_KEYS', '').split(',')
-        return api_key in valid_keys
+        return api_key_registry.get_tier(api_key, ip)
     
-    def _is_premium_ip(self, ip):
-        """Check if IP is premium (trusted)"""
-        premium_ips = os.environ.get('PREMIUM_IPS', '').split(',')
-        return ip in premium_ips
+    def check_request(self, ip, resolution, domain=None):
+        """Check a request against its caller, target domain and the global limit in one call.
+        Callers with a registered API key are limited by key (with its custom quota, if any)
+        rather than IP, so customers behind a shared NAT don't share a quota, and skip the
+        per-domain limit, so anonymous traffic to a popular domain can't lock them out."""
+        limits = resolved_limits(self.limits, resolution)
+        if resolution.key_id:
+            dimensions = [(DIMENSION_API_KEY, resolution.key_id, limits)]
+        else:
+            dimensions = [(DIMENSION_IP, ip, limits)]
+        if domain and not resolution.key_id and RATE_LIMIT_DIMENSIONS.get('domain'):
+            dimensions.append((DIMENSION_DOMAIN, domain, RATE_LIMIT_DIMENSIONS['domain']))
+        if RATE_LIMIT_DIMENSIONS.get('global'):
+            dimensions.append((DIMENSION_GLOBAL, 'all', RATE_LIMIT_DIMENSIONS['global']))
+        allowed, decisions = check_dimensions(self.redis_client, self.memory_counter, self.memory_gcra, dimensions)
+        return allowed, dimension_result(allowed, decisions)
     
     def check_rate_limit(self, identifier, tier='free'):
         """Check if request is within rate limits"""
@@ -294,78 +332,60 @@ class EnhancedRateLimiter:
         """Check rate limits using Redis"""
         try:
             limits = self.limits[tier]
-            now = datetime.utcnow()
-            
-            # Create keys for different time windows
-            minute_key = f"rate_limit:{identifier}:{now.strftime('%Y%m%d%H%M')}"
-            hour_key = f"rate_limit:{identifier}:{now.strftime('%Y%m%d%H')}"
-            day_key = f"rate_limit:{identifier}:{now.strftime('%Y%m%d')}"
-            
-            # Get current counts
-            minute_count = int(self.redis_client.get(minute_key) or 0)
-            hour_count = int(self.redis_client.get(hour_key) or 0)
-            day_count = int(self.redis_client.get(day_key) or 0)
-            
-            # Check if any limit is exceeded
-            if (minute_count >= limits['requests_per_minute'] or
-                hour_count >= limits['requests_per_hour'] or
-                day_count >= limits['requests_per_day']):
-                
-                return False, {
-                    'retry_after': 60,
-                    'limits': limits,
-                    'current_usage': {
-                        'minute': minute_count,
-                        'hour': hour_count,
-                        'day': day_count
-                    }
-                }
-            
-            # Increment counters
-            pipe = self.redis_client.pipeline()
-            pipe.incr(minute_key)
-            pipe.incr(hour_key)
-            pipe.incr(day_key)
-            pipe.expire(minute_key, 60)
-            pipe.expire(hour_key, 3600)
-            pipe.expire(day_key, 86400)
-            pipe.execute()
-            
-            return True, {
-                'retry_after': 0,
-                'limits': limits,
-                'current_usage': {
-                    'minute': minute_count + 1,
-                    'hour': hour_count + 1,
-                    'day': day_count + 1
-                }
-            }
+            decision = redis_limiter_for(limits).check(self.redis_client, identifier, limits)
+            redis_manager.record_success()
+            return self._result(limits, decision)
             
         except Exception as e:
             logger.error(f"Redis rate limiting error: {e}")
-            return True, {
-                'retry_after': 0,
-                'limits': self.limits.get(tier, self.limits['free']),
-                'current_usage': {'minute': 0, 'hour': 0, 'day': 0}
-            }
+            redis_manager.record_failure(e)
+            return self._check_rate_limit_memory(identifier, tier)
     
     def _check_rate_limit_memory(self, identifier, tier):
         """Fallback to in-memory rate limiting"""
-        # Simple in-memory implementation
-        return True, {
-            'retry_after': 0,
-            'limits': self.limits.get(tier, self.limits['free']),
-            'current_usage': {'minute': 0, 'hour': 0, 'day': 0}
+        limits = self.limits.get(tier, self.limits['free'])
+        counter = self.memory_gcra if uses_gcra(limits) else self.memory_counter
+        return self._result(limits, counter.check(identifier, limits))
+    
+    @staticmethod
+    def _result(limits, decision):
+        return decision.allowed, {
+            'retry_after': decision.retry_after,
+            'limits': limits,
+            'current_usage': decision.usage,
+            'remaining': decision.remaining,
+            'reset': decision.reset_at
         }
 
 # Initialize enhanced rate limiter
 enhanced_rate_limiter = EnhancedRateLimiter()
+api_key_registry.start_watching()  # hot reload of API keys, tiers and custom quotas
+
+def get_target_domain():
+    """Domain a request is about, from ?domain=, the URL path or a JSON body"""
+    domain = request.args.get('domain') or (request.view_args or {}).get('domain')
+    if not domain and request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            domain = data.get('domain')
+    if isinstance(domain, str) and domain.strip():
+        return domain.strip().rstrip('.').lower()[:253]
+    return None
+
+# Paths served without rate limiting or request logging
+UNMETERED_PATHS = frozenset(['/api/health'])
 
 # Security middleware with enhanced features
 @app.before_request
 def before_request():
     """Enhanced request processing with security checks"""
     g.start_time = time.time()
+    g.request_id = get_request_id(request.headers)
+    
+    # Health probes skip rate limiting, abuse analysis and Firestore request logging,
+    # so they answer instantly on a cold instance and don't cost a write each
+    if request.path in UNMETERED_PATHS:
+        return None
     
     # Get client IP and create fingerprint
     client_ip = request_logger.get_client_ip()
@@ -386,8 +406,11 @@ def before_request():
     
     # Enhanced rate limiting
     api_key = request.headers.get('X-API-Key')
-    user_tier = enhanced_rate_limiter.get_user_tier(api_key, client_ip)
-    allowed, rate_limit_info = enhanced_rate_limiter.check_rate_limit(client_ip, user_tier)
+    resolution = api_key_registry.resolve(api_key, client_ip)
+    g.user_tier = resolution.tier
+    allowed, rate_limit_info = enhanced_rate_limiter.check_request(client_ip, resolution, get_target_domain())
+    
+    g.rate_limit_info = rate_limit_info
     
     if not allowed:
         g.response_status = 429
@@ -396,6 +419,7 @@ def before_request():
         
         return jsonify({
             "error": "Rate limit exceeded",
+            "dimension": rate_limit_info['dimension'],
             "retry_after": rate_limit_info['retry_after'],
             "limits": rate_limit_info['limits'],
             "current_usage": rate_limit_info['current_usage']
@@ -413,8 +437,7 @@ def before_request():
         else:
             ip_blocker.block_ip(client_ip, f"Abuse detected: {abuse_analysis['flags']}", 'temporary')
     
-    # Store rate limit and abuse info
-    g.rate_limit_info = rate_limit_info
+    # Store abuse info
     g.abuse_analysis = abuse_analysis
 
 @app.after_request
@@ -434,14 +457,16 @@ def after_request(response):
     
     # Add rate limit headers
     if hasattr(g, 'rate_limit_info'):
-        response.headers['X-RateLimit-Limit'] = str(g.rate_limit_info['limits']['requests_per_minute'])
-        response.headers['X-RateLimit-Remaining'] = str(
-            g.rate_limit_info['limits']['requests_per_minute'] - g.rate_limit_info['current_usage']['minute']
-        )
-        response.headers['X-RateLimit-Reset'] = str(int(time.time() + 60))  # Next minute
+        limits = g.rate_limit_info['limits']
+        response.headers['X-RateLimit-Limit'] = str(limits.get('burst', limits['requests_per_minute']))
+        response.headers['X-RateLimit-Remaining'] = str(g.rate_limit_info['remaining']['minute'])
+        response.headers['X-RateLimit-Reset'] = str(g.rate_limit_info['reset'])
+        if response.status_code == 429:
+            response.headers['Retry-After'] = str(g.rate_limit_info['retry_after'])
     
     # Log the request
-    request_logger.log_request()
+    if request.path not in UNMETERED_PATHS:
+        request_logger.log_request()
     
     return response
 
@@ -456,7 +481,9 @@ def health_check():
         "security_enabled": True,
         "enhanced_security": True,
         "rate_limiting": "enabled",
-        "input_validation": "enhanced"
+        "redis": redis_manager.breaker.state,
+        "input_validation": "enhanced",
+        "warmup": warmup.status
     })
 
 # Admin endpoints
@@ -470,6 +497,7 @@ def admin_security_dashboard():
             "total_requests": firestore_manager.get_daily_request_count(),
             "rate_limited_requests": firestore_manager.get_rate_limited_count(),
             "top_requesting_ips": firestore_manager.get_top_requesting_ips(10),
+            "abuse_detection": abuse_detector.get_stats(),
             "environment": ENVIRONMENT,
             "timestamp": datetime.utcnow().isoformat()
         }
@@ -594,175 +622,77 @@ def admin_reset_abuse_detection():
         logger.error(f"Reset abuse detection error: {e}")
         return jsonify({"error": "Failed to reset abuse detection"}), 500
 
-# Helper functions for domain analysis
-def get_mx_details(domain):
-    """Get detailed MX record information"""
+@app.route('/api/admin/verbose-logging', methods=['GET', 'POST'])
+@require_admin_auth
+def admin_verbose_logging():
+    """Admin endpoint to opt domains or request IDs into verbose payload logging"""
     try:
-        mx_records = dns.resolver.resolve(domain, 'MX')
-        records = []
-        for mx in mx_records:
-            records.append({
-                'priority': mx.preference,
-                'server': str(mx.exchange),
-                'valid': True
-            })
-        
-        # Sort MX records by priority (lower priority number = higher priority)
-        records.sort(key=lambda x: x['priority'])
-        
-        # Debug logging
-        logger.info(f"MX records after sorting for {domain}:")
-        for record in records:
-            logger.info(f"  Priority {record['priority']}: {record['server']}")
-        
-        return {
-            'has_mx': True,
-            'records': records,
-            'status': 'Valid',
-            'description': f'Found {len(records)} MX record(s)'
-        }
-    except Exception as e:
-        logger.warning(f"MX check failed for {domain}: {str(e)}")
-        return {
-            'has_mx': False,
-            'records': [],
-            'status': 'Missing',
-            'description': 'No MX records found'
-        }
+        if request.method == 'POST':
+            data = request.get_json() or {}
+            domain = data.get('domain')
+            request_id = data.get('request_id')
+            if not domain and not request_id:
+                return jsonify({"error": "domain or request_id required"}), 400
+            slog.set_verbose(domain, request_id, data.get('enabled', True))
 
-def get_spf_details(domain):
-    """Get detailed SPF record information"""
-    try:
-        txt_records = dns.resolver.resolve(domain, 'TXT')
-        spf_records = []
-        for record in txt_records:
-            record_text = record.to_text().strip('"')
-            if record_text.startswith('v=spf1'):
-                spf_records.append({
-                    'record': record_text,
-                    'valid': True
-                })
-        
-        if spf_records:
-            return {
-                'has_spf': True,
-                'records': spf_records,
-                'status': 'Valid',
-                'description': f'Found {len(spf_records)} SPF record(s)'
-            }
-        else:
-            return {
-                'has_spf': False,
-                'records': [],
-                'status': 'Missing',
-                'description': 'No SPF records found'
-            }
+        return jsonify({
+            'success': True,
+            'verbose_targets': slog.get_verbose_targets()
+        })
     except Exception as e:
-        logger.warning(f"SPF check failed for {domain}: {str(e)}")
-        return {
-            'has_spf': False,
-            'records': [],
-            'status': 'Missing',
-            'description': 'No SPF records found'
-        }
+        logger.error(f"Verbose logging update error: {e}")
+        return jsonify({"error": "Failed to update verbose logging"}), 500
 
-def get_dmarc_details(domain):
-    """Get detailed DMARC record information"""
+@app.route('/api/admin/reload-config', methods=['GET', 'POST'])
+@require_admin_auth
+def admin_reload_config():
+    """Admin endpoint to reload scoring configuration (POST) or show the live version (GET)"""
     try:
-        logger.info(f"Attempting to resolve DMARC for {domain}")
-        dmarc_records = dns.resolver.resolve(f"_dmarc.{domain}", 'TXT')
-        logger.info(f"Successfully resolved DMARC for {domain}: {len(dmarc_records)} records")
-        records = []
-        for record in dmarc_records:
-            record_text = record.to_text().strip('"')
-            if record_text.startswith('v=DMARC1'):
-                records.append({
-                    'record': record_text,
-                    'valid': True
-                })
-        
-        if records:
-            logger.info(f"DMARC validation successful for {domain}")
-            return {
-                'has_dmarc': True,
-                'records': records,
-                'status': 'Valid',
-                'description': f'Found {len(records)} DMARC record(s)'
-            }
-        else:
-            logger.warning(f"DMARC records found but none are valid for {domain}")
-            return {
-                'has_dmarc': False,
-                'records': [],
-                'status': 'Missing',
-                'description': 'No DMARC records found'
-            }
+        if request.method == 'POST':
+            try:
+                config_loader.reload_configs()
+            except (ValueError, OSError) as e:
+                return jsonify({"error": str(e), "config_version": config_loader.version}), 400
+
+        snapshot = config_loader.snapshot
+        return jsonify({
+            'success': True,
+            'config_version': snapshot.version,
+            'generation': snapshot.generation,
+            'loaded_at': datetime.fromtimestamp(snapshot.loaded_at).isoformat()
+        })
     except Exception as e:
-        logger.warning(f"DMARC check failed for {domain}: {str(e)}")
-        return {
-            'has_dmarc': False,
-            'records': [],
-            'status': 'Missing',
-            'description': 'No DMARC records found'
-        }
+        logger.error(f"Config reload error: {e}")
+        return jsonify({"error": "Failed to reload configuration"}), 500
 
-def get_dkim_details(domain, custom_selector=None):
-    """Get DKIM record information (optimized check)"""
-    # Get MX servers for provider-specific selector prioritization
-    mx_servers = []
+@app.route('/api/admin/reload-api-keys', methods=['GET', 'POST'])
+@require_admin_auth
+def admin_reload_api_keys():
+    """Admin endpoint to reload the API key registry (POST) or show what is loaded (GET)"""
     try:
-        mx_result = get_mx_details(domain)
-        if mx_result.get('has_mx'):
-            mx_servers = [record['server'] for record in mx_result.get('records', [])]
-    except:
-        pass
-    
-    # Use optimized DKIM checker
-    result = dkim_optimizer_sync.get_dkim_details_optimized(domain, custom_selector, mx_servers)
-    
-    # Remove internal timing info from result
-    if 'check_time' in result:
-        del result['check_time']
-    
-    return result
+        if request.method == 'POST':
+            try:
+                api_key_registry.reload()
+            except (ValueError, OSError) as e:
+                return jsonify({"error": str(e)}), 400
+        return jsonify({'success': True, **api_key_registry.get_stats()})
+    except Exception as e:
+        logger.error(f"API key registry reload error: {e}")
+        return jsonify({"error": "Failed to reload API keys"}), 500
 
-def detect_email_provider(mx_result, spf_result, dkim_result):
-    """Detect the email service provider based on MX, SPF, and DKIM records"""
-    provider = "Unknown"
-    
-    # Check for Google Workspace
-    google_indicators = [
-        any('google' in r['server'].lower() for r in mx_result['records']),
-        any('_spf.google.com' in r['record'] for r in spf_result['records']),
-        any(r['selector'] == 'google' for r in dkim_result['records'])
-    ]
-    
-    if any(google_indicators):
-        provider = "Google Workspace"
-    
-    # Check for Microsoft 365
-    microsoft_indicators = [
-        any('outlook' in r['server'].lower() or 'microsoft' in r['server'].lower() for r in mx_result['records']),
-        any('_spf.protection.outlook.com' in r['record'] for r in spf_result['records']),
-        any(r['selector'] in ['selector1', 'selector2'] for r in dkim_result['records'])
-    ]
-    
-    if any(microsoft_indicators):
-        provider = "Microsoft 365"
-    
-    # Check for other common providers
-    if any('yahoo' in r['server'].lower() for r in mx_result['records']):
-        provider = "Yahoo"
-    elif any('zoho' in r['server'].lower() for r in mx_result['records']):
-        provider = "Zoho"
-    elif any('mailgun' in r['server'].lower() for r in mx_result['records']):
-        provider = "Mailgun"
-    elif any('sendgrid' in r['server'].lower() for r in mx_result['records']):
-        provider = "SendGrid"
-    elif any(r['selector'] == 'dreamhost' for r in dkim_result['records']):
-        provider = "DreamHost"
-    
-    return provider
+# Keep popular domains warm in the analysis cache
+cache_prewarmer = CachePrewarmer(
+    analysis_cache,
+    refreshers={
+        'mx': get_mx_details.refresh,
+        'spf': get_spf_details.refresh,
+        'dmarc': get_dmarc_details.refresh,
+        'dkim': get_dkim_details.refresh
+    },
+    top_domains_fn=firestore_manager.get_top_domains
+)
+if PREWARM_ENABLED:
+    cache_prewarmer.start()
 
 # Main domain checking endpoint with enhanced validation
 @app.route('/api/check', methods=['GET'])
@@ -780,20 +710,26 @@ def check_domain():
     
     logger.info(f"Starting comprehensive analysis for domain: {domain}")
     
+    # Every lookup shares one request deadline and returns partial results when it passes
+    deadline = request_deadline(request.args.get('timeout'), g.get('user_tier', 'free'))
+    
     # Get detailed results for each check
-    mx_result = get_mx_details(domain)
-    spf_result = get_spf_details(domain)
-    dmarc_result = get_dmarc_details(domain)
+    mx_result = get_mx_details(domain, deadline=deadline)
+    spf_result = get_spf_details(domain, deadline=deadline)
+    dmarc_result = get_dmarc_details(domain, deadline=deadline)
     
     if progressive:
         # Progressive mode - return early results without DKIM
         logger.info(f"Progressive mode: returning early results for {domain}")
         
+        # Parse the records once for scoring and recommendations
+        features = extract_features(mx_result, spf_result, dmarc_result)
+        
         # Calculate scores for available components
         component_scores = {
-            'mx': scoring_engine.calculate_component_score('mx', mx_result),
-            'spf': scoring_engine.calculate_component_score('spf', spf_result),
-            'dmarc': scoring_engine.calculate_component_score('dmarc', dmarc_result),
+            'mx': scoring_engine.calculate_component_score('mx', mx_result, features),
+            'spf': scoring_engine.calculate_component_score('spf', spf_result, features),
+            'dmarc': scoring_engine.calculate_component_score('dmarc', dmarc_result, features),
             'dkim': {'score': 0, 'bonus': 0, 'total': 0, 'details': {}}
         }
         
@@ -819,7 +755,7 @@ def check_domain():
             'dmarc': dmarc_result,
             'dkim': {'has_dkim': False, 'records': []}
         }
-        recommendations = recommendation_engine.generate_recommendations(component_scores, early_parsed_data)
+        recommendations = recommendation_engine.generate_recommendations(component_scores, early_parsed_data, features)
         
         early_results = {
             "domain": domain,
@@ -833,19 +769,22 @@ def check_domain():
                 "enabled": mx_result['has_mx'],
                 "status": mx_result['status'],
                 "description": mx_result['description'],
-                "records": mx_result['records']
+                "records": mx_result['records'],
+                "timed_out": mx_result.get('timed_out', False)
             },
             "spf": {
                 "enabled": spf_result['has_spf'],
                 "status": spf_result['status'],
                 "description": spf_result['description'],
-                "records": spf_result['records']
+                "records": spf_result['records'],
+                "timed_out": spf_result.get('timed_out', False)
             },
             "dmarc": {
                 "enabled": dmarc_result['has_dmarc'],
                 "status": dmarc_result['status'],
                 "description": dmarc_result['description'],
-                "records": dmarc_result['records']
+                "records": dmarc_result['records'],
+                "timed_out": dmarc_result.get('timed_out', False)
             },
             "dkim": {
                 "enabled": False,
@@ -855,23 +794,25 @@ def check_domain():
                 "checking": True
             },
             "progressive": True,
+            "partial": any(r.get('timed_out') for r in (mx_result, spf_result, dmarc_result)),
             "message": "Initial results ready, DKIM check in progress...",
             "recommendations": recommendations
         }
         return jsonify(early_results)
     
     # Full analysis including DKIM
-    dkim_result = get_dkim_details(domain)
+    dkim_result = get_dkim_details(domain, deadline=deadline)
     
-    # Detect email provider
-    email_provider = detect_email_provider(mx_result, spf_result, dkim_result)
+    # Parse the records once; provider detection, scoring and recommendations all read these
+    features = extract_features(mx_result, spf_result, dmarc_result, dkim_result)
+    email_provider = features.email_provider
     
     # Calculate granular scores
     component_scores = {
-        'mx': scoring_engine.calculate_component_score('mx', mx_result),
-        'spf': scoring_engine.calculate_component_score('spf', spf_result),
-        'dmarc': scoring_engine.calculate_component_score('dmarc', dmarc_result),
-        'dkim': scoring_engine.calculate_component_score('dkim', dkim_result)
+        'mx': scoring_engine.calculate_component_score('mx', mx_result, features),
+        'spf': scoring_engine.calculate_component_score('spf', spf_result, features),
+        'dmarc': scoring_engine.calculate_component_score('dmarc', dmarc_result, features),
+        'dkim': scoring_engine.calculate_component_score('dkim', dkim_result, features)
     }
     
     # Calculate total score
@@ -884,7 +825,7 @@ def check_domain():
         'dmarc': dmarc_result,
         'dkim': dkim_result
     }
-    recommendations = recommendation_engine.generate_recommendations(component_scores, parsed_data)
+    recommendations = recommendation_engine.generate_recommendations(component_scores, parsed_data, features)
     
     # Transform component_scores to scoring_details format expected by frontend
     scoring_details = {
@@ -911,29 +852,35 @@ def check_domain():
             "enabled": mx_result['has_mx'],
             "status": mx_result['status'],
             "description": mx_result['description'],
-            "records": mx_result['records']
+            "records": mx_result['records'],
+            "timed_out": mx_result.get('timed_out', False)
         },
         "spf": {
             "enabled": spf_result['has_spf'],
             "status": spf_result['status'],
             "description": spf_result['description'],
-            "records": spf_result['records']
+            "records": spf_result['records'],
+            "timed_out": spf_result.get('timed_out', False)
         },
         "dkim": {
             "enabled": dkim_result['has_dkim'],
             "status": dkim_result['status'],
             "description": dkim_result['description'],
-            "records": dkim_result['records']
+            "records": dkim_result['records'],
+            "timed_out": dkim_result.get('timed_out', False)
         },
         "dmarc": {
             "enabled": dmarc_result['has_dmarc'],
             "status": dmarc_result['status'],
             "description": dmarc_result['description'],
-            "records": dmarc_result['records']
+            "records": dmarc_result['records'],
+            "timed_out": dmarc_result.get('timed_out', False)
         },
         "email_provider": email_provider,
+        "email_provider_confidence": features.email_provider_confidence,
         "recommendations": recommendations,
-        "progressive": False
+        "progressive": False,
+        "partial": any(r.get('timed_out') for r in (mx_result, spf_result, dmarc_result, dkim_result))
     }
     
     return jsonify(results)
@@ -1149,14 +1096,14 @@ def send_email_report(to_email, domain, analysis_result, opt_in_marketing):
         
         # Try different authentication methods
         try:
-            server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
+            server.login(EMAIL_USERNAME, get_email_password())
             logger.info("SMTP authentication successful with LOGIN")
         except Exception as login_error:
             logger.warning(f"LOGIN authentication failed: {login_error}")
             # Try PLAIN authentication as fallback
             try:
                 server.ehlo()
-                server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
+                server.login(EMAIL_USERNAME, get_email_password())
                 logger.info("SMTP authentication successful with PLAIN")
             except Exception as plain_error:
                 logger.error(f"PLAIN authentication also failed: {plain_error}")
@@ -1272,139 +1219,6 @@ def get_domain_history(domain):
         logger.error(f"Failed to get history for {domain}: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-def get_security_score(mx_result, spf_result, dmarc_result, dkim_result):
-    """
-    Calculate comprehensive security score with bonus points.
-    
-    Base Scoring (100 points total):
-    - MX Records: 25 points (essential for email delivery)
-    - SPF Records: 25 points (prevents email spoofing)
-    - DMARC Records: 30 points (authentication reporting)
-    - DKIM Records: 20 points (email authentication)
-    
-    Bonus Points (up to 10 additional points):
-    - Multiple MX records: +2 points (redundancy)
-    - Strong SPF policy: +1-2 points (-all > ~all > ?all)
-    - Strict DMARC policy: +1-2 points (p=reject > p=quarantine)
-    - Multiple DKIM selectors: +2 points (diversity) - only for non-Google providers
-    - 100% DMARC coverage: +1 point (pct=100)
-    """
-    score = 0
-    max_score = 100
-    bonus_points = 0
-    max_bonus = 10
-    scoring_details = {}
-    
-    # Base scoring (MX: 25, SPF: 25, DMARC: 30, DKIM: 20)
-    if mx_result['has_mx']:
-        # Check if MX records are actually functional
-        functional_mx = False
-        for record in mx_result['records']:
-            server = record.get('server', '')
-            # Skip non-functional servers like "." or empty strings
-            if server and server != '.' and server != '':
-                functional_mx = True
-                break
-        
-        if functional_mx:
-            score += 25
-            scoring_details['mx_base'] = 25
-            # Bonus for multiple MX records (redundancy)
-            if len(mx_result['records']) > 1:
-                bonus_points += 2
-                scoring_details['mx_bonus'] = 2
-            else:
-                scoring_details['mx_bonus'] = 0
-        else:
-            # MX records exist but are not functional
-            scoring_details['mx_base'] = 0
-            scoring_details['mx_bonus'] = 0
-    else:
-        scoring_details['mx_base'] = 0
-        scoring_details['mx_bonus'] = 0
-    
-    if spf_result['has_spf']:
-        score += 25
-        scoring_details['spf_base'] = 25
-        # Bonus for strong SPF policy
-        spf_bonus = 0
-        for record in spf_result['records']:
-            if '-all' in record['record']:
-                spf_bonus += 2  # Strongest policy
-            elif '~all' in record['record']:
-                spf_bonus += 1  # Medium policy
-            elif '?all' in record['record']:
-                spf_bonus += 0.5  # Weakest policy
-        bonus_points += spf_bonus
-        scoring_details['spf_bonus'] = spf_bonus
-    else:
-        scoring_details['spf_base'] = 0
-        scoring_details['spf_bonus'] = 0
-    
-    if dmarc_result['has_dmarc']:
-        score += 30
-        scoring_details['dmarc_base'] = 30
-        # Bonus for strong DMARC policy
-        dmarc_bonus = 0
-        for record in dmarc_result['records']:
-            if 'p=reject' in record['record']:
-                dmarc_bonus += 2  # Strictest policy
-            elif 'p=quarantine' in record['record']:
-                dmarc_bonus += 1  # Medium policy
-            if 'pct=100' in record['record']:
-                dmarc_bonus += 1  # 100% coverage
-        bonus_points += dmarc_bonus
-        scoring_details['dmarc_bonus'] = dmarc_bonus
-    else:
-        scoring_details['dmarc_base'] = 0
-        scoring_details['dmarc_bonus'] = 0
-    
-    if dkim_result['has_dkim']:
-        score += 20
-        scoring_details['dkim_base'] = 20
-        # Bonus for multiple DKIM selectors (only for non-Google providers)
-        provider = detect_email_provider(mx_result, spf_result, dkim_result)
-        if len(dkim_result['records']) > 1 and provider != "Google Workspace":
-            bonus_points += 2
-            scoring_details['dkim_bonus'] = 2
-        else:
-            scoring_details['dkim_bonus'] = 0
-    else:
-        scoring_details['dkim_base'] = 0
-        scoring_details['dkim_bonus'] = 0
-    
-    # Apply bonus points (capped at max_bonus)
-    final_score = min(score + bonus_points, max_score)
-    
-    # Determine grade and status
-    if final_score >= 90:
-        grade = 'A'
-        status = 'Excellent'
-    elif final_score >= 75:
-        grade = 'B'
-        status = 'Good'
-    elif final_score >= 50:
-        grade = 'C'
-        status = 'Fair'
-    elif final_score >= 25:
-        grade = 'D'
-        status = 'Poor'
-    else:
-        grade = 'F'
-        status = 'Very Poor'
-    
-    return {
-        'score': round(final_score, 1),
-        'grade': grade,
-        'status': status,
-        'max_score': max_score,
-        'base_score': score,
-        'bonus_points': round(bonus_points, 1),
-        'max_bonus': max_bonus,
-        'scoring_details': scoring_details
-    }
-
-
 @app.route('/api/check/dkim', methods=['GET'])
 def check_dkim_endpoint():
     """Complete DKIM check for progressive mode (optimized)"""
@@ -1420,30 +1234,64 @@ def check_dkim_endpoint():
         
         logger.info(f"Completing optimized DKIM analysis for domain: {domain}")
         
-        # Get MX servers for provider-specific selector prioritization
-        mx_servers = []
-        try:
-            mx_result = get_mx_details(domain)
-            if mx_result.get('has_mx'):
-                mx_servers = [record['server'] for record in mx_result.get('records', [])]
-        except:
-            pass
+        deadline = request_deadline(request.args.get('timeout'), g.get('user_tier', 'free'))
         
-        # Get optimized DKIM results
-        dkim_result = dkim_optimizer_sync.get_dkim_details_optimized(domain, custom_selector, mx_servers)
+        # Get MX and optimized DKIM results (served from the analysis cache when warm)
+        mx_result = get_mx_details(domain, deadline=deadline)
+        dkim_result = get_dkim_details(domain, custom_selector, deadline=deadline)
+        spf_result = get_spf_details(domain, deadline=deadline)
+        dmarc_result = get_dmarc_details(domain, deadline=deadline)
+        partial = any(r.get('timed_out') for r in (mx_result, spf_result, dmarc_result, dkim_result))
         
-        # Detect email provider based on DKIM
-        spf_result = get_spf_details(domain)
-        email_provider = detect_email_provider(mx_result, spf_result, dkim_result)
+        # Remove internal timing info
+        dkim_response = {
+            "enabled": dkim_result['has_dkim'],
+            "status": dkim_result['status'],
+            "description": dkim_result['description'],
+            "records": dkim_result['records'],
+            "selectors_checked": dkim_result.get('selectors_checked', 0),
+            "timed_out": dkim_result.get('timed_out', False)
+        }
         
-        # Calculate security score
-        dmarc_result = get_dmarc_details(domain)
+        # Add performance info in development
+        if ENVIRONMENT == 'development' and 'check_time' in dkim_result:
+            dkim_response['check_time'] = dkim_result['check_time']
         
+        # Skip rescoring and storage when nothing changed since the last stored analysis
+        config_version = scoring_engine.version
+        fingerprint = compute_fingerprint(mx_result, spf_result, dmarc_result, dkim_result, config_version)
+        previous_results = None if partial else change_detector.find_unchanged(domain, fingerprint)
+        if previous_results:
+            logger.info(f"DNS records unchanged for {domain}, reusing stored analysis")
+            confidence = previous_results.get('email_provider_confidence')
+            if confidence is None:
+                # Stored before the confidence was kept with the analysis
+                confidence = extract_features(mx_result, spf_result, dmarc_result, dkim_result).email_provider_confidence
+            response_data = {
+                "domain": domain,
+                "dkim": dkim_response,
+                "email_provider": previous_results.get('email_provider', 'Unknown'),
+                "email_provider_confidence": confidence,
+                "security_score": previous_results.get('security_score'),
+                "recommendations": previous_results.get('recommendations', []),
+                "config_version": config_version,
+                "completed": True,
+                "partial": partial,
+                "unchanged": True
+            }
+            slog.payload('dkim_response', domain=domain, request_id=g.get('request_id'), response=response_data)
+            return jsonify(response_data)
+        
+        # Parse the records once; provider detection and scoring both read these
+        features = extract_features(mx_result, spf_result, dmarc_result, dkim_result)
+        email_provider = features.email_provider
+        
+        # Calculate security score
         # Add debugging and error handling for security score calculation
         try:
-            logger.info(f"Calculating security score for {domain}")
-            security_score = get_security_score(mx_result, spf_result, dmarc_result, dkim_result)
-            logger.info(f"Security score calculated: {security_score}")
+            security_score = get_security_score(mx_result, spf_result, dmarc_result, dkim_result, features)
+            slog.payload('security_score', domain=domain, request_id=g.get('request_id'),
+                         security_score=security_score)
         except Exception as e:
             logger.error(f"Error calculating security score for {domain}: {e}")
             # Provide a fallback security score
@@ -1547,25 +1395,13 @@ def check_dkim_endpoint():
         except Exception as e:
             recommendations = []
         
-        # Remove internal timing info
-        dkim_response = {
-            "enabled": dkim_result['has_dkim'],
-            "status": dkim_result['status'],
-            "description": dkim_result['description'],
-            "records": dkim_result['records'],
-            "selectors_checked": dkim_result.get('selectors_checked', 0)
-        }
-        
-        # Add performance info in development
-        if ENVIRONMENT == 'development' and 'check_time' in dkim_result:
-            dkim_response['check_time'] = dkim_result['check_time']
-        
         # Compile complete results for storage
         complete_results = {
             "domain": domain,
             "analysis_timestamp": None,  # Will be set by frontend
             "security_score": security_score,
             "email_provider": email_provider,
+            "email_provider_confidence": features.email_provider_confidence,
             "mx": {
                 "enabled": mx_result['has_mx'],
                 "status": mx_result['status'],
@@ -1593,24 +1429,31 @@ def check_dkim_endpoint():
             "recommendations": recommendations
         }
         
-        # Store analysis results in Firestore
-        try:
-            firestore_manager.store_analysis(domain, complete_results)
-            logger.info(f"Progressive analysis stored in Firestore for {domain}")
-        except Exception as e:
-            logger.warning(f"Failed to store progressive analysis in Firestore: {e}")
+        # Store analysis results in Firestore (partial results would read as missing records)
+        if partial:
+            logger.info(f"Not storing partial analysis for {domain}, request deadline passed")
+        else:
+            try:
+                doc_id = firestore_manager.store_analysis(domain, complete_results, fingerprint=fingerprint)
+                change_detector.remember(domain, fingerprint, doc_id, complete_results)
+                logger.info(f"Progressive analysis stored in Firestore for {domain}")
+            except Exception as e:
+                logger.warning(f"Failed to store progressive analysis in Firestore: {e}")
         
         # Add debugging for response
         response_data = {
             "domain": domain,
             "dkim": dkim_response,
             "email_provider": email_provider,
+            "email_provider_confidence": features.email_provider_confidence,
             "security_score": security_score,
             "recommendations": recommendations,
-            "completed": True
+            "config_version": config_version,
+            "completed": True,
+            "partial": partial
         }
         
-        logger.info(f"DKIM endpoint response for {domain}: {response_data}")
+        slog.payload('dkim_response', domain=domain, request_id=g.get('request_id'), response=response_data)
         
         return jsonify(response_data)
         
@@ -1709,7 +1552,7 @@ def suggest_dkim_selectors():
 def test_email_config():
     """Test email configuration"""
     try:
-        if not EMAIL_PASSWORD:
+        if not get_email_password():
             return jsonify({
                 "success": False,
                 "error": "Email password not configured"
@@ -1721,14 +1564,14 @@ def test_email_config():
         
         # Try different authentication methods
         try:
-            server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
+            server.login(EMAIL_USERNAME, get_email_password())
             logger.info("Test: SMTP authentication successful with LOGIN")
         except Exception as login_error:
             logger.warning(f"Test: LOGIN authentication failed: {login_error}")
             # Try PLAIN authentication as fallback
             try:
                 server.ehlo()
-                server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
+                server.login(EMAIL_USERNAME, get_email_password())
                 logger.info("Test: SMTP authentication successful with PLAIN")
             except Exception as plain_error:
                 logger.error(f"Test: PLAIN authentication also failed: {plain_error}")
@@ -1744,7 +1587,7 @@ def test_email_config():
                 "smtp_port": EMAIL_SMTP_PORT,
                 "username": EMAIL_USERNAME,
                 "sender": EMAIL_SENDER,
-                "password_configured": bool(EMAIL_PASSWORD)
+                "password_configured": bool(get_email_password())
             }
         })
         
@@ -1758,7 +1601,7 @@ def test_email_config():
                 "smtp_port": EMAIL_SMTP_PORT,
                 "username": EMAIL_USERNAME,
                 "sender": EMAIL_SENDER,
-                "password_configured": bool(EMAIL_PASSWORD)
+                "password_configured": bool(get_email_password())
             }
         }), 500
 
@@ -1801,7 +1644,7 @@ def email_report():
             # Continue with email sending even if Firestore storage fails
         
         # Send actual email
-        if EMAIL_PASSWORD:
+        if get_email_password():
             email_sent = send_email_report(email, domain, data['analysis_result'], opt_in_marketing)
             if email_sent:
                 return jsonify({
@@ -1827,8 +1670,38 @@ def email_report():
         logger.error(f"Email report error: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
-# Initialize admin UI routes
-create_admin_ui_routes(app)
+@app.route('/api/admin/cache-stats', methods=['GET'])
+@require_admin_auth
+def admin_cache_stats():
+    """Admin endpoint for analysis cache, pre-warmer, score cache and parser cache statistics"""
+    return jsonify({
+        'analysis_cache': analysis_cache.get_stats(),
+        'prewarmer': cache_prewarmer.get_stats(),
+        'change_detection': change_detector.get_stats(),
+        'score_cache': score_cache.get_stats(),
+        'parser_cache': parser_cache_stats(),
+        'rate_limit_local_cache': local_window_cache.get_stats(),
+        'redis': redis_manager.get_stats(),
+        'api_key_registry': api_key_registry.get_stats(),
+        'warmup': warmup.get_stats()
+    })
+
+# Admin UI pages import admin_ui and its templates on their first request
+for rule, view in (('/admin/ui/login', 'admin_ui_login'),
+                   ('/admin/ui/dashboard', 'admin_ui_dashboard'),
+                   ('/admin/ui/selectors/<domain>', 'admin_ui_selectors'),
+                   ('/admin/ui/ip-management', 'admin_ui_ip_management')):
+    app.add_url_rule(rule, view_func=LazyView(f'admin_ui.{view}'))
+
+# Load what the first analysis needs in the background once the server is up,
+# so /api/health answers immediately after a cold start
+warmup.add('config', lambda: config_loader.snapshot)
+warmup.add('redis', lambda: redis_manager.client)
+warmup.add('api_keys', lambda: api_key_registry.snapshot)
+warmup.add('firestore', firestore_manager._get_client)
+warmup.add('email_password', get_email_password)
+warmup.add('admin_ui', lambda: importlib.import_module('admin_ui'))
+warmup.start()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
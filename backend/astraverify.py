@@ -0,0 +1,125 @@
+"""
+AstraVerify command-line tools
+
+Usage (from the backend directory):
+    python -m astraverify scan domains.txt -o scan_results --format csv
+    python -m astraverify rescore --candidate-config candidate/ --export analyses.jsonl -o deltas.csv
+"""
+import sys
+import json
+import logging
+import argparse
+
+
+def _cmd_scan(args) -> int:
+    from batch_scanner import BatchScanner
+
+    scanner = BatchScanner(
+        output_dir=args.output_dir,
+        output_format=args.format,
+        workers=args.workers,
+        shard_size=args.shard_size,
+        concurrency=args.concurrency,
+        timeout=args.timeout
+    )
+    summary = scanner.scan(args.input)
+    print(f"Scanned {summary['scanned']} domains ({summary['errors']} errors) "
+          f"in {summary['duration']:.1f}s; {summary['incomplete_shards']} shards incomplete, "
+          f"{summary['retry_domains']} domains to retry on the next run")
+
+    if args.merge and summary['incomplete_shards'] == 0:
+        rows = scanner.merge(args.merge)
+        print(f"Merged {rows} rows into {args.merge}")
+    return 0 if summary['incomplete_shards'] == 0 else 1
+
+
+def _cmd_rescore(args) -> int:
+    from config_loader import ConfigLoader
+    from rescore_tool import RescoreTool, iter_export, format_histograms
+
+    # Fail fast on a broken candidate before starting the pool
+    baseline = ConfigLoader(args.baseline_config)
+    candidate = ConfigLoader(args.candidate_config)
+    errors = candidate.validate_configuration()
+    if errors:
+        print(f"Candidate config is invalid: {'; '.join(errors)}", file=sys.stderr)
+        return 2
+    print(f"Rescoring with baseline {baseline.version} and candidate {candidate.version}")
+
+    if args.export:
+        analyses = iter_export(args.export)
+    else:
+        from firestore_config import firestore_manager
+        analyses = firestore_manager.stream_analyses(page_size=args.page_size, limit=args.limit)
+
+    tool = RescoreTool(
+        candidate_dir=args.candidate_config,
+        baseline_dir=args.baseline_config,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        latest_only=not args.all_analyses,
+        changed_only=args.changed_only
+    )
+    summary = tool.run(analyses, args.output)
+
+    thresholds = {}
+    for loader in (baseline, candidate):
+        for grade in loader.plan.grades:
+            thresholds.setdefault(grade['grade'], grade['min_score'])
+    grades = set(summary['before']) | set(summary['after'])
+    grade_order = sorted(grades, key=lambda grade: -thresholds.get(grade, 0))
+
+    print(format_histograms(summary, grade_order))
+    print(f"Rescored {summary['rescored']} analyses in {summary['duration']:.1f}s; "
+          f"{summary['changed']} changed; deltas written to {args.output}")
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump({**summary, 'baseline_version': baseline.version,
+                       'candidate_version': candidate.version}, f, indent=2)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='astraverify', description='AstraVerify command-line tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    scan = subparsers.add_parser('scan', help='Analyze a list of domains offline')
+    scan.add_argument('input', help='File with one domain per line')
+    scan.add_argument('-o', '--output-dir', default='scan_results',
+                      help='Directory for part files and checkpoint state (re-run to resume)')
+    scan.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    scan.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    scan.add_argument('--shard-size', type=int, default=1000, help='Domains per shard/checkpoint')
+    scan.add_argument('--concurrency', type=int, default=100, help='Concurrent domains per worker')
+    scan.add_argument('--timeout', type=float, default=5.0, help='DNS lifetime per query in seconds')
+    scan.add_argument('--merge', metavar='PATH', help='Merge part files into a single output file when done')
+    scan.set_defaults(func=_cmd_scan)
+
+    rescore = subparsers.add_parser('rescore', help='What-if rescoring of stored analyses under a candidate config')
+    rescore.add_argument('--candidate-config', required=True, help='Directory with the candidate config files')
+    rescore.add_argument('--baseline-config', default='config', help='Directory with the current config files')
+    source = rescore.add_mutually_exclusive_group(required=True)
+    source.add_argument('--export', metavar='PATH', help='JSONL export of stored analyses (newest first)')
+    source.add_argument('--firestore', action='store_true', help='Stream stored analyses from Firestore')
+    rescore.add_argument('-o', '--output', default='rescore_deltas.csv', help='Per-domain deltas CSV')
+    rescore.add_argument('--summary', metavar='PATH', help='Write histograms and grade transitions as JSON')
+    rescore.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    rescore.add_argument('--chunk-size', type=int, default=5000, help='Analyses scored per task')
+    rescore.add_argument('--page-size', type=int, default=1000, help='Firestore page size')
+    rescore.add_argument('--limit', type=int, default=None, help='Stop after this many Firestore documents')
+    rescore.add_argument('--all-analyses', action='store_true',
+                         help='Rescore every stored analysis instead of the latest per domain')
+    rescore.add_argument('--changed-only', action='store_true', help='Only write rows whose score or grade changed')
+    rescore.set_defaults(func=_cmd_rescore)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO)
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,304 @@
+import os
+import csv
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+RESULT_COLUMNS = [
+    'domain', 'score', 'grade', 'status', 'base_score', 'bonus_points', 'email_provider',
+    'has_mx', 'mx_count', 'mx_servers', 'has_spf', 'spf_record',
+    'has_dmarc', 'dmarc_record', 'has_dkim', 'dkim_selectors', 'error'
+]
+
+
+def read_domains(path: str) -> List[str]:
+    """Read a domain list, one per line; blank lines and '#' comments are skipped"""
+    domains = []
+    seen = set()
+    with open(path, 'r') as f:
+        for line in f:
+            domain = line.strip().lower()
+            if not domain or domain.startswith('#'):
+                continue
+            domain = domain.replace('http://', '').replace('https://', '').replace('www.', '').rstrip('/')
+            if domain not in seen:
+                seen.add(domain)
+                domains.append(domain)
+    return domains
+
+
+def _flatten_result(domain: str, mx_result, spf_result, dmarc_result, dkim_result,
+                    email_provider: str, security_score: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten one analysis into a result row"""
+    return {
+        'domain': domain,
+        'score': security_score['score'],
+        'grade': security_score['grade'],
+        'status': security_score['status'],
+        'base_score': security_score['base_score'],
+        'bonus_points': security_score['bonus_points'],
+        'email_provider': email_provider,
+        'has_mx': mx_result['has_mx'],
+        'mx_count': len(mx_result['records']),
+        'mx_servers': ';'.join(r['server'] for r in mx_result['records']),
+        'has_spf': spf_result['has_spf'],
+        'spf_record': spf_result['records'][0]['record'] if spf_result['records'] else '',
+        'has_dmarc': dmarc_result['has_dmarc'],
+        'dmarc_record': dmarc_result['records'][0]['record'] if dmarc_result['records'] else '',
+        'has_dkim': dkim_result['has_dkim'],
+        'dkim_selectors': ';'.join(r['selector'] for r in dkim_result['records']),
+        'error': '; '.join(f"{component} lookup failed: {result['lookup_error']}"
+                           for component, result in (('mx', mx_result), ('spf', spf_result), ('dmarc', dmarc_result))
+                           if result.get('lookup_error'))
+    }
+
+
+def _error_row(domain: str, error: str) -> Dict[str, Any]:
+    row = {column: None for column in RESULT_COLUMNS}
+    row['domain'] = domain
+    row['error'] = error
+    return row
+
+
+async def _scan_domains(domains: List[str], concurrency: int, timeout: float) -> List[Dict[str, Any]]:
+    """Analyze a shard of domains on one event loop with bounded concurrency"""
+    import dns.asyncresolver
+    from dkim_optimizer import DKIMOptimizer
+    from features import extract_features
+    from domain_analysis import (
+        get_mx_details_async, get_spf_details_async, get_dmarc_details_async,
+        get_dkim_details_async, get_security_score
+    )
+
+    resolver = dns.asyncresolver.Resolver(configure=True)
+    resolver.lifetime = timeout
+    optimizer = DKIMOptimizer()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def scan(domain):
+        async with semaphore:
+            try:
+                mx_result, spf_result, dmarc_result = await asyncio.gather(
+                    get_mx_details_async(domain, resolver),
+                    get_spf_details_async(domain, resolver),
+                    get_dmarc_details_async(domain, resolver)
+                )
+                mx_servers = [r['server'] for r in mx_result['records']]
+                dkim_result = await get_dkim_details_async(domain, optimizer, mx_servers)
+                features = extract_features(mx_result, spf_result, dmarc_result, dkim_result)
+                security_score = get_security_score(mx_result, spf_result, dmarc_result, dkim_result, features)
+                return _flatten_result(domain, mx_result, spf_result, dmarc_result, dkim_result,
+                                       features.email_provider, security_score)
+            except Exception as e:
+                return _error_row(domain, str(e))
+
+    return await asyncio.gather(*(scan(domain) for domain in domains))
+
+
+def _retry_path(part_path: Path) -> Path:
+    """Domains of a written shard that errored and are scanned again on resume"""
+    return part_path.with_name(part_path.name + '.retry')
+
+
+def _write_retry(domains: List[str], part_path: Path):
+    retry_path = _retry_path(part_path)
+    tmp_path = retry_path.with_name(retry_path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(domains, f)
+    os.replace(tmp_path, retry_path)
+
+
+def _read_part(path: Path, output_format: str) -> List[Dict[str, Any]]:
+    if output_format == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(path).to_pylist()
+    with open(path, 'r', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def _write_part(rows: List[Dict[str, Any]], path: Path, output_format: str):
+    """Write a shard's rows atomically so a present part file marks the shard written"""
+    tmp_path = path.with_name(path.name + '.tmp')
+    if output_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pylist(rows, schema=_parquet_schema())
+        pq.write_table(table, tmp_path)
+    else:
+        with open(tmp_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
+def _parquet_schema():
+    import pyarrow as pa
+    types = {
+        'score': pa.float64(), 'base_score': pa.float64(), 'bonus_points': pa.float64(),
+        'mx_count': pa.int32(), 'has_mx': pa.bool_(), 'has_spf': pa.bool_(),
+        'has_dmarc': pa.bool_(), 'has_dkim': pa.bool_()
+    }
+    return pa.schema([(column, types.get(column, pa.string())) for column in RESULT_COLUMNS])
+
+
+def _scan_shard(shard_index: int, domains: List[str], part_path: str, output_format: str,
+                concurrency: int, timeout: float) -> Dict[str, Any]:
+    """Process-pool entry point: scan one shard and write its part file.
+
+    When the part file is already written, only the domains in its retry file are
+    scanned again and their rows replaced. Domains whose row still has an error stay
+    in the retry file; the retry file is written before the part file and removed
+    after it, so a crash never leaves a failed domain marked done.
+    """
+    start_time = time.time()
+    path = Path(part_path)
+    retry_path = _retry_path(path)
+    rows = None
+    if path.exists() and retry_path.exists():
+        with open(retry_path, 'r') as f:
+            retry = set(json.load(f))
+        rows = _read_part(path, output_format)
+        domains = [row['domain'] for row in rows if row['domain'] in retry]
+
+    scanned = asyncio.run(_scan_domains(domains, concurrency, timeout))
+    if rows is None:
+        rows = scanned
+    else:
+        rescanned = {row['domain']: row for row in scanned}
+        rows = [rescanned.get(row['domain'], row) for row in rows]
+
+    failed = [row['domain'] for row in rows if row['error']]
+    if failed:
+        _write_retry(failed, path)
+    _write_part(rows, path, output_format)
+    if not failed and retry_path.exists():
+        os.remove(retry_path)
+    return {
+        'shard': shard_index,
+        'domains': len(scanned),
+        'errors': sum(1 for row in scanned if row['error']),
+        'retry_domains': len(failed),
+        'duration': time.time() - start_time
+    }
+
+
+class BatchScanner:
+    """Offline scanner sharding a domain list across a process pool with resumable output"""
+
+    def __init__(self, output_dir: str, output_format: str = 'csv', workers: Optional[int] = None,
+                 shard_size: int = 1000, concurrency: int = 100, timeout: float = 5.0):
+        if output_format not in ('csv', 'parquet'):
+            raise ValueError(f"Unsupported output format: {output_format}")
+        if output_format == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+
+        self.output_dir = Path(output_dir)
+        self.output_format = output_format
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def _part_path(self, shard_index: int) -> Path:
+        return self.output_dir / f"part-{shard_index:06d}.{self.output_format}"
+
+    def _check_manifest(self, input_path: str, total: int):
+        """Refuse to resume into an output directory written for a different input"""
+        manifest_path = self.output_dir / 'manifest.json'
+        manifest = {
+            'input': os.path.abspath(input_path),
+            'total_domains': total,
+            'shard_size': self.shard_size,
+            'format': self.output_format
+        }
+        if manifest_path.exists():
+            with open(manifest_path, 'r') as f:
+                existing = json.load(f)
+            if existing != manifest:
+                raise RuntimeError(f"{manifest_path} belongs to a different scan; use a new output directory")
+        else:
+            with open(manifest_path, 'w') as f:
+                json.dump(manifest, f, indent=2)
+
+    def scan(self, input_path: str) -> Dict[str, Any]:
+        """Scan every domain in input_path, skipping shards completed by earlier runs"""
+        domains = read_domains(input_path)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._check_manifest(input_path, len(domains))
+
+        shards = [domains[i:i + self.shard_size] for i in range(0, len(domains), self.shard_size)]
+        # Shards are pending until written, and again while they have domains to retry
+        pending = [i for i in range(len(shards))
+                   if not self._part_path(i).exists() or _retry_path(self._part_path(i)).exists()]
+        logger.info(f"Scanning {len(domains)} domains in {len(shards)} shards "
+                    f"({len(shards) - len(pending)} already complete) with {self.workers} workers")
+
+        start_time = time.time()
+        scanned = 0
+        errors = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(_scan_shard, i, shards[i], str(self._part_path(i)), self.output_format,
+                                self.concurrency, self.timeout): i
+                for i in pending
+            }
+            for future in as_completed(futures):
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    logger.error(f"Shard {futures[future]} failed, it will be retried on resume: {e}")
+                    continue
+                scanned += stats['domains']
+                errors += stats['errors']
+                elapsed = time.time() - start_time
+                logger.info(f"Shard {stats['shard']} done in {stats['duration']:.1f}s "
+                            f"({scanned} domains, {scanned / elapsed:.0f} domains/s)")
+
+        return {
+            'total_domains': len(domains),
+            'shards': len(shards),
+            'scanned': scanned,
+            'errors': errors,
+            'incomplete_shards': sum(1 for i in range(len(shards)) if not self._part_path(i).exists()),
+            'retry_domains': sum(len(json.loads(_retry_path(self._part_path(i)).read_text()))
+                                 for i in range(len(shards)) if _retry_path(self._part_path(i)).exists()),
+            'duration': time.time() - start_time
+        }
+
+    def iter_part_paths(self) -> Iterator[Path]:
+        return iter(sorted(self.output_dir.glob(f"part-*.{self.output_format}")))
+
+    def merge(self, output_path: str) -> int:
+        """Combine part files into a single CSV or Parquet file"""
+        rows = 0
+        if self.output_format == 'parquet':
+            import pyarrow.parquet as pq
+            writer = None
+            for part in self.iter_part_paths():
+                table = pq.read_table(part)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+                rows += table.num_rows
+            if writer:
+                writer.close()
+        else:
+            with open(output_path, 'w', newline='') as out:
+                writer = csv.DictWriter(out, fieldnames=RESULT_COLUMNS)
+                writer.writeheader()
+                for part in self.iter_part_paths():
+                    with open(part, 'r', newline='') as f:
+                        for row in csv.DictReader(f):
+                            writer.writerow(row)
+                            rows += 1
+        return rows
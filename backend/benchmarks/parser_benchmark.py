@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the SPF/DMARC/DKIM record parsers.
+
+Parses a synthetic corpus in which record texts recur across domains (as shared
+SPF includes and provider DKIM keys do in practice) and reports throughput of the
+uncached parsers, the memoized parsers, and the DKIM DER key decode.
+
+Usage (from backend/):
+    python benchmarks/parser_benchmark.py
+    python benchmarks/parser_benchmark.py --records 200000 --distinct 2000 --json
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers import parse_spf_record, parse_dmarc_record, parse_dkim_record, dkim_key_info  # noqa: E402
+
+SPF_TERMS = ['include:_spf.google.com', 'include:spf.protection.outlook.com', 'include:sendgrid.net',
+             'include:mailgun.org', 'ip4:192.0.2.0/24', 'ip6:2001:db8::/32', 'a', 'mx', 'redirect=_spf.example.com']
+SPF_POLICIES = ['-all', '~all', '?all', '+all', '']
+DMARC_POLICIES = ['none', 'quarantine', 'reject']
+
+
+def _der(tag: int, contents: bytes) -> bytes:
+    length = len(contents)
+    if length < 0x80:
+        return bytes([tag, length]) + contents
+    size = (length.bit_length() + 7) // 8
+    return bytes([tag, 0x80 | size]) + length.to_bytes(size, 'big') + contents
+
+
+def _rsa_public_key(bits: int, rng: random.Random) -> str:
+    """Base64 SubjectPublicKeyInfo with a random modulus of the given size"""
+    modulus = rng.getrandbits(bits) | (1 << (bits - 1)) | 1
+    integer = _der(0x02, b'\x00' + modulus.to_bytes(bits // 8, 'big'))
+    rsa_key = _der(0x30, integer + _der(0x02, b'\x01\x00\x01'))
+    algorithm = _der(0x30, _der(0x06, bytes.fromhex('2a864886f70d010101')) + b'\x05\x00')
+    return base64.b64encode(_der(0x30, algorithm + _der(0x03, b'\x00' + rsa_key))).decode()
+
+
+def build_corpus(records: int, distinct: int, seed: int) -> Dict[str, List[str]]:
+    """Record texts per type, drawn from `distinct` variants so that texts repeat"""
+    rng = random.Random(seed)
+    spf = [' '.join(['v=spf1'] + rng.sample(SPF_TERMS, rng.randint(1, 4)) + [rng.choice(SPF_POLICIES)]).strip()
+           for _ in range(distinct)]
+    dmarc = [f"v=DMARC1; p={rng.choice(DMARC_POLICIES)}; pct={rng.choice([25, 50, 100])}; "
+             f"rua=mailto:dmarc-{i}@example.com; adkim={rng.choice('rs')}; aspf={rng.choice('rs')}"
+             for i in range(distinct)]
+    dkim = [f"v=DKIM1; k=rsa; p={_rsa_public_key(rng.choice([1024, 2048, 4096]), rng)}"
+            for _ in range(max(1, distinct // 10))]
+    return {
+        'spf': [rng.choice(spf) for _ in range(records)],
+        'dmarc': [rng.choice(dmarc) for _ in range(records)],
+        'dkim': [rng.choice(dkim) for _ in range(records)]
+    }
+
+
+def timed(parse: Callable, texts: List[str]) -> float:
+    start_time = time.perf_counter()
+    for text in texts:
+        parse(text)
+    return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the SPF/DMARC/DKIM record parsers')
+    parser.add_argument('--records', type=int, default=100000, help='Records parsed per type')
+    parser.add_argument('--distinct', type=int, default=1000, help='Distinct SPF/DMARC texts (DKIM keys: a tenth)')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.records, args.distinct, args.seed)
+    parsers = {'spf': parse_spf_record, 'dmarc': parse_dmarc_record, 'dkim': parse_dkim_record}
+
+    results = {}
+    for name, parse in parsers.items():
+        texts = corpus[name]
+        dkim_key_info.cache_clear()
+        uncached = timed(parse.__wrapped__, texts)
+        parse.cache_clear()
+        memoized = timed(parse, texts)
+        info = parse.cache_info()
+        results[name] = {
+            'uncached_per_sec': round(len(texts) / uncached),
+            'memoized_per_sec': round(len(texts) / memoized),
+            'speedup': round(uncached / memoized, 1),
+            'hit_rate': round(info.hits / (info.hits + info.misses), 3)
+        }
+
+    # DER decode alone, without the key cache
+    keys = [text.split('p=', 1)[1] for text in set(corpus['dkim'])]
+    decode_time = timed(dkim_key_info.__wrapped__, keys * max(1, 10000 // len(keys)))
+    results['dkim_key_decode_per_sec'] = round(len(keys) * max(1, 10000 // len(keys)) / decode_time)
+
+    if args.json:
+        print(json.dumps({'records': args.records, 'distinct': args.distinct, 'results': results}, indent=2))
+        return
+
+    print(f"{args.records} records per type, {args.distinct} distinct SPF/DMARC texts")
+    print(f"  {'parser':<8}{'uncached/s':>14}{'memoized/s':>14}{'speedup':>10}{'hit rate':>10}")
+    for name in parsers:
+        r = results[name]
+        print(f"  {name:<8}{r['uncached_per_sec']:>14,}{r['memoized_per_sec']:>14,}"
+              f"{r['speedup']:>9}x{r['hit_rate']:>10.1%}")
+    print(f"  DKIM DER key decode (uncached): {results['dkim_key_decode_per_sec']:,}/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Throughput and accuracy benchmark for the rate limiters.
+
+Drives RateLimiter.check_rate_limit and EnhancedRateLimiter.check_request from
+several processes with several threads each, against the in-memory path and a
+Redis server, for each limiting algorithm:
+
+    window        fixed windows behind the local pre-check (as configured)
+    window-exact  fixed windows, every check in Redis (local threshold 0)
+    gcra          GCRA with burst = requests_per_minute
+
+Each run has two phases. Throughput: every thread checks identifiers from a
+large pool under limits that are never reached, for --duration seconds, and the
+run reports ops/sec and p50/p99 check latency. Burst: every thread hits one
+fresh identifier at the same instant, --burst-factor times its limit in total,
+and the run reports how many requests were admitted beyond the limit.
+
+The 'fakeredis' backend serves a fakeredis TCP server from this process (pip
+install 'fakeredis[lua]'); it is a Python stand-in, so its latencies are far
+above a real Redis and only the relative numbers and the burst accuracy carry
+over. Pass --redis-url to run against a real server as the 'redis' backend.
+In-memory state is per process, so with --processes N the memory path admits
+up to N times the limit.
+
+Usage (from backend/, with config/ present):
+    python benchmarks/rate_limiter_benchmark.py
+    python benchmarks/rate_limiter_benchmark.py --processes 4 --threads 8 --targets rate_limiter
+    python benchmarks/rate_limiter_benchmark.py --backends redis --redis-url redis://localhost:6379 --json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import socket
+import logging
+import argparse
+import threading
+import multiprocessing
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('WARMUP_ENABLED', 'false')
+
+ALGORITHMS = ('window', 'window-exact', 'gcra')
+TARGETS = ('rate_limiter', 'enhanced')
+UNREACHABLE = 10 ** 7  # per minute; GCRA's emission interval must stay well above float resolution
+
+
+def tier_limits(algorithm: str, per_minute: int) -> Dict[str, Any]:
+    if algorithm == 'gcra':
+        return {'algorithm': 'gcra', 'requests_per_minute': per_minute}
+    # Hour and day limits out of the way, so the minute window is the one measured
+    return {'requests_per_minute': per_minute, 'requests_per_hour': UNREACHABLE, 'requests_per_day': UNREACHABLE}
+
+
+def configure(backend: str, redis_url: str, algorithm: str):
+    """Point this process's shared Redis client at the backend and set the pre-check"""
+    import rate_limiter
+    from redis_pool import redis_manager
+    if backend == 'memory':
+        redis_manager._client, redis_manager._connected = None, True
+    else:
+        redis_manager.url = redis_url
+    if backend == 'fakeredis':
+        # The stand-in answers far slower than Redis; don't let the breaker read that as an outage
+        redis_manager.socket_timeout = redis_manager.connect_timeout = 10
+    if algorithm == 'window-exact':
+        rate_limiter.local_window_cache.local_threshold = 0
+
+
+def make_check(target: str, algorithm: str, limit: int):
+    """check(identifier, tier) -> allowed through the given limiter, with tiers
+    'bench' (never reached) and 'burst' (limit per minute)"""
+    tiers = {'bench': tier_limits(algorithm, UNREACHABLE), 'burst': tier_limits(algorithm, limit)}
+
+    if target == 'rate_limiter':
+        from rate_limiter import RateLimiter
+        limiter = RateLimiter()
+        limiter.rate_limits.update(tiers)
+        return lambda identifier, tier: limiter.check_rate_limit(identifier, tier)[0]
+
+    import app_with_security
+    from api_key_registry import TierResolution
+    logging.getLogger().setLevel(logging.WARNING)
+    limiter = app_with_security.EnhancedRateLimiter()
+    limiter.limits = dict(limiter.limits, **tiers)
+    # Keep the per-domain and global dimensions in the check, but out of reach of the throughput phase
+    for dimension in app_with_security.RATE_LIMIT_DIMENSIONS:
+        app_with_security.RATE_LIMIT_DIMENSIONS[dimension] = tier_limits('window', UNREACHABLE)
+    resolutions = {tier: TierResolution(tier) for tier in tiers}
+    return lambda identifier, tier: limiter.check_request(identifier, resolutions[tier])[0]
+
+
+def sleep_until(at: float):
+    delay = at - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def worker_process(config: Dict[str, Any], results):
+    """One process: --threads threads through the throughput phase, then the burst"""
+    configure(config['backend'], config['redis_url'], config['algorithm'])
+    check = make_check(config['target'], config['algorithm'], config['limit'])
+    threads = config['threads']
+    latencies: List[List[int]] = [[] for _ in range(threads)]
+    admitted = [0] * threads
+    late = time.time() > config['start_at']
+
+    def run(index):
+        perf_counter_ns = time.perf_counter_ns
+        identifiers = [f"{config['run_id']}-{i}" for i in range(index, config['identifiers'], threads)] or ['idle']
+        samples = latencies[index]
+        sleep_until(config['start_at'])
+        end_at = config['start_at'] + config['duration']
+        i = 0
+        while time.time() < end_at:
+            start_ns = perf_counter_ns()
+            check(identifiers[i % len(identifiers)], 'bench')
+            samples.append(perf_counter_ns() - start_ns)
+            i += 1
+
+        burst_identifier = f"{config['run_id']}-burst"
+        sleep_until(config['burst_at'])
+        for _ in range(config['burst_requests']):
+            admitted[index] += check(burst_identifier, 'burst')
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results.put({
+        'latencies': [sample for samples in latencies for sample in samples],
+        'admitted': sum(admitted),
+        'burst_seconds': time.time() - config['burst_at'],
+        'late': late
+    })
+
+
+def percentile(sorted_samples: List[int], fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))]
+
+
+def run_scenario(context, args, target: str, backend: str, algorithm: str, redis_url: str) -> Dict[str, Any]:
+    workers = args.processes * args.threads
+    burst_total = args.limit * args.burst_factor
+    start_at = time.time() + args.startup
+    burst_at = start_at + args.duration + 0.5
+    if algorithm != 'gcra' and 60 - burst_at % 60 < 5:
+        burst_at += 60 - burst_at % 60  # keep the burst inside one minute window
+
+    config = {
+        'target': target, 'backend': backend, 'algorithm': algorithm, 'redis_url': redis_url,
+        'run_id': uuid.uuid4().hex[:12], 'threads': args.threads, 'identifiers': args.identifiers,
+        'duration': args.duration, 'limit': args.limit, 'burst_requests': math.ceil(burst_total / workers),
+        'start_at': start_at, 'burst_at': burst_at
+    }
+    results = context.Queue()
+    processes = [context.Process(target=worker_process, args=(config, results)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    outputs = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sorted(sample for output in outputs for sample in output['latencies'])
+    admitted = sum(output['admitted'] for output in outputs)
+    expected = args.limit
+    if algorithm == 'gcra':
+        # GCRA keeps replenishing during the burst: one request per 60/limit seconds
+        expected += int(max(output['burst_seconds'] for output in outputs) / (60 / args.limit))
+    return {
+        'target': target,
+        'backend': backend,
+        'algorithm': algorithm,
+        'ops_per_sec': round(len(latencies) / args.duration),
+        'p50_us': round(percentile(latencies, 0.50) / 1000, 1),
+        'p99_us': round(percentile(latencies, 0.99) / 1000, 1),
+        'burst_requests': config['burst_requests'] * workers,
+        'burst_admitted': admitted,
+        'burst_expected': expected,
+        'overshoot': admitted - expected,
+        'late_start': any(output['late'] for output in outputs)
+    }
+
+
+def start_fakeredis() -> str:
+    """Serve a fakeredis TCP server from a daemon thread; returns its URL"""
+    import fakeredis
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    server = fakeredis.TcpFakeServer(('127.0.0.1', port), server_type='redis')
+    threading.Thread(target=server.serve_forever, name='fakeredis', daemon=True).start()
+    url = f'redis://127.0.0.1:{port}'
+
+    # The TCP stand-in drops a connection after a NOSCRIPT reply, so the limiters'
+    # EVALSHA-then-load fallback never succeeds there; load the scripts up front
+    import redis
+    from rate_limiter import WINDOW_SCRIPT, GCRA_SCRIPT
+    client = redis.Redis.from_url(url, socket_connect_timeout=5)
+    for script in (WINDOW_SCRIPT, GCRA_SCRIPT):
+        client.script_load(script)
+    client.close()
+    return url
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark rate limiter throughput, latency and burst accuracy')
+    parser.add_argument('--targets', default=','.join(TARGETS), help='rate_limiter and/or enhanced')
+    parser.add_argument('--backends', default='memory,fakeredis', help='memory, fakeredis and/or redis')
+    parser.add_argument('--algorithms', default=','.join(ALGORITHMS), help=', '.join(ALGORITHMS))
+    parser.add_argument('--redis-url', default=None, help="Redis server for the 'redis' backend")
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='Threads per process')
+    parser.add_argument('--duration', type=float, default=2, help='Seconds of the throughput phase')
+    parser.add_argument('--identifiers', type=int, default=1000, help='Identifiers in the throughput phase')
+    parser.add_argument('--limit', type=int, default=100, help='Per-minute limit in the burst phase')
+    parser.add_argument('--burst-factor', type=int, default=5, help='Burst size as a multiple of the limit')
+    parser.add_argument('--startup', type=float, default=4, help='Seconds allowed for worker processes to start')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    backends = args.backends.split(',')
+    if 'redis' in backends and not args.redis_url:
+        parser.error("the 'redis' backend needs --redis-url")
+    urls = {'memory': None, 'redis': args.redis_url}
+    if 'fakeredis' in backends:
+        try:
+            urls['fakeredis'] = start_fakeredis()
+        except ImportError:
+            print("fakeredis not installed, skipping that backend (pip install 'fakeredis[lua]')", file=sys.stderr)
+            backends.remove('fakeredis')
+
+    context = multiprocessing.get_context('spawn')
+    results = [run_scenario(context, args, target, backend, algorithm, urls[backend])
+               for target in args.targets.split(',')
+               for backend in backends
+               for algorithm in args.algorithms.split(',')]
+
+    if args.json:
+        print(json.dumps({'processes': args.processes, 'threads': args.threads, 'limit': args.limit,
+                          'results': results}, indent=2))
+        return
+
+    print(f"{args.processes} processes x {args.threads} threads, {args.duration}s throughput phase, "
+          f"burst of {args.burst_factor}x a {args.limit}/min limit")
+    print(f"  {'target':<14}{'backend':<11}{'algorithm':<14}{'ops/s':>10}{'p50 us':>9}{'p99 us':>9}"
+          f"{'admitted':>10}{'expected':>10}{'overshoot':>10}")
+    for r in results:
+        print(f"  {r['target']:<14}{r['backend']:<11}{r['algorithm']:<14}{r['ops_per_sec']:>10,}{r['p50_us']:>9}"
+              f"{r['p99_us']:>9}{r['burst_admitted']:>10}{r['burst_expected']:>10}{r['overshoot']:>+10}"
+              f"{'  (late start, raise --startup)' if r['late_start'] else ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the backend.
+
+Reports per-module import times (from python -X importtime) and the time from
+process start until /api/health first answers 200, over several fresh processes.
+
+Usage (from backend/, with config/ present):
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --runs 5 --top 20 --module app_with_security
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure_imports(module: str, cwd: str) -> Tuple[Dict[str, Tuple[int, int]], List[str]]:
+    """Import a module in a fresh interpreter; return {module: (self_us, cumulative_us)} and top-level imports"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get('PYTHONPATH')])),
+               WARMUP_ENABLED='false')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=cwd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = {}
+    top_level = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        timings[name] = (int(self_us), int(cumulative_us))
+        if len(indent) <= 1:
+            top_level.append(name)
+    return timings, top_level
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def measure_first_health(module: str, cwd: str, timeout: float) -> float:
+    """Seconds from spawning the server until /api/health returns 200"""
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get('PYTHONPATH')])))
+    code = f"import {module} as m; m.app.run(host='127.0.0.1', port={port}, debug=False, use_reloader=False)"
+    url = f'http://127.0.0.1:{port}/api/health'
+
+    start_time = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=cwd, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start_time < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode} before becoming healthy")
+            try:
+                remaining = max(1.0, timeout - (time.perf_counter() - start_time))
+                with urllib.request.urlopen(url, timeout=remaining) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start_time
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError(f"/api/health not healthy after {timeout}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure backend cold-start import time and time to first healthy /api/health')
+    parser.add_argument('--module', default='app_with_security', help='App module to import/serve')
+    parser.add_argument('--cwd', default=BACKEND_DIR, help='Working directory (must contain config/)')
+    parser.add_argument('--runs', type=int, default=3, help='Fresh processes per measurement')
+    parser.add_argument('--top', type=int, default=15, help='Slowest modules to list')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait for /api/health')
+    parser.add_argument('--skip-health', action='store_true', help='Only measure imports')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    # Median of each module's cumulative/self import time across runs
+    samples = {}
+    top_level = []
+    for _ in range(args.runs):
+        timings, top_level = measure_imports(args.module, args.cwd)
+        for name, (self_us, cumulative_us) in timings.items():
+            samples.setdefault(name, ([], []))
+            samples[name][0].append(self_us)
+            samples[name][1].append(cumulative_us)
+    imports = {name: (statistics.median(s), statistics.median(c)) for name, (s, c) in samples.items()}
+    total_ms = imports.get(args.module, (0, 0))[1] / 1000
+
+    health_times = []
+    if not args.skip_health:
+        health_times = [measure_first_health(args.module, args.cwd, args.timeout) for _ in range(args.runs)]
+
+    slowest = sorted(imports.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+    first_party = sorted(
+        (name for name in imports if os.path.exists(os.path.join(BACKEND_DIR, f'{name}.py'))),
+        key=lambda name: imports[name][1], reverse=True
+    )
+
+    if args.json:
+        print(json.dumps({
+            'module': args.module,
+            'runs': args.runs,
+            'import_ms': total_ms,
+            'first_health_ms': [round(t * 1000, 1) for t in health_times],
+            'modules': {name: {'self_ms': s / 1000, 'cumulative_ms': c / 1000} for name, (s, c) in imports.items()},
+            'top_level': top_level
+        }, indent=2))
+        return
+
+    print(f"Import of {args.module}: {total_ms:.0f}ms (median of {args.runs} runs)")
+    if health_times:
+        print(f"First healthy /api/health: median {statistics.median(health_times) * 1000:.0f}ms "
+              f"(min {min(health_times) * 1000:.0f}ms, max {max(health_times) * 1000:.0f}ms)")
+
+    print(f"\nSlowest imports (cumulative):")
+    print(f"  {'module':<50}{'self ms':>10}{'cumul ms':>10}")
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"  {name:<50}{self_us / 1000:>10.1f}{cumulative_us / 1000:>10.1f}")
+
+    print(f"\nBackend modules:")
+    for name in first_party:
+        self_us, cumulative_us = imports[name]
+        print(f"  {name:<50}{self_us / 1000:>10.1f}{cumulative_us / 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import os
+import time
+import random
+import logging
+import threading
+from typing import Dict, Any, List, Callable
+
+from analysis_cache import AnalysisCache
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ENABLED = os.environ.get('PREWARM_ENABLED', 'false').lower() == 'true'
+PREWARM_TOP_N = int(os.environ.get('PREWARM_TOP_N', '100'))
+PREWARM_INTERVAL = int(os.environ.get('PREWARM_INTERVAL', '300'))  # seconds between cycles
+PREWARM_REFRESH_AHEAD = int(os.environ.get('PREWARM_REFRESH_AHEAD', '300'))  # seconds before TTL expiry
+PREWARM_QUERY_BUDGET = int(os.environ.get('PREWARM_QUERY_BUDGET', '1000'))  # DNS queries per cycle
+PREWARM_JITTER = float(os.environ.get('PREWARM_JITTER', '0.2'))
+PREWARM_TOP_DOMAINS_TTL = int(os.environ.get('PREWARM_TOP_DOMAINS_TTL', '3600'))
+
+
+class CachePrewarmer:
+    """Background job keeping cached analyses of popular domains warm"""
+
+    def __init__(self, cache: AnalysisCache, refreshers: Dict[str, Callable[[str], Dict[str, Any]]],
+                 top_domains_fn: Callable[[int], List[str]], top_n: int = PREWARM_TOP_N,
+                 interval: int = PREWARM_INTERVAL, refresh_ahead: int = PREWARM_REFRESH_AHEAD,
+                 query_budget: int = PREWARM_QUERY_BUDGET, jitter: float = PREWARM_JITTER):
+        # Refreshers run in insertion order, so MX should come before DKIM
+        self.cache = cache
+        self.refreshers = refreshers
+        self.top_domains_fn = top_domains_fn
+        self.top_n = top_n
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.query_budget = query_budget
+        self.jitter = jitter
+
+        self._top_domains = []
+        self._top_domains_loaded_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_run = {}
+
+    def start(self):
+        """Start the pre-warm loop in a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_loop, name='cache-prewarmer', daemon=True)
+        self._thread.start()
+        logger.info(f"Cache pre-warmer started (top {self.top_n} domains, budget {self.query_budget} queries/cycle)")
+
+    def stop(self):
+        """Stop the pre-warm loop"""
+        self._stop.set()
+
+    def _run_loop(self):
+        # Stagger the first cycle so instances started together don't hit DNS at once
+        self._stop.wait(random.uniform(0, self.interval * self.jitter))
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Cache pre-warm cycle failed: {e}")
+            delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            self._stop.wait(delay)
+
+    def get_top_domains(self) -> List[str]:
+        """Get popular domains, re-reading the analysis history at most once per TTL"""
+        now = time.time()
+        if not self._top_domains or now - self._top_domains_loaded_at > PREWARM_TOP_DOMAINS_TTL:
+            domains = self.top_domains_fn(self.top_n)
+            if domains:
+                self._top_domains = domains
+                self._top_domains_loaded_at = now
+        return self._top_domains
+
+    def _is_due(self, domain: str) -> bool:
+        """Check whether a domain's cached analysis expires within its jittered refresh window"""
+        expires_in = self.cache.expires_in(domain, self.refreshers.keys())
+        if expires_in is None:
+            return True
+        return expires_in < self.refresh_ahead * random.uniform(1 - self.jitter, 1)
+
+    def run_once(self) -> Dict[str, Any]:
+        """Refresh due domains in popularity order until the query budget is spent"""
+        start_time = time.time()
+        queries_used = 0
+        refreshed = []
+
+        for domain in self.get_top_domains():
+            if queries_used >= self.query_budget:
+                break
+            if not self._is_due(domain):
+                continue
+
+            for component, refresh in self.refreshers.items():
+                try:
+                    result = refresh(domain)
+                except Exception as e:
+                    logger.warning(f"Pre-warm {component} refresh failed for {domain}: {e}")
+                    result = {}
+                # DKIM reports how many selectors it probed; other lookups are one query each
+                queries_used += max(1, (result or {}).get('selectors_checked', 1))
+            refreshed.append(domain)
+
+        self.last_run = {
+            'refreshed': len(refreshed),
+            'queries_used': queries_used,
+            'query_budget': self.query_budget,
+            'duration': round(time.time() - start_time, 3),
+            'finished_at': time.time()
+        }
+        if refreshed:
+            logger.info(f"Pre-warmed {len(refreshed)} domains using {queries_used} DNS queries")
+        return self.last_run
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pre-warmer statistics"""
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'top_domains': len(self._top_domains),
+            'last_run': self.last_run
+        }
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from scoring_engine import SCORING_LOGIC_VERSION
+
+logger = logging.getLogger(__name__)
+
+CHANGE_DETECTION_MAX_DOMAINS = int(os.environ.get('CHANGE_DETECTION_MAX_DOMAINS', '10000'))
+SEEN_UPDATE_INTERVAL = int(os.environ.get('SEEN_UPDATE_INTERVAL', '60'))  # seconds
+
+
+def compute_fingerprint(mx_result: Dict[str, Any], spf_result: Dict[str, Any], dmarc_result: Dict[str, Any],
+                        dkim_result: Dict[str, Any], config_version: str) -> str:
+    """Hash the normalized MX/SPF/DMARC/DKIM RRsets together with the scoring config and logic versions"""
+    normalized = {
+        'mx': sorted([r.get('priority'), str(r.get('server', '')).lower().rstrip('.')]
+                     for r in mx_result.get('records', [])),
+        'spf': sorted(r.get('record', '') for r in spf_result.get('records', [])),
+        'dmarc': sorted(r.get('record', '') for r in dmarc_result.get('records', [])),
+        'dkim': sorted([r.get('selector', ''), r.get('full_record', r.get('record', ''))]
+                       for r in dkim_result.get('records', [])),
+        'config_version': config_version,
+        'scoring_logic_version': SCORING_LOGIC_VERSION
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ChangeDetector:
+    """Tracks the last stored analysis per domain so unchanged re-checks can skip rescoring"""
+
+    def __init__(self, firestore_manager, max_domains: int = CHANGE_DETECTION_MAX_DOMAINS,
+                 seen_update_interval: int = SEEN_UPDATE_INTERVAL):
+        self.firestore_manager = firestore_manager
+        self.max_domains = max_domains
+        self.seen_update_interval = seen_update_interval
+        self.known = OrderedDict()  # domain -> {'fingerprint', 'id', 'analysis_results', 'seen_recorded_at'}
+        self.lock = threading.Lock()
+        self.unchanged_hits = 0
+        self.changed = 0
+
+    def _get_previous(self, domain: str) -> Optional[Dict[str, Any]]:
+        """Get the last known analysis, from memory or the latest stored document"""
+        with self.lock:
+            previous = self.known.get(domain)
+            if previous:
+                self.known.move_to_end(domain)
+                return previous
+
+        latest = self.firestore_manager.get_latest_analysis(domain)
+        if not latest or not latest.get('fingerprint'):
+            return None
+        previous = {
+            'fingerprint': latest['fingerprint'],
+            'id': latest['id'],
+            'analysis_results': latest['analysis_results'],
+            'seen_recorded_at': 0.0
+        }
+        self._store(domain, previous)
+        return previous
+
+    def _store(self, domain: str, entry: Dict[str, Any]):
+        with self.lock:
+            self.known[domain] = entry
+            self.known.move_to_end(domain)
+            while len(self.known) > self.max_domains:
+                self.known.popitem(last=False)
+
+    def find_unchanged(self, domain: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Return the previous analysis results if the fingerprint matches, else None"""
+        try:
+            previous = self._get_previous(domain)
+        except Exception as e:
+            logger.warning(f"Change detection lookup failed for {domain}: {e}")
+            return None
+
+        if not previous or previous['fingerprint'] != fingerprint:
+            self.changed += 1
+            return None
+
+        self.unchanged_hits += 1
+        self._record_seen(domain, previous)
+        return previous['analysis_results']
+
+    def _record_seen(self, domain: str, previous: Dict[str, Any]):
+        """Record a 'seen again' timestamp on the stored analysis, throttled per domain"""
+        now = time.time()
+        if now - previous['seen_recorded_at'] < self.seen_update_interval:
+            return
+        previous['seen_recorded_at'] = now
+        self.firestore_manager.mark_analysis_seen(previous['id'])
+
+    def remember(self, domain: str, fingerprint: str, doc_id: Optional[str], analysis_results: Dict[str, Any]):
+        """Remember a freshly stored analysis"""
+        if not doc_id:
+            return
+        self._store(domain, {
+            'fingerprint': fingerprint,
+            'id': doc_id,
+            'analysis_results': analysis_results,
+            'seen_recorded_at': time.time()
+        })
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get change detection statistics"""
+        return {
+            'tracked_domains': len(self.known),
+            'unchanged_hits': self.unchanged_hits,
+            'changed': self.changed
+        }
@@ -1,36 +1,225 @@
+import io
+import os
 import json
 import csv
-import pandas as pd
+import time
+import bisect
+import hashlib
+import threading
 import logging
-from typing import Dict, Any, List, Optional
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
+from lazy_imports import lazy_module
+
+pd = lazy_module('pandas')  # only needed to parse the CSVs, so the import waits for the first load
 
 logger = logging.getLogger(__name__)
 
+CONFIG_FILES = ('scoring_structure.json', 'rule_weights.csv', 'recommendations.csv', 'grading.csv')
+CONFIG_WATCH_INTERVAL = float(os.environ.get('CONFIG_WATCH_INTERVAL', '0'))  # seconds, 0 disables
+
+DEFAULT_GRADE = MappingProxyType({
+    'grade': 'F',
+    'description': 'No email security',
+    'color': '#F44336',
+    'min_score': 0
+})
+
+# Recommendation fields returned to clients, and the order of recommendation types
+RECOMMENDATION_FIELDS = ('component', 'type', 'priority', 'title', 'description', 'impact', 'effort',
+                         'action', 'example', 'estimated_time', 'technical_details')
+RECOMMENDATION_TYPE_ORDER = {'critical': 1, 'important': 2, 'info': 3}
+
+
+def _native(value):
+    """Convert numpy scalars from pandas rows to plain Python values"""
+    return value.item() if hasattr(value, 'item') else value
+
+
+class ScoringPlan:
+    """Immutable scoring configuration compiled from the JSON/CSV files at load time.
+
+    Rule points, component rules and the grade table become plain dict/tuple
+    lookups so scoring does no pandas work per request.
+    """
+
+    __slots__ = ('version', 'component_max_scores', 'component_rules', 'rule_points',
+                 'max_bonus_points', 'max_total_score', 'grade_thresholds', 'grades')
+
+    def __init__(self, scoring_structure: Dict[str, Any], rule_weights: 'pd.DataFrame', grading: 'pd.DataFrame'):
+        self.version = scoring_structure.get('version', '1.0.0')
+        self.component_max_scores = MappingProxyType({
+            name: component['max_score'] for name, component in scoring_structure['components'].items()
+        })
+        self.max_bonus_points = scoring_structure['max_bonus_points']
+        self.max_total_score = scoring_structure['max_total_score']
+
+        rule_points = {}
+        component_rules = {name: [] for name in scoring_structure['components']}
+        for row in rule_weights.to_dict('records'):
+            row = MappingProxyType({key: _native(value) for key, value in row.items()})
+            # First matching row wins, as with the DataFrame lookup
+            rule_points.setdefault((row['component'], row['rule'], row['condition']), float(row['points']))
+            if row['component'] in component_rules:
+                component_rules[row['component']].append(row)
+        self.rule_points = MappingProxyType(rule_points)
+        self.component_rules = MappingProxyType({name: tuple(rows) for name, rows in component_rules.items()})
+
+        # Ascending thresholds for bisect; the highest threshold <= score wins (earliest row on ties)
+        grade_rows = sorted(reversed(grading.to_dict('records')), key=lambda row: row['min_score'])
+        self.grade_thresholds = tuple(_native(row['min_score']) for row in grade_rows)
+        self.grades = tuple(MappingProxyType({
+            'grade': _native(row['grade']),
+            'description': _native(row['description']),
+            'color': _native(row['color']),
+            'min_score': _native(row['min_score'])
+        }) for row in grade_rows)
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError(f"ScoringPlan is immutable, cannot reassign {name}")
+        object.__setattr__(self, name, value)
+
+    def points(self, component: str, rule: str, condition: str) -> float:
+        """Get points for a specific rule condition"""
+        points = self.rule_points.get((component, rule, condition))
+        if points is None:
+            logger.warning(f"No rule found for {component}.{rule}.{condition}")
+            return 0.0
+        return points
+
+    def grade_for(self, score: float) -> MappingProxyType:
+        """Look up grade information for a score"""
+        index = bisect.bisect_right(self.grade_thresholds, score) - 1
+        return self.grades[index] if index >= 0 else DEFAULT_GRADE
+
+class RecommendationCatalog:
+    """Recommendations indexed by (component, condition) at load time.
+
+    Each entry is an immutable response record plus its precomputed sort key,
+    so generating recommendations is a dict hit per condition and one sort on tuples.
+    """
+
+    __slots__ = ('entries',)
+
+    def __init__(self, recommendations: 'pd.DataFrame'):
+        entries = {}
+        for row in recommendations.to_dict('records'):
+            key = (row['component'], row['condition'])
+            if key in entries:
+                continue  # First matching row wins, as with the DataFrame lookup
+            record = MappingProxyType({field: _native(row.get(field)) for field in RECOMMENDATION_FIELDS})
+            entries[key] = (record, self.sort_key(record))
+        object.__setattr__(self, 'entries', MappingProxyType(entries))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"RecommendationCatalog is immutable, cannot reassign {name}")
+
+    @staticmethod
+    def sort_key(record) -> Tuple[int, bool, bool]:
+        """Sort key: recommendation type, then the high-priority flag, then cross-component first"""
+        return (
+            RECOMMENDATION_TYPE_ORDER.get(record['type'], 4),
+            record['priority'] == 'high',
+            record['component'] != 'cross_component'
+        )
+
+    def get(self, component: str, condition: str) -> Optional[Tuple[MappingProxyType, Tuple[int, bool, bool]]]:
+        """Look up the (record, sort key) entry for a component condition"""
+        return self.entries.get((component, condition))
+
+class ConfigSnapshot:
+    """One fully loaded and compiled configuration, published as a unit"""
+
+    __slots__ = ('scoring_structure', 'rule_weights', 'recommendations', 'grading', 'plan',
+                 'recommendation_catalog', 'digest', 'version', 'generation', 'loaded_at')
+
+    def __init__(self, scoring_structure: Dict[str, Any], rule_weights: 'pd.DataFrame',
+                 recommendations: 'pd.DataFrame', grading: 'pd.DataFrame', digest: str, generation: int):
+        self.scoring_structure = scoring_structure
+        self.rule_weights = rule_weights
+        self.recommendations = recommendations
+        self.grading = grading
+        self.plan = ScoringPlan(scoring_structure, rule_weights, grading)
+        self.recommendation_catalog = RecommendationCatalog(recommendations)
+        self.digest = digest
+        # Declared version plus a content hash, so edited files always get a new version
+        self.version = f"{scoring_structure.get('version', '1.0.0')}+{digest[:8]}"
+        self.generation = generation
+        self.loaded_at = time.time()
+
 class ConfigLoader:
-    """Hybrid configuration loader for scoring system"""
+    """Hybrid configuration loader for scoring system.
+    
+    The loaded configuration is an immutable ConfigSnapshot; reloads build and
+    validate a new snapshot and publish it with a single reference swap, so
+    readers never see a half-loaded configuration.
+    """
     
-    def __init__(self, config_dir: str = 'config'):
+    def __init__(self, config_dir: str = 'config', lazy: bool = False):
         self.config_dir = Path(config_dir)
-        self.scoring_structure = None
-        self.rule_weights = None
-        self.recommendations = None
-        self.grading = None
-        self._load_all_configs()
+        self._snapshot = None
+        self._reload_lock = threading.Lock()
+        self._watch_stop = threading.Event()
+        self._watch_thread = None
+        # Lazy loaders parse the files (and import pandas) on first use or warm-up instead
+        if not lazy:
+            self._load_all_configs()
+    
+    def _current(self) -> ConfigSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._reload_lock:
+                if self._snapshot is None:
+                    self._load_all_configs()
+                snapshot = self._snapshot
+        return snapshot
+    
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+    
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        return self._current()
+    
+    @property
+    def scoring_structure(self) -> Dict[str, Any]:
+        return self._current().scoring_structure
+    
+    @property
+    def rule_weights(self) -> 'pd.DataFrame':
+        return self._current().rule_weights
+    
+    @property
+    def recommendations(self) -> 'pd.DataFrame':
+        return self._current().recommendations
+    
+    @property
+    def grading(self) -> 'pd.DataFrame':
+        return self._current().grading
+    
+    @property
+    def plan(self) -> ScoringPlan:
+        return self._current().plan
+    
+    @property
+    def recommendation_catalog(self) -> RecommendationCatalog:
+        return self._current().recommendation_catalog
+    
+    @property
+    def version(self) -> str:
+        return self._current().version
     
     def _load_all_configs(self):
         """Load all configuration files"""
         try:
-            # Load JSON structure
-            with open(self.config_dir / 'scoring_structure.json', 'r') as f:
-                self.scoring_structure = json.load(f)
-            
-            # Load CSV configurations
-            self.rule_weights = pd.read_csv(self.config_dir / 'rule_weights.csv')
-            self.recommendations = pd.read_csv(self.config_dir / 'recommendations.csv')
-            self.grading = pd.read_csv(self.config_dir / 'grading.csv')
-            
-            logger.info(f"Loaded configuration version {self.scoring_structure.get('version', 'unknown')}")
+            snapshot = self._build_snapshot(generation=1)
+            for error in self._validate(snapshot):
+                logger.warning(f"Configuration problem: {error}")
+            self._snapshot = snapshot
+            logger.info(f"Loaded configuration version {snapshot.version}")
             
         except FileNotFoundError as e:
             logger.error(f"Configuration file not found: {e}")
@@ -39,28 +228,41 @@ class ConfigLoader:
             logger.error(f"Error loading configuration: {e}")
             raise
     
+    def _read_files(self) -> Dict[str, bytes]:
+        """Read every configuration file's raw contents"""
+        contents = {}
+        for name in CONFIG_FILES:
+            with open(self.config_dir / name, 'rb') as f:
+                contents[name] = f.read()
+        return contents
+    
+    def _build_snapshot(self, generation: int, contents: Optional[Dict[str, bytes]] = None) -> ConfigSnapshot:
+        """Parse and compile configuration file contents into a new snapshot"""
+        if contents is None:
+            contents = self._read_files()
+        digest = hashlib.sha256(b''.join(
+            name.encode('utf-8') + b'\0' + contents[name] for name in CONFIG_FILES
+        )).hexdigest()
+        return ConfigSnapshot(
+            scoring_structure=json.loads(contents['scoring_structure.json']),
+            rule_weights=pd.read_csv(io.BytesIO(contents['rule_weights.csv'])),
+            recommendations=pd.read_csv(io.BytesIO(contents['recommendations.csv'])),
+            grading=pd.read_csv(io.BytesIO(contents['grading.csv'])),
+            digest=digest,
+            generation=generation
+        )
+    
     def get_component_rules(self, component: str) -> List[Dict[str, Any]]:
         """Get rules for a specific component"""
-        if component not in self.scoring_structure['components']:
+        rules = self.plan.component_rules.get(component)
+        if rules is None:
             logger.warning(f"Unknown component: {component}")
             return []
-        
-        rules = self.rule_weights[self.rule_weights['component'] == component]
-        return rules.to_dict('records')
+        return [dict(rule) for rule in rules]
     
     def get_rule_points(self, component: str, rule: str, condition: str) -> float:
         """Get points for a specific rule condition"""
-        rule_data = self.rule_weights[
-            (self.rule_weights['component'] == component) &
-            (self.rule_weights['rule'] == rule) &
-            (self.rule_weights['condition'] == condition)
-        ]
-        
-        if rule_data.empty:
-            logger.warning(f"No rule found for {component}.{rule}.{condition}")
-            return 0.0
-        
-        return float(rule_data.iloc[0]['points'])
+        return self.plan.points(component, rule, condition)
     
     def get_recommendations(self, component: str = None) -> List[Dict[str, Any]]:
         """Get recommendations, optionally filtered by component"""
@@ -72,20 +274,7 @@ class ConfigLoader:
     
     def get_grade(self, score: float) -> Dict[str, Any]:
         """Get grade information based on score"""
-        for _, row in self.grading.iterrows():
-            if score >= row['min_score']:
-                return {
-                    'grade': row['grade'],
-                    'description': row['description'],
-                    'color': row['color'],
-                    'min_score': row['min_score']
-                }
-        return {
-            'grade': 'F',
-            'description': 'No email security',
-            'color': '#F44336',
-            'min_score': 0
-        }
+        return dict(self.plan.grade_for(score))
     
     def get_status(self, score: float) -> str:
         """Get status description based on score"""
@@ -102,19 +291,31 @@ class ConfigLoader:
     
     def validate_configuration(self) -> List[str]:
         """Validate configuration integrity"""
+        return self._validate(self._current())
+    
+    @staticmethod
+    def _validate(snapshot: ConfigSnapshot) -> List[str]:
+        """Validate a snapshot's configuration integrity"""
         errors = []
+        rule_weights = snapshot.rule_weights
+        
+        missing_columns = {'component', 'rule', 'condition', 'points'} - set(rule_weights.columns)
+        if missing_columns:
+            return [f"rule_weights.csv is missing columns: {', '.join(sorted(missing_columns))}"]
         
         # Check if all components in structure have rules
-        for component in self.scoring_structure['components']:
-            component_rules = self.rule_weights[self.rule_weights['component'] == component]
-            if component_rules.empty:
+        for component in snapshot.scoring_structure['components']:
+            if not snapshot.plan.component_rules[component]:
                 errors.append(f"No rules found for component: {component}")
         
         # Check for duplicate rules
-        duplicates = self.rule_weights.duplicated(subset=['component', 'rule', 'condition'], keep=False)
+        duplicates = rule_weights.duplicated(subset=['component', 'rule', 'condition'], keep=False)
         if duplicates.any():
             errors.append("Duplicate rules found in rule_weights.csv")
         
+        if not snapshot.plan.grades:
+            errors.append("No grades found in grading.csv")
+        
         return errors
     
     def export_configs_to_csv(self):
@@ -134,8 +335,65 @@ class ConfigLoader:
         pd.DataFrame(rules_data).to_csv(self.config_dir / 'rule_weights_template.csv', index=False)
         logger.info("Exported rule_weights_template.csv")
     
-    def reload_configs(self):
-        """Reload all configuration files"""
-        logger.info("Reloading configuration files...")
-        self._load_all_configs()
-        logger.info("Configuration reloaded successfully")
+    def reload_configs(self) -> ConfigSnapshot:
+        """Reload all configuration files.
+        
+        The new configuration is parsed, compiled and validated before it is
+        published; if anything fails the current configuration stays live and
+        the error is raised to the caller.
+        """
+        with self._reload_lock:
+            current = self._snapshot
+            if current is None:
+                self._load_all_configs()
+                return self._snapshot
+            contents = self._read_files()
+            candidate = self._build_snapshot(current.generation + 1, contents)
+            if candidate.digest == current.digest:
+                logger.info(f"Configuration unchanged (version {current.version})")
+                return current
+            
+            errors = self._validate(candidate)
+            if errors:
+                raise ValueError(f"Invalid configuration, keeping version {current.version}: {'; '.join(errors)}")
+            
+            # Single reference swap; requests in flight keep the snapshot they started with
+            self._snapshot = candidate
+            logger.info(f"Configuration reloaded: version {current.version} -> {candidate.version} "
+                        f"(generation {candidate.generation})")
+            return candidate
+    
+    def _file_stamps(self) -> Tuple:
+        """Modification stamps of the configuration files"""
+        stamps = []
+        for name in CONFIG_FILES:
+            try:
+                stat = os.stat(self.config_dir / name)
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamps.append(None)
+        return tuple(stamps)
+    
+    def start_watching(self, interval: float = CONFIG_WATCH_INTERVAL):
+        """Reload in a background thread whenever the configuration files change"""
+        if interval <= 0 or (self._watch_thread and self._watch_thread.is_alive()):
+            return
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(target=self._watch, args=(interval, self._file_stamps()),
+                                              name='config-watcher', daemon=True)
+        self._watch_thread.start()
+        logger.info(f"Watching {self.config_dir} for configuration changes every {interval}s")
+    
+    def stop_watching(self):
+        self._watch_stop.set()
+    
+    def _watch(self, interval: float, last_stamps: Tuple):
+        while not self._watch_stop.wait(interval):
+            stamps = self._file_stamps()
+            if stamps == last_stamps:
+                continue
+            last_stamps = stamps
+            try:
+                self.reload_configs()
+            except Exception as e:
+                logger.error(f"Configuration reload failed: {e}")
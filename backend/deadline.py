@@ -0,0 +1,47 @@
+import os
+import math
+import time
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Default total time budget per analysis request, by rate limit tier (seconds)
+REQUEST_DEADLINES = {
+    'free': float(os.environ.get('REQUEST_DEADLINE_FREE', '10')),
+    'authenticated': float(os.environ.get('REQUEST_DEADLINE_AUTHENTICATED', '20')),
+    'premium': float(os.environ.get('REQUEST_DEADLINE_PREMIUM', '30'))
+}
+MIN_REQUEST_DEADLINE = 1.0
+MAX_REQUEST_DEADLINE = float(os.environ.get('MAX_REQUEST_DEADLINE', '30'))
+
+
+class Deadline:
+    """Absolute point in time by which a request must finish, shared by all its lookup stages"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+def request_deadline(timeout: Optional[str], tier: str = 'free') -> Deadline:
+    """Build a request deadline from a 'timeout' query parameter or the tier default"""
+    default = REQUEST_DEADLINES.get(tier, REQUEST_DEADLINES['free'])
+    seconds = default
+    if timeout:
+        try:
+            seconds = float(timeout)
+        except ValueError:
+            logger.debug(f"Ignoring invalid timeout parameter: {timeout}")
+        if not math.isfinite(seconds):
+            logger.debug(f"Ignoring non-finite timeout parameter: {timeout}")
+            seconds = default
+    seconds = min(max(seconds, MIN_REQUEST_DEADLINE), max(default, MAX_REQUEST_DEADLINE))
+    return Deadline(seconds)
@@ -5,6 +5,7 @@ from typing import List, Dict, Any, Optional
 import logging
 from concurrent.futures import ThreadPoolExecutor
 import time
+from provider_detection import provider_detector
 
 logger = logging.getLogger(__name__)
 
@@ -50,27 +51,7 @@ class DKIMOptimizer:
     
     def _get_provider_specific_selectors(self, mx_servers: List[str]) -> List[str]:
         """Get selectors specific to detected email provider"""
-        mx_lower = [server.lower() for server in mx_servers]
-        
-        provider_selectors = {
-            'google': ['google', 'google1', 'google2', 'google2025', 'gapps'],
-            'microsoft': ['selector1', 'selector2', 's1', 's2', 'o365s1', 'o365s2'],
-            'yahoo': ['yahoo', 'ya'],
-            'zoho': ['zoho', 'zohomail'],
-            'mailgun': ['mailgun', 'mg'],
-            'sendgrid': ['sendgrid', 'sg'],
-            'dreamhost': ['dreamhost'],
-            'mailchimp': ['mailchimp', 'mc'],
-            'hubspot': ['hubspot', 'hs'],
-            'salesforce': ['salesforce'],
-            'amazon': ['amazonses', 'ses']
-        }
-        
-        for provider, selectors in provider_selectors.items():
-            if any(provider in server for server in mx_lower):
-                return selectors
-        
-        return []
+        return provider_detector.selectors_for(mx_servers)
     
     async def _check_selector_async(self, domain: str, selector: str) -> Optional[Dict[str, Any]]:
         """Check a single DKIM selector asynchronously"""
@@ -1,8 +1,9 @@
 import dns.resolver
 import time
 import logging
-from typing import List, Dict, Any, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from provider_detection import provider_detector
 
 logger = logging.getLogger(__name__)
 
@@ -47,33 +48,18 @@ class DKIMOptimizerSync:
     
     def _get_provider_specific_selectors(self, mx_servers: List[str]) -> List[str]:
         """Get selectors specific to detected email provider"""
-        mx_lower = [server.lower() for server in mx_servers]
-        
-        provider_selectors = {
-            'google': ['google', 'google1', 'google2', 'google2025', 'gapps'],
-            'microsoft': ['selector1', 'selector2', 's1', 's2', 'o365s1', 'o365s2'],
-            'yahoo': ['yahoo', 'ya'],
-            'zoho': ['zoho', 'zohomail'],
-            'mailgun': ['mailgun', 'mg'],
-            'sendgrid': ['sendgrid', 'sg'],
-            'dreamhost': ['dreamhost'],
-            'mailchimp': ['mailchimp', 'mc'],
-            'hubspot': ['hubspot', 'hs'],
-            'salesforce': ['salesforce'],
-            'amazon': ['amazonses', 'ses']
-        }
-        
-        for provider, selectors in provider_selectors.items():
-            if any(provider in server for server in mx_lower):
-                return selectors
-        
-        return []
+        return provider_detector.selectors_for(mx_servers)
     
-    def _check_selector(self, domain: str, selector: str) -> Optional[Dict[str, Any]]:
+    def _check_selector(self, domain: str, selector: str, deadline=None) -> Optional[Dict[str, Any]]:
         """Check a single DKIM selector"""
         try:
             dkim_domain = f"{selector}._domainkey.{domain}"
-            records = dns.resolver.resolve(dkim_domain, 'TXT')
+            if deadline is None:
+                records = dns.resolver.resolve(dkim_domain, 'TXT')
+            elif deadline.expired():
+                return None
+            else:
+                records = dns.resolver.resolve(dkim_domain, 'TXT', lifetime=deadline.remaining())
             
             for record in records:
                 record_text = record.to_text().strip('"')
@@ -91,30 +77,44 @@ class DKIMOptimizerSync:
         
         return None
     
-    def _check_selectors_parallel(self, domain: str, selectors: List[str], max_workers: int = 10) -> List[Dict[str, Any]]:
-        """Check multiple selectors in parallel using ThreadPoolExecutor"""
+    def _check_selectors_parallel(self, domain: str, selectors: List[str], max_workers: int = 10,
+                                  deadline=None) -> Tuple[List[Dict[str, Any]], bool]:
+        """Check multiple selectors in parallel using ThreadPoolExecutor.
+        
+        Returns the records found and whether the deadline cut the check short.
+        """
         dkim_records = []
+        timed_out = False
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
             # Submit all tasks
             future_to_selector = {
-                executor.submit(self._check_selector, domain, selector): selector 
+                executor.submit(self._check_selector, domain, selector, deadline): selector 
                 for selector in selectors
             }
             
-            # Collect results as they complete
-            for future in as_completed(future_to_selector):
-                try:
-                    result = future.result()
-                    if result is not None:
-                        dkim_records.append(result)
-                        # Early termination: if we found DKIM records, we can stop
-                        # (but let other threads finish naturally)
-                except Exception as e:
-                    selector = future_to_selector[future]
-                    logger.debug(f"Error checking selector {selector}: {e}")
-        
-        return dkim_records
+            # Collect results as they complete, until the request deadline
+            timeout = deadline.remaining() if deadline is not None else None
+            try:
+                for future in as_completed(future_to_selector, timeout=timeout):
+                    try:
+                        result = future.result()
+                        if result is not None:
+                            dkim_records.append(result)
+                            # Early termination: if we found DKIM records, we can stop
+                            # (but let other threads finish naturally)
+                    except Exception as e:
+                        selector = future_to_selector[future]
+                        logger.debug(f"Error checking selector {selector}: {e}")
+            except FuturesTimeoutError:
+                timed_out = True
+                logger.warning(f"DKIM check for {domain} ran out of request time")
+        finally:
+            # Don't hold the request on lookups that can no longer make the deadline
+            executor.shutdown(wait=not timed_out, cancel_futures=timed_out)
+        
+        return dkim_records, timed_out
     
     def _get_cached_result(self, domain: str) -> Optional[Dict[str, Any]]:
         """Get cached result if available and not expired"""
@@ -130,8 +130,9 @@ class DKIMOptimizerSync:
         """Cache the result for future use"""
         self.cache[domain] = (time.time(), result)
     
-    def get_dkim_details_optimized(self, domain: str, custom_selector: Optional[str] = None, mx_servers: Optional[List[str]] = None) -> Dict[str, Any]:
-        """Get DKIM details with optimized performance"""
+    def get_dkim_details_optimized(self, domain: str, custom_selector: Optional[str] = None, mx_servers: Optional[List[str]] = None,
+                                   deadline=None) -> Dict[str, Any]:
+        """Get DKIM details with optimized performance, stopping early when the request deadline passes"""
         start_time = time.time()
         
         # Check cache first
@@ -163,13 +164,13 @@ class DKIMOptimizerSync:
         logger.info(f"Checking {len(selectors_to_check)} DKIM selectors for {domain}")
         
         # Check selectors in parallel
-        dkim_records = self._check_selectors_parallel(domain, selectors_to_check)
+        dkim_records, timed_out = self._check_selectors_parallel(domain, selectors_to_check, deadline=deadline)
         
         # If no records found in first batch, check remaining selectors (but limit to 50 more)
-        if not dkim_records and len(all_selectors) > 30:
+        if not dkim_records and not timed_out and len(all_selectors) > 30:
             remaining_selectors = all_selectors[30:80]  # Check 50 more selectors
             logger.info(f"No DKIM found in first batch, checking {len(remaining_selectors)} more selectors")
-            additional_records = self._check_selectors_parallel(domain, remaining_selectors)
+            additional_records, timed_out = self._check_selectors_parallel(domain, remaining_selectors, deadline=deadline)
             dkim_records.extend(additional_records)
             selectors_to_check.extend(remaining_selectors)
         
@@ -193,8 +194,14 @@ class DKIMOptimizerSync:
                 'check_time': time.time() - start_time
             }
         
-        # Cache the result
-        self._cache_result(domain, result)
+        # Partial results are returned but not cached
+        if timed_out:
+            result['timed_out'] = True
+            if not dkim_records:
+                result['status'] = 'Timed Out'
+                result['description'] = f'DKIM check did not finish within the request time limit (checked {len(selectors_to_check)} selectors)'
+        else:
+            self._cache_result(domain, result)
         
         logger.info(f"DKIM check completed for {domain} in {result['check_time']:.2f}s")
         return result
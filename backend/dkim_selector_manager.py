@@ -5,6 +5,7 @@ import dns.resolver
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Tuple
 from firestore_config import firestore_manager
+from provider_detection import provider_detector
 
 logger = logging.getLogger(__name__)
 
@@ -51,7 +52,8 @@ class DKIMSelectorManager:
             logger.error(f"Failed to save brute force selectors: {e}")
             return False
     
-    def get_domain_selectors(self, domain: str, custom_selector: Optional[str] = None) -> Dict[str, Any]:
+    def get_domain_selectors(self, domain: str, custom_selector: Optional[str] = None,
+                             mx_servers: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Get comprehensive selector list for a domain with intelligent ordering
         
@@ -102,7 +104,7 @@ class DKIMSelectorManager:
                 })
         
         # 4. Brute force selectors (intelligent subset)
-        brute_force_subset = self._get_intelligent_brute_force_subset(domain)
+        brute_force_subset = self._get_intelligent_brute_force_subset(domain, mx_servers)
         for selector in brute_force_subset:
             selector_list.append({
                 'selector': selector,
@@ -198,13 +200,13 @@ class DKIMSelectorManager:
             logger.error(f"Failed to get discovered selectors for {domain}: {e}")
             return []
     
-    def _get_intelligent_brute_force_subset(self, domain: str) -> List[str]:
+    def _get_intelligent_brute_force_subset(self, domain: str, mx_servers: Optional[List[str]] = None) -> List[str]:
         """Get intelligent subset of brute force selectors based on domain patterns"""
         # Start with most common selectors
         common_selectors = ['default', 'google', 'selector1', 'selector2', 'k1', 'dkim1']
         
-        # Add provider-specific selectors based on domain patterns
-        provider_selectors = self._get_provider_specific_selectors(domain)
+        # Add provider-specific selectors based on the detected provider
+        provider_selectors = self._get_provider_specific_selectors(domain, mx_servers)
         
         # Add remaining selectors (limit to avoid performance issues)
         remaining_selectors = [s for s in self.brute_force_selectors 
@@ -214,26 +216,11 @@ class DKIMSelectorManager:
         all_selectors = common_selectors + provider_selectors + remaining_selectors
         return all_selectors[:10]  # Limit to 10 brute force selectors
     
-    def _get_provider_specific_selectors(self, domain: str) -> List[str]:
-        """Get provider-specific selectors based on domain patterns"""
-        # This could be enhanced with ML-based provider detection
-        provider_patterns = {
-            'google': ['google', 'google1', 'google2', 'google2025', 'gapps'],
-            'microsoft': ['selector1', 'selector2', 's1', 's2', 'o365s1', 'o365s2'],
-            'yahoo': ['yahoo', 'ya'],
-            'zoho': ['zoho', 'zohomail'],
-            'mailgun': ['mailgun', 'mg'],
-            'sendgrid': ['sendgrid', 'sg'],
-            'dreamhost': ['dreamhost'],
-            'mailchimp': ['mailchimp', 'mc'],
-            'hubspot': ['hubspot', 'hs'],
-            'salesforce': ['salesforce'],
-            'amazon': ['amazonses', 'ses']
-        }
-        
-        # For now, return common selectors
-        # This could be enhanced with domain analysis
-        return ['google', 'selector1', 'selector2']
+    def _get_provider_specific_selectors(self, domain: str, mx_servers: Optional[List[str]] = None) -> List[str]:
+        """Get provider-specific selectors from the domain's MX hosts (or the domain itself)"""
+        selectors = provider_detector.selectors_for(mx_servers or [domain])
+        # Without a recognised provider, fall back to the two biggest hosted providers
+        return selectors or ['google', 'selector1', 'selector2']
     
     def add_admin_selector(self, domain: str, selector: str, notes: str = '', 
                           priority: str = 'medium', added_by: str = 'system') -> bool:
@@ -0,0 +1,360 @@
+import logging
+import dns.resolver
+import dns.exception
+import dns.asyncresolver
+from typing import Dict, Any, List, Optional
+from dkim_optimizer_sync import dkim_optimizer_sync
+from analysis_cache import analysis_cache
+from structured_logging import StructuredLogger
+from deadline import Deadline
+from features import DomainFeatures, extract_features, detect_provider
+from score_cache import score_cache
+
+logger = logging.getLogger(__name__)
+slog = StructuredLogger(__name__)
+
+# Result builders shared by the synchronous (request path) and async (batch) lookups
+def _mx_result(domain: str, answers) -> Dict[str, Any]:
+    """Build MX details from resolved MX answers"""
+    records = []
+    for mx in answers:
+        records.append({
+            'priority': mx.preference,
+            'server': str(mx.exchange),
+            'valid': True
+        })
+    
+    # Sort MX records by priority (lower priority number = higher priority)
+    records.sort(key=lambda x: x['priority'])
+    
+    slog.event('mx_records', logging.DEBUG, domain=domain,
+               records=lambda: [(record['priority'], record['server']) for record in records])
+    
+    return {
+        'has_mx': True,
+        'records': records,
+        'status': 'Valid',
+        'description': f'Found {len(records)} MX record(s)'
+    }
+
+def _mx_missing() -> Dict[str, Any]:
+    return {
+        'has_mx': False,
+        'records': [],
+        'status': 'Missing',
+        'description': 'No MX records found'
+    }
+
+def _spf_result(answers) -> Dict[str, Any]:
+    """Build SPF details from resolved TXT answers"""
+    spf_records = []
+    for record in answers:
+        record_text = record.to_text().strip('"')
+        if record_text.startswith('v=spf1'):
+            spf_records.append({
+                'record': record_text,
+                'valid': True
+            })
+    
+    if spf_records:
+        return {
+            'has_spf': True,
+            'records': spf_records,
+            'status': 'Valid',
+            'description': f'Found {len(spf_records)} SPF record(s)'
+        }
+    return _spf_missing()
+
+def _spf_missing() -> Dict[str, Any]:
+    return {
+        'has_spf': False,
+        'records': [],
+        'status': 'Missing',
+        'description': 'No SPF records found'
+    }
+
+def _dmarc_result(domain: str, answers) -> Dict[str, Any]:
+    """Build DMARC details from resolved TXT answers"""
+    logger.debug("Resolved DMARC for %s: %d records", domain, len(answers))
+    records = []
+    for record in answers:
+        record_text = record.to_text().strip('"')
+        if record_text.startswith('v=DMARC1'):
+            records.append({
+                'record': record_text,
+                'valid': True
+            })
+    
+    if records:
+        return {
+            'has_dmarc': True,
+            'records': records,
+            'status': 'Valid',
+            'description': f'Found {len(records)} DMARC record(s)'
+        }
+    logger.warning(f"DMARC records found but none are valid for {domain}")
+    return _dmarc_missing()
+
+def _dmarc_missing() -> Dict[str, Any]:
+    return {
+        'has_dmarc': False,
+        'records': [],
+        'status': 'Missing',
+        'description': 'No DMARC records found'
+    }
+
+def _timed_out(component: str) -> Dict[str, Any]:
+    """Result for a lookup that did not finish before the request deadline"""
+    return {
+        f'has_{component}': False,
+        'records': [],
+        'status': 'Timed Out',
+        'description': f'{component.upper()} lookup did not finish within the request time limit',
+        'timed_out': True
+    }
+
+def _lookup_failed(result: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+    """Mark a missing result that came from a failed lookup rather than an empty answer"""
+    result['lookup_error'] = str(error) or type(error).__name__
+    return result
+
+def _resolve(qname: str, rdtype: str, deadline: Optional[Deadline]):
+    """Resolve a record, bounded by the remaining request budget when a deadline is given"""
+    if deadline is None:
+        return dns.resolver.resolve(qname, rdtype)
+    if deadline.expired():
+        raise dns.exception.Timeout()
+    return dns.resolver.resolve(qname, rdtype, lifetime=deadline.remaining())
+
+@analysis_cache.cached('mx')
+def get_mx_details(domain, deadline: Optional[Deadline] = None):
+    """Get detailed MX record information"""
+    try:
+        return _mx_result(domain, _resolve(domain, 'MX', deadline))
+    except dns.exception.Timeout as e:
+        if deadline is not None:
+            logger.warning(f"MX check for {domain} ran out of request time")
+            return _timed_out('mx')
+        logger.warning(f"MX check failed for {domain}: {str(e)}")
+        return _lookup_failed(_mx_missing(), e)
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        return _mx_missing()
+    except Exception as e:
+        logger.warning(f"MX check failed for {domain}: {str(e)}")
+        return _lookup_failed(_mx_missing(), e)
+
+@analysis_cache.cached('spf')
+def get_spf_details(domain, deadline: Optional[Deadline] = None):
+    """Get detailed SPF record information"""
+    try:
+        return _spf_result(_resolve(domain, 'TXT', deadline))
+    except dns.exception.Timeout as e:
+        if deadline is not None:
+            logger.warning(f"SPF check for {domain} ran out of request time")
+            return _timed_out('spf')
+        logger.warning(f"SPF check failed for {domain}: {str(e)}")
+        return _lookup_failed(_spf_missing(), e)
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        return _spf_missing()
+    except Exception as e:
+        logger.warning(f"SPF check failed for {domain}: {str(e)}")
+        return _lookup_failed(_spf_missing(), e)
+
+@analysis_cache.cached('dmarc')
+def get_dmarc_details(domain, deadline: Optional[Deadline] = None):
+    """Get detailed DMARC record information"""
+    try:
+        return _dmarc_result(domain, _resolve(f"_dmarc.{domain}", 'TXT', deadline))
+    except dns.exception.Timeout as e:
+        if deadline is not None:
+            logger.warning(f"DMARC check for {domain} ran out of request time")
+            return _timed_out('dmarc')
+        logger.warning(f"DMARC check failed for {domain}: {str(e)}")
+        return _lookup_failed(_dmarc_missing(), e)
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        return _dmarc_missing()
+    except Exception as e:
+        logger.warning(f"DMARC check failed for {domain}: {str(e)}")
+        return _lookup_failed(_dmarc_missing(), e)
+
+@analysis_cache.cached('dkim')
+def get_dkim_details(domain, custom_selector=None, deadline: Optional[Deadline] = None):
+    """Get DKIM record information (optimized check)"""
+    # Get MX servers for provider-specific selector prioritization
+    mx_servers = []
+    try:
+        mx_result = get_mx_details(domain, deadline=deadline)
+        if mx_result.get('has_mx'):
+            mx_servers = [record['server'] for record in mx_result.get('records', [])]
+    except:
+        pass
+    
+    # Use optimized DKIM checker
+    result = dkim_optimizer_sync.get_dkim_details_optimized(domain, custom_selector, mx_servers, deadline=deadline)
+    
+    # Remove internal timing info from result
+    if 'check_time' in result:
+        del result['check_time']
+    
+    return result
+
+# Async variants for offline batch scanning (one event loop per worker process)
+async def get_mx_details_async(domain: str, resolver: dns.asyncresolver.Resolver) -> Dict[str, Any]:
+    """Get detailed MX record information asynchronously"""
+    try:
+        return _mx_result(domain, await resolver.resolve(domain, 'MX'))
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        return _mx_missing()
+    except Exception as e:
+        logger.debug(f"MX check failed for {domain}: {str(e)}")
+        return _lookup_failed(_mx_missing(), e)
+
+async def get_spf_details_async(domain: str, resolver: dns.asyncresolver.Resolver) -> Dict[str, Any]:
+    """Get detailed SPF record information asynchronously"""
+    try:
+        return _spf_result(await resolver.resolve(domain, 'TXT'))
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        return _spf_missing()
+    except Exception as e:
+        logger.debug(f"SPF check failed for {domain}: {str(e)}")
+        return _lookup_failed(_spf_missing(), e)
+
+async def get_dmarc_details_async(domain: str, resolver: dns.asyncresolver.Resolver) -> Dict[str, Any]:
+    """Get detailed DMARC record information asynchronously"""
+    try:
+        return _dmarc_result(domain, await resolver.resolve(f"_dmarc.{domain}", 'TXT'))
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        return _dmarc_missing()
+    except Exception as e:
+        logger.debug(f"DMARC check failed for {domain}: {str(e)}")
+        return _lookup_failed(_dmarc_missing(), e)
+
+async def get_dkim_details_async(domain: str, optimizer, mx_servers: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Get DKIM record information asynchronously using a DKIMOptimizer"""
+    result = await optimizer.get_dkim_details_optimized(domain, None, mx_servers)
+    # The batch scanner visits each domain once, so don't let the optimizer cache grow
+    optimizer.cache.pop(domain, None)
+    return {key: value for key, value in result.items() if key != 'check_time'}
+
+def detect_email_provider(mx_result, spf_result, dkim_result):
+    """Detect the email service provider based on MX, SPF, and DKIM records"""
+    return detect_provider(
+        [r['server'].lower() for r in mx_result['records']],
+        [r['record'] for r in spf_result['records']],
+        [r['selector'] for r in dkim_result['records']]
+    )
+
+
+def get_security_score(mx_result, spf_result, dmarc_result, dkim_result, features: Optional[DomainFeatures] = None):
+    """
+    Calculate comprehensive security score with bonus points.
+    
+    Base Scoring (100 points total):
+    - MX Records: 25 points (essential for email delivery)
+    - SPF Records: 25 points (prevents email spoofing)
+    - DMARC Records: 30 points (authentication reporting)
+    - DKIM Records: 20 points (email authentication)
+    
+    Bonus Points (up to 10 additional points):
+    - Multiple MX records: +2 points (redundancy)
+    - Strong SPF policy: +1-2 points (-all > ~all > ?all)
+    - Strict DMARC policy: +1-2 points (p=reject > p=quarantine)
+    - Multiple DKIM selectors: +2 points (diversity) - only for non-Google providers
+    - 100% DMARC coverage: +1 point (pct=100)
+    
+    Pass the analysis's DomainFeatures to avoid re-scanning the records. Scores are
+    memoized by the features they read and shared between callers; treat them as read-only.
+    """
+    if features is None:
+        features = extract_features(mx_result, spf_result, dmarc_result, dkim_result)
+    return score_cache.get_or_compute('security_score', features.key('security_score'),
+                                      lambda: _calculate_security_score(features))
+
+
+def _calculate_security_score(features: DomainFeatures) -> Dict[str, Any]:
+    """Legacy security score from a domain's features"""
+    score = 0
+    max_score = 100
+    bonus_points = 0
+    max_bonus = 10
+    scoring_details = {}
+    
+    # Base scoring (MX: 25, SPF: 25, DMARC: 30, DKIM: 20)
+    # MX records must be functional (not "." or empty) to count
+    if features.has_mx and features.mx_functional:
+        score += 25
+        scoring_details['mx_base'] = 25
+        # Bonus for multiple MX records (redundancy)
+        if features.mx_count > 1:
+            bonus_points += 2
+            scoring_details['mx_bonus'] = 2
+        else:
+            scoring_details['mx_bonus'] = 0
+    else:
+        scoring_details['mx_base'] = 0
+        scoring_details['mx_bonus'] = 0
+    
+    if features.has_spf:
+        score += 25
+        scoring_details['spf_base'] = 25
+        # Bonus for strong SPF policy (-all > ~all > ?all)
+        bonus_points += features.spf_legacy_bonus
+        scoring_details['spf_bonus'] = features.spf_legacy_bonus
+    else:
+        scoring_details['spf_base'] = 0
+        scoring_details['spf_bonus'] = 0
+    
+    if features.has_dmarc:
+        score += 30
+        scoring_details['dmarc_base'] = 30
+        # Bonus for strong DMARC policy and 100% coverage
+        bonus_points += features.dmarc_legacy_bonus
+        scoring_details['dmarc_bonus'] = features.dmarc_legacy_bonus
+    else:
+        scoring_details['dmarc_base'] = 0
+        scoring_details['dmarc_bonus'] = 0
+    
+    if features.has_dkim:
+        score += 20
+        scoring_details['dkim_base'] = 20
+        # Bonus for multiple DKIM selectors (only for non-Google providers)
+        if features.dkim_selector_count > 1 and features.email_provider != "Google Workspace":
+            bonus_points += 2
+            scoring_details['dkim_bonus'] = 2
+        else:
+            scoring_details['dkim_bonus'] = 0
+    else:
+        scoring_details['dkim_base'] = 0
+        scoring_details['dkim_bonus'] = 0
+    
+    # Apply bonus points (capped at max_bonus)
+    final_score = min(score + bonus_points, max_score)
+    
+    # Determine grade and status
+    if final_score >= 90:
+        grade = 'A'
+        status = 'Excellent'
+    elif final_score >= 75:
+        grade = 'B'
+        status = 'Good'
+    elif final_score >= 50:
+        grade = 'C'
+        status = 'Fair'
+    elif final_score >= 25:
+        grade = 'D'
+        status = 'Poor'
+    else:
+        grade = 'F'
+        status = 'Very Poor'
+    
+    return {
+        'score': round(final_score, 1),
+        'grade': grade,
+        'status': status,
+        'max_score': max_score,
+        'base_score': score,
+        'bonus_points': round(bonus_points, 1),
+        'max_bonus': max_bonus,
+        'scoring_details': scoring_details
+    }
+
@@ -0,0 +1,176 @@
+import logging
+from operator import attrgetter
+from typing import Dict, Any, Optional, Sequence, Tuple
+from parsers import parse_spf_record, parse_dmarc_record, parse_dkim_record, analyze_mx_records
+from provider_detection import provider_detector
+
+logger = logging.getLogger(__name__)
+
+_EMPTY = {}
+
+# The features each scorer reads, i.e. everything its output depends on besides the config.
+# These tuples key the score cache, so a scorer that starts reading a new feature must list it here.
+FEATURE_KEYS = {
+    'mx': attrgetter('has_mx', 'mx_count', 'mx_trusted_provider', 'mx_has_provider', 'mx_secure'),
+    'spf': attrgetter('has_spf', 'spf_policy', 'spf_mechanisms'),
+    'dmarc': attrgetter('has_dmarc', 'dmarc_policy', 'dmarc_pct', 'dmarc_rua', 'dmarc_ruf'),
+    'dkim': attrgetter('has_dkim', 'dkim_selector_count', 'dkim_strong_algorithm', 'dkim_key_length'),
+    'recommendations': attrgetter('dmarc_parsed', 'dmarc_policy', 'dmarc_pct', 'dmarc_rua'),
+    'security_score': attrgetter('has_mx', 'mx_functional', 'mx_count', 'has_spf', 'spf_legacy_bonus',
+                                 'has_dmarc', 'dmarc_legacy_bonus', 'has_dkim', 'dkim_selector_count',
+                                 'email_provider')
+}
+
+
+def detect_provider(mx_servers: Sequence[str], spf_records: Sequence[str], dkim_selectors: Sequence[str]) -> str:
+    """Detect the email service provider from MX hosts, SPF records and DKIM selectors"""
+    return provider_detector.detect(mx_servers, spf_records, dkim_selectors).provider
+
+
+class DomainFeatures:
+    """Everything scoring, recommendations and provider detection read from one domain's records.
+
+    Built once per analysis by extract_features so records are parsed and scanned a single time.
+    """
+
+    __slots__ = (
+        'has_mx', 'mx_count', 'mx_servers', 'mx_functional', 'mx_trusted_provider', 'mx_has_provider',
+        'mx_secure',
+        'has_spf', 'spf_records', 'spf_policy', 'spf_mechanisms', 'spf_legacy_bonus',
+        'has_dmarc', 'dmarc_parsed', 'dmarc_policy', 'dmarc_pct', 'dmarc_rua', 'dmarc_ruf', 'dmarc_legacy_bonus',
+        'has_dkim', 'dkim_selectors', 'dkim_selector_count', 'dkim_strong_algorithm', 'dkim_key_length',
+        'email_provider', 'email_provider_confidence'
+    )
+
+    def key(self, scorer: str) -> Tuple:
+        """Canonical tuple of the features a scorer reads (see FEATURE_KEYS)"""
+        return FEATURE_KEYS[scorer](self)
+
+    def batch_row(self) -> Dict[str, Any]:
+        """Feature row in the column layout of ScoringEngine.score_batch"""
+        mechanisms = self.spf_mechanisms
+        return {
+            'has_mx': self.has_mx,
+            'mx_count': self.mx_count,
+            'mx_trusted_provider': self.mx_trusted_provider,
+            'mx_secure': self.mx_secure,
+            'has_spf': self.has_spf,
+            'spf_policy': self.spf_policy or '',
+            'spf_include': 'include' in mechanisms,
+            'spf_direct_ip': 'direct_ip' in mechanisms,
+            'spf_domain_records': 'domain_a' in mechanisms or 'domain_mx' in mechanisms,
+            'spf_redirect': 'redirect' in mechanisms,
+            'has_dmarc': self.has_dmarc,
+            'dmarc_policy': (self.dmarc_policy or '') if self.has_dmarc else '',
+            'dmarc_pct': (self.dmarc_pct or 0) if self.has_dmarc else 0,
+            'dmarc_rua': self.has_dmarc and self.dmarc_rua,
+            'dmarc_ruf': self.has_dmarc and self.dmarc_ruf,
+            'has_dkim': self.has_dkim,
+            'dkim_selector_count': self.dkim_selector_count,
+            'dkim_strong_algorithm': self.dkim_strong_algorithm,
+            'dkim_key_length': self.dkim_key_length
+        }
+
+
+def _legacy_spf_bonus(records: Tuple[str, ...]) -> float:
+    """Policy-strength bonus used by the legacy security score"""
+    bonus = 0
+    for record in records:
+        if '-all' in record:
+            bonus += 2  # Strongest policy
+        elif '~all' in record:
+            bonus += 1  # Medium policy
+        elif '?all' in record:
+            bonus += 0.5  # Weakest policy
+    return bonus
+
+
+def _legacy_dmarc_bonus(records: Tuple[str, ...]) -> int:
+    """Policy and coverage bonus used by the legacy security score"""
+    bonus = 0
+    for record in records:
+        if 'p=reject' in record:
+            bonus += 2  # Strictest policy
+        elif 'p=quarantine' in record:
+            bonus += 1  # Medium policy
+        if 'pct=100' in record:
+            bonus += 1  # 100% coverage
+    return bonus
+
+
+def _dkim_key_strength(dkim_records: Sequence[Dict[str, Any]]) -> Tuple[bool, int]:
+    """(all keys strong, shortest RSA key in bits) over the records' decodable public keys.
+
+    Records whose key can't be decoded (truncated, revoked or malformed) are skipped;
+    when none can be, and for the length when every key is Ed25519, the result is
+    the strong 2048-bit default the scorers assumed before keys were parsed.
+    """
+    strong = True
+    rsa_lengths = []
+    for record in dkim_records:
+        # A long key spans several TXT strings, which the lookup leaves joined by '" "'
+        record_text = record.get('full_record', record.get('record', '')).replace('" "', '')
+        key = parse_dkim_record(record_text)
+        if key['key_length'] is None:
+            continue
+        strong = strong and key['algorithm'] == 'strong'
+        if key['key_type'] == 'RSA':
+            rsa_lengths.append(key['key_length'])
+    return strong, min(rsa_lengths, default=2048)
+
+
+def extract_features(mx_result: Optional[Dict[str, Any]] = None, spf_result: Optional[Dict[str, Any]] = None,
+                     dmarc_result: Optional[Dict[str, Any]] = None,
+                     dkim_result: Optional[Dict[str, Any]] = None) -> DomainFeatures:
+    """Parse a domain's MX/SPF/DMARC/DKIM lookup results once into a DomainFeatures"""
+    mx_result = mx_result or _EMPTY
+    spf_result = spf_result or _EMPTY
+    dmarc_result = dmarc_result or _EMPTY
+    dkim_result = dkim_result or _EMPTY
+    features = DomainFeatures()
+
+    # MX
+    mx_records = mx_result.get('records', [])
+    mx_analysis = analyze_mx_records(mx_records)
+    features.has_mx = bool(mx_result.get('has_mx', False))
+    features.mx_count = mx_analysis['count']
+    features.mx_servers = tuple(mx_analysis['providers'])
+    features.mx_functional = any(record.get('server') not in (None, '', '.') for record in mx_records)
+    features.mx_trusted_provider = mx_analysis['has_trusted_provider']
+    features.mx_has_provider = mx_analysis['has_provider']
+    features.mx_secure = mx_analysis['secure_configuration']
+
+    # SPF (the granular scorer reads the first record)
+    spf_records = spf_result.get('records', [])
+    features.has_spf = bool(spf_result.get('has_spf', False))
+    features.spf_records = tuple(record.get('record', '') for record in spf_records)
+    features.spf_policy = None
+    features.spf_mechanisms = ()
+    if features.has_spf:
+        spf_analysis = parse_spf_record(features.spf_records[0] if features.spf_records else '')
+        features.spf_policy = spf_analysis.get('policy')
+        features.spf_mechanisms = tuple(spf_analysis.get('mechanisms', []))
+    features.spf_legacy_bonus = _legacy_spf_bonus(features.spf_records)
+
+    # DMARC (recommendations read the parsed record even when has_dmarc is false)
+    dmarc_records = tuple(record.get('record', '') for record in dmarc_result.get('records', []))
+    features.has_dmarc = bool(dmarc_result.get('has_dmarc', False))
+    features.dmarc_parsed = bool(dmarc_records)
+    dmarc_analysis = parse_dmarc_record(dmarc_records[0]) if dmarc_records else _EMPTY
+    features.dmarc_policy = dmarc_analysis.get('policy')
+    features.dmarc_pct = dmarc_analysis.get('percentage')
+    features.dmarc_rua = bool(dmarc_analysis.get('rua'))
+    features.dmarc_ruf = bool(dmarc_analysis.get('ruf'))
+    features.dmarc_legacy_bonus = _legacy_dmarc_bonus(dmarc_records)
+
+    # DKIM (scored by the weakest decodable key across the selectors found)
+    dkim_records = dkim_result.get('records', [])
+    features.has_dkim = bool(dkim_result.get('has_dkim', False))
+    features.dkim_selectors = tuple(record.get('selector', '') for record in dkim_records)
+    features.dkim_selector_count = len(features.dkim_selectors)
+    features.dkim_strong_algorithm, features.dkim_key_length = _dkim_key_strength(dkim_records)
+
+    provider = provider_detector.detect(features.mx_servers, features.spf_records, features.dkim_selectors)
+    features.email_provider = provider.provider
+    features.email_provider_confidence = provider.confidence
+    return features
@@ -1,8 +1,10 @@
 import os
-from google.cloud import firestore
 from datetime import datetime
 import logging
 from typing import Dict, Any, List
+from lazy_imports import lazy_module
+
+firestore = lazy_module('google.cloud.firestore')  # imported with the first client
 
 logger = logging.getLogger(__name__)
 
@@ -34,8 +36,8 @@ class FirestoreManager:
                 return None
         return self.db
 
-    def store_analysis(self, domain, analysis_data):
-        """Store domain analysis results in Firestore"""
+    def store_analysis(self, domain, analysis_data, fingerprint=None):
+        """Store domain analysis results in Firestore, returning the new document id"""
         db = self._get_client()
         if not db:
             logger.warning("Firestore not available, skipping storage")
@@ -51,13 +53,15 @@ class FirestoreManager:
                 'analysis_results': analysis_data,
                 'created_at': firestore.SERVER_TIMESTAMP
             }
+            if fingerprint:
+                doc_data['fingerprint'] = fingerprint
             
             # Add to Firestore collection
             doc_ref = db.collection(self.collection_name).document()
             doc_ref.set(doc_data)
             
             logger.info(f"Stored analysis for domain: {domain}")
-            return True
+            return doc_ref.id
             
         except Exception as e:
             logger.error(f"Failed to store analysis for {domain}: {e}")
@@ -115,7 +119,9 @@ class FirestoreManager:
                     'timestamp': data.get('timestamp'),
                     'security_score': data.get('security_score'),
                     'email_provider': data.get('email_provider'),
-                    'analysis_results': data.get('analysis_results')
+                    'analysis_results': data.get('analysis_results'),
+                    'last_seen_at': data.get('last_seen_at'),
+                    'seen_count': data.get('seen_count', 0)
                 })
             
             return history
@@ -124,6 +130,102 @@ class FirestoreManager:
             logger.error(f"Failed to retrieve history for {domain}: {e}")
             return []
 
+    def get_latest_analysis(self, domain):
+        """Get the most recent stored analysis for a domain, including its fingerprint"""
+        db = self._get_client()
+        if not db:
+            return None
+
+        try:
+            docs = db.collection(self.collection_name)\
+                .where('domain', '==', domain)\
+                .order_by('created_at', direction=firestore.Query.DESCENDING)\
+                .limit(1)\
+                .stream()
+
+            for doc in docs:
+                data = doc.to_dict()
+                return {
+                    'id': doc.id,
+                    'fingerprint': data.get('fingerprint'),
+                    'analysis_results': data.get('analysis_results')
+                }
+            return None
+
+        except Exception as e:
+            logger.error(f"Failed to retrieve latest analysis for {domain}: {e}")
+            return None
+
+    def mark_analysis_seen(self, doc_id):
+        """Record that an unchanged analysis was seen again instead of storing a new one"""
+        db = self._get_client()
+        if not db:
+            return False
+
+        try:
+            db.collection(self.collection_name).document(doc_id).update({
+                'last_seen_at': firestore.SERVER_TIMESTAMP,
+                'seen_count': firestore.Increment(1)
+            })
+            return True
+        except Exception as e:
+            logger.error(f"Failed to mark analysis {doc_id} as seen: {e}")
+            return False
+
+    def stream_analyses(self, page_size=1000, limit=None):
+        """Stream stored analyses newest first, paging through the collection"""
+        db = self._get_client()
+        if not db:
+            return
+
+        query = db.collection(self.collection_name)\
+            .order_by('created_at', direction=firestore.Query.DESCENDING)\
+            .select(['domain', 'analysis_results', 'created_at'])
+        yielded = 0
+        last_doc = None
+        while limit is None or yielded < limit:
+            page = query.limit(page_size if limit is None else min(page_size, limit - yielded))
+            if last_doc is not None:
+                page = page.start_after(last_doc)
+            docs = list(page.stream())
+            for doc in docs:
+                data = doc.to_dict()
+                yield {
+                    'id': doc.id,
+                    'domain': data.get('domain'),
+                    'analysis_results': data.get('analysis_results') or {}
+                }
+            yielded += len(docs)
+            if len(docs) < page_size:
+                return
+            last_doc = docs[-1]
+
+    def get_top_domains(self, limit=100, sample_size=5000):
+        """Get the most frequently analyzed domains from recent analyses"""
+        db = self._get_client()
+        if not db:
+            return []
+
+        try:
+            docs = db.collection(self.collection_name)\
+                .order_by('created_at', direction=firestore.Query.DESCENDING)\
+                .limit(sample_size)\
+                .select(['domain'])\
+                .stream()
+
+            domain_counts = {}
+            for doc in docs:
+                domain = doc.to_dict().get('domain')
+                if domain:
+                    domain_counts[domain] = domain_counts.get(domain, 0) + 1
+
+            sorted_domains = sorted(domain_counts.items(), key=lambda x: x[1], reverse=True)
+            return [domain for domain, _ in sorted_domains[:limit]]
+
+        except Exception as e:
+            logger.error(f"Failed to get top domains: {e}")
+            return []
+
     def get_statistics(self):
         """Get analytics statistics"""
         db = self._get_client()
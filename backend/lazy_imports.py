@@ -0,0 +1,61 @@
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """Stand-in for a heavy module that imports it on first attribute access"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                start_time = time.perf_counter()
+                module = importlib.import_module(self._name)
+                logger.info(f"Imported {self._name} in {(time.perf_counter() - start_time) * 1000:.0f}ms")
+                self._module = module
+        return self._module
+
+    def __getattr__(self, name):
+        module = self._module
+        if module is None:
+            module = self._load()
+        return getattr(module, name)
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}' ({'loaded' if self.loaded else 'not loaded'})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    """Defer importing a module until it is first used"""
+    return LazyModule(name)
+
+
+class LazyView:
+    """Flask view that imports its module on the first request it serves"""
+
+    def __init__(self, import_name: str):
+        self.__module__, self.__name__ = import_name.rsplit('.', 1)
+        self.import_name = import_name
+        self._view = None
+
+    @property
+    def view(self):
+        if self._view is None:
+            module = importlib.import_module(self.__module__)
+            self._view = getattr(module, self.__name__)
+        return self._view
+
+    def __call__(self, *args, **kwargs):
+        return self.view(*args, **kwargs)
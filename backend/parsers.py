@@ -1,9 +1,41 @@
+import os
 import re
+import base64
 import logging
-from typing import Dict, Any, List, Optional
+import functools
+from typing import Dict, Any, List, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Parsed records are memoized by record text: the same SPF includes and DKIM keys
+# recur across many domains. Cached results are shared and must be treated as read-only.
+PARSER_CACHE_SIZE = int(os.environ.get('PARSER_CACHE_SIZE', '8192'))
+DKIM_KEY_CACHE_SIZE = int(os.environ.get('DKIM_KEY_CACHE_SIZE', '4096'))
+
+# One "tag=value" of a DMARC/DKIM tag list (key and value still carry surrounding whitespace)
+_TAG = re.compile(r'([^;=]*)=([^;]*)')
+
+# One whitespace-delimited SPF term, named after what it is; unrecognised terms match the bare \S+
+_SPF_TERM = re.compile(
+    r'(?P<version>v=\S*)'
+    r'|\S*(?P<all>[-~?+])all(?!\S)'
+    r'|include:(?P<include>\S*)'
+    r'|(?P<ip>ip[46]:\S*)'
+    r'|(?P<a>a)(?!\S)'
+    r'|(?P<mx>mx)(?!\S)'
+    r'|redirect=(?P<redirect>\S*)'
+    r'|\S+'
+)
+_SPF_POLICIES = {'-': 'reject', '~': 'softfail', '?': 'neutral', '+': 'permissive'}
+
+_WHITESPACE = re.compile(r'\s+')
+_TRUSTED_MX = re.compile(r'google|microsoft|outlook|office365|gmail')
+
+# DER object identifiers (encoded contents) of the DKIM key algorithms
+_OID_RSA = bytes.fromhex('2a864886f70d010101')  # 1.2.840.113549.1.1.1 rsaEncryption
+_OID_ED25519 = bytes.fromhex('2b6570')  # 1.3.101.112 id-Ed25519
+
+@functools.lru_cache(maxsize=PARSER_CACHE_SIZE)
 def parse_dmarc_record(record_text: str) -> Dict[str, Any]:
     """
     Parse DMARC record and extract all components for granular scoring
@@ -35,17 +67,9 @@ def parse_dmarc_record(record_text: str) -> Dict[str, Any]:
         components['version'] = 'DMARC1'
         components['valid'] = True
         
-        # Parse all components
-        parts = record_text.split(';')
-        for part in parts:
-            part = part.strip()
-            if '=' not in part:
-                continue
-                
-            key, value = part.split('=', 1)
+        for key, value in _TAG.findall(record_text):
             key = key.strip().lower()
             value = value.strip()
-            
             if key == 'p':
                 components['policy'] = value
             elif key == 'sp':
@@ -55,23 +79,13 @@ def parse_dmarc_record(record_text: str) -> Dict[str, Any]:
                     components['percentage'] = int(value)
                 except ValueError:
                     components['warnings'].append(f'Invalid percentage value: {value}')
-            elif key == 'rua':
-                components['rua'] = value
-            elif key == 'ruf':
-                components['ruf'] = value
-            elif key == 'fo':
-                components['fo'] = value
-            elif key == 'adkim':
-                components['adkim'] = value
-            elif key == 'aspf':
-                components['aspf'] = value
-            elif key == 'rf':
-                components['rf'] = value
             elif key == 'ri':
                 try:
                     components['ri'] = int(value)
                 except ValueError:
                     components['warnings'].append(f'Invalid report interval: {value}')
+            elif key in ('rua', 'ruf', 'fo', 'adkim', 'aspf', 'rf'):
+                components[key] = value
         
         # Validation checks
         if not components['policy']:
@@ -87,6 +101,7 @@ def parse_dmarc_record(record_text: str) -> Dict[str, Any]:
     
     return components
 
+@functools.lru_cache(maxsize=PARSER_CACHE_SIZE)
 def parse_spf_record(record_text: str) -> Dict[str, Any]:
     """
     Parse SPF record and extract components for granular scoring
@@ -110,32 +125,22 @@ def parse_spf_record(record_text: str) -> Dict[str, Any]:
         components['version'] = 'spf1'
         components['valid'] = True
         
-        # Parse mechanisms
-        mechanisms = record_text.split()
-        for mech in mechanisms:
-            if mech.startswith('v='):
-                continue
-            
-            if mech.endswith('-all'):
-                components['policy'] = 'reject'
-            elif mech.endswith('~all'):
-                components['policy'] = 'softfail'
-            elif mech.endswith('?all'):
-                components['policy'] = 'neutral'
-            elif mech.endswith('+all'):
-                components['policy'] = 'permissive'
-            elif mech.startswith('include:'):
-                components['includes'].append(mech[8:])
+        for match in _SPF_TERM.finditer(record_text):
+            term = match.lastgroup
+            if term == 'all':
+                components['policy'] = _SPF_POLICIES[match.group('all')]
+            elif term == 'include':
+                components['includes'].append(match.group('include'))
                 components['mechanisms'].append('include')
-            elif mech.startswith('ip4:') or mech.startswith('ip6:'):
-                components['ips'].append(mech)
+            elif term == 'ip':
+                components['ips'].append(match.group('ip'))
                 components['mechanisms'].append('direct_ip')
-            elif mech == 'a':
+            elif term == 'a':
                 components['mechanisms'].append('domain_a')
-            elif mech == 'mx':
+            elif term == 'mx':
                 components['mechanisms'].append('domain_mx')
-            elif mech.startswith('redirect='):
-                components['redirects'].append(mech[9:])
+            elif term == 'redirect':
+                components['redirects'].append(match.group('redirect'))
                 components['mechanisms'].append('redirect')
         
         if not components['policy']:
@@ -147,6 +152,74 @@ def parse_spf_record(record_text: str) -> Dict[str, Any]:
     
     return components
 
+def _der_element(data: bytes, offset: int) -> Tuple[int, bytes, int]:
+    """Read one DER element at offset; return (tag, contents, offset of the next element)"""
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7f
+        if not 0 < size <= 4:
+            raise ValueError('Unsupported DER length')
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    end = offset + length
+    if end > len(data):
+        raise ValueError('Truncated DER element')
+    return tag, data[offset:end], end
+
+def _rsa_modulus_bits(rsa_public_key: bytes) -> int:
+    """Modulus size of a PKCS#1 RSAPublicKey (SEQUENCE { INTEGER n, INTEGER e })"""
+    tag, sequence, _ = _der_element(rsa_public_key, 0)
+    if tag != 0x30:
+        raise ValueError('RSA public key is not a SEQUENCE')
+    tag, modulus, _ = _der_element(sequence, 0)
+    if tag != 0x02:
+        raise ValueError('RSA modulus is not an INTEGER')
+    return int.from_bytes(modulus, 'big').bit_length()
+
+@functools.lru_cache(maxsize=DKIM_KEY_CACHE_SIZE)
+def dkim_key_info(public_key: str, key_algorithm: str = 'rsa') -> Tuple[str, int]:
+    """
+    Decode a DKIM p= public key and return (key_type, key_length in bits).
+    Accepts a SubjectPublicKeyInfo (RFC 6376), a bare PKCS#1 RSAPublicKey, or a
+    raw 32-byte Ed25519 key (RFC 8463). Raises ValueError for undecodable keys.
+    """
+    try:
+        data = base64.b64decode(_WHITESPACE.sub('', public_key), validate=True)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'not valid base64 ({e})')
+
+    if key_algorithm == 'ed25519' and len(data) == 32:
+        return 'Ed25519', 256
+
+    try:
+        tag, contents, _ = _der_element(data, 0)
+        if tag != 0x30:
+            raise ValueError('Public key is not a DER SEQUENCE')
+        tag, first, offset = _der_element(contents, 0)
+        if tag == 0x02:
+            # Bare RSAPublicKey: the first element is already the modulus
+            return 'RSA', int.from_bytes(first, 'big').bit_length()
+        if tag != 0x30:
+            raise ValueError('Missing AlgorithmIdentifier')
+        tag, oid, _ = _der_element(first, 0)
+        if tag != 0x06:
+            raise ValueError('Missing algorithm OID')
+        tag, bit_string, _ = _der_element(contents, offset)
+        if tag != 0x03 or not bit_string:
+            raise ValueError('Missing public key BIT STRING')
+        key_bytes = bit_string[1:]  # first byte counts unused bits
+        if oid == _OID_RSA:
+            return 'RSA', _rsa_modulus_bits(key_bytes)
+    except IndexError:
+        raise ValueError('Truncated public key')
+
+    if oid == _OID_ED25519:
+        return 'Ed25519', len(key_bytes) * 8
+    raise ValueError(f'Unsupported key algorithm OID {oid.hex()}')
+
+@functools.lru_cache(maxsize=PARSER_CACHE_SIZE)
 def parse_dkim_record(record_text: str) -> Dict[str, Any]:
     """
     Parse DKIM record and extract components for granular scoring
@@ -168,36 +241,19 @@ def parse_dkim_record(record_text: str) -> Dict[str, Any]:
         components['version'] = 'DKIM1'
         components['valid'] = True
         
-        # Parse key components
-        parts = record_text.split(';')
-        for part in parts:
-            part = part.strip()
-            if '=' not in part:
-                continue
-            
-            key, value = part.split('=', 1)
-            key = key.strip().lower()
-            value = value.strip()
-            
-            if key == 'k':
-                components['algorithm'] = value
-            elif key == 'p':
-                # Extract key length from public key
-                if value.startswith('MII'):
-                    # RSA key
-                    components['key_type'] = 'RSA'
-                    # Estimate key length (this is simplified)
-                    key_length = len(value) * 6 // 8  # Base64 to bits approximation
-                    if key_length >= 2048:
-                        components['key_length'] = 2048
-                    elif key_length >= 1024:
-                        components['key_length'] = 1024
-                    else:
-                        components['key_length'] = 512
-                elif value.startswith('MC'):
-                    # Ed25519 key
-                    components['key_type'] = 'Ed25519'
-                    components['key_length'] = 256
+        tags = {key.strip().lower(): value.strip() for key, value in _TAG.findall(record_text)}
+        key_algorithm = tags.get('k', 'rsa').lower()
+        components['algorithm'] = key_algorithm
+        public_key = tags.get('p')
+        if public_key is None:
+            components['warnings'].append('Missing public key (p=)')
+        elif not public_key:
+            components['warnings'].append('Public key revoked (empty p=)')
+        else:
+            try:
+                components['key_type'], components['key_length'] = dkim_key_info(public_key, key_algorithm)
+            except ValueError as e:
+                components['warnings'].append(f'Invalid public key: {e}')
         
         # Determine algorithm strength
         if components['key_type'] == 'Ed25519':
@@ -213,6 +269,22 @@ def parse_dkim_record(record_text: str) -> Dict[str, Any]:
     
     return components
 
+def parser_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counts of the memoized record parsers"""
+    stats = {}
+    for name, parser in (('dmarc', parse_dmarc_record), ('spf', parse_spf_record),
+                         ('dkim', parse_dkim_record), ('dkim_key', dkim_key_info)):
+        info = parser.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'hit_rate': info.hits / lookups if lookups else 0.0,
+            'entries': info.currsize,
+            'max_entries': info.maxsize
+        }
+    return stats
+
 def analyze_mx_records(mx_records: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Analyze MX records for granular scoring
@@ -229,15 +301,12 @@ def analyze_mx_records(mx_records: List[Dict[str, Any]]) -> Dict[str, Any]:
         return analysis
     
     # Check for trusted providers
-    trusted_providers = ['google', 'microsoft', 'outlook', 'office365', 'gmail']
     for record in mx_records:
         server = record.get('server', '').lower()
         analysis['providers'].append(server)
         
-        for provider in trusted_providers:
-            if provider in server:
-                analysis['has_trusted_provider'] = True
-                break
+        if _TRUSTED_MX.search(server):
+            analysis['has_trusted_provider'] = True
     
     # Check for secure configuration (basic checks)
     for record in mx_records:
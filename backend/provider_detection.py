@@ -0,0 +1,166 @@
+import os
+import csv
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS_FILE = os.environ.get(
+    'EMAIL_PROVIDERS_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'email_providers.csv')
+)
+
+# How much each kind of evidence counts towards a provider's confidence;
+# MX is who actually receives the mail, SPF and DKIM only show who sends for the domain
+SIGNAL_WEIGHTS = {'mx': 0.6, 'spf': 0.3, 'dkim': 0.1}
+UNKNOWN_PROVIDER = 'Unknown'
+
+_MATCH = None  # trie key marking the end of a suffix
+
+
+class ProviderMatch:
+    """Detected provider, its confidence (0-1) and the signals that matched"""
+
+    __slots__ = ('provider', 'confidence', 'signals')
+
+    def __init__(self, provider: str, confidence: float, signals: Tuple[str, ...]):
+        self.provider = provider
+        self.confidence = confidence
+        self.signals = signals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'provider': self.provider, 'confidence': self.confidence, 'signals': list(self.signals)}
+
+
+NO_MATCH = ProviderMatch(UNKNOWN_PROVIDER, 0.0, ())
+
+
+def _labels(host: str) -> List[str]:
+    """Lowercased DNS labels of a host name, most significant first"""
+    return host.strip().rstrip('.').lower().split('.')[::-1]
+
+
+def _spf_domains(record: str):
+    """Domains referenced by include: mechanisms and redirect= modifiers of an SPF record"""
+    for term in record.lower().split():
+        if term[:1] in '+-~?':
+            term = term[1:]
+        if term.startswith('include:'):
+            yield term[8:]
+        elif term.startswith('redirect='):
+            yield term[9:]
+
+
+class ProviderDetector:
+    """Email provider fingerprint table compiled into label-reversed suffix tries.
+
+    MX hosts and SPF include domains are matched by walking their labels from the
+    TLD down, and DKIM selectors by a dict lookup, so detection is one pass over the
+    domain's records no matter how many providers the table holds.
+    """
+
+    def __init__(self, providers_file: str = PROVIDERS_FILE):
+        self.providers_file = providers_file
+        self._lock = threading.Lock()
+        self._compiled = self._compile(self._read_table(providers_file))
+
+    @staticmethod
+    def _read_table(path: str) -> List[Dict[str, str]]:
+        """Read the provider fingerprint table"""
+        try:
+            with open(path, 'r', newline='') as f:
+                rows = [row for row in csv.DictReader(f) if row.get('provider') and row.get('value')]
+            logger.info(f"Loaded {len(rows)} email provider fingerprints")
+            return rows
+        except FileNotFoundError:
+            logger.warning(f"{path} not found, email provider detection disabled")
+            return []
+
+    @staticmethod
+    def _compile(rows: List[Dict[str, str]]) -> Tuple[Dict, Dict, Dict, Dict, Dict]:
+        """Build the MX/SPF suffix tries, the selector index and per-provider probe lists"""
+        tries = {'mx': {}, 'spf': {}}
+        dkim = {}
+        probes = {}
+        order = {}
+        for row in rows:
+            provider = row['provider'].strip()
+            signal = row['signal'].strip().lower()
+            value = row['value'].strip()
+            order.setdefault(provider, len(order))
+            if signal in tries:
+                node = tries[signal]
+                for label in _labels(value):
+                    node = node.setdefault(label, {})
+                node.setdefault(_MATCH, provider)
+            elif signal == 'dkim':
+                dkim.setdefault(value.lower(), []).append(provider)
+            elif signal == 'probe':
+                selectors = probes.setdefault(provider, [])
+                if value not in selectors:
+                    selectors.append(value)
+            else:
+                logger.warning(f"Unknown email provider signal '{signal}' for {provider}")
+        return tries['mx'], tries['spf'], dkim, probes, order
+
+    def reload(self):
+        """Re-read the fingerprint table and swap in the recompiled matcher"""
+        compiled = self._compile(self._read_table(self.providers_file))
+        with self._lock:
+            self._compiled = compiled
+
+    @staticmethod
+    def _match_suffix(trie: Dict, host: str) -> Optional[str]:
+        """Provider of the longest table suffix matching a host name"""
+        node = trie
+        provider = None
+        for label in _labels(host):
+            node = node.get(label)
+            if node is None:
+                break
+            provider = node.get(_MATCH, provider)
+        return provider
+
+    def detect(self, mx_servers: Sequence[str] = (), spf_records: Sequence[str] = (),
+               dkim_selectors: Sequence[str] = ()) -> ProviderMatch:
+        """Detect the email provider from MX hosts, SPF records and found DKIM selectors"""
+        mx_trie, spf_trie, dkim_index, _, order = self._compiled
+        evidence = {}
+
+        for server in mx_servers:
+            provider = self._match_suffix(mx_trie, server)
+            if provider:
+                evidence.setdefault(provider, set()).add('mx')
+        for record in spf_records:
+            for domain in _spf_domains(record):
+                provider = self._match_suffix(spf_trie, domain)
+                if provider:
+                    evidence.setdefault(provider, set()).add('spf')
+        for selector in dkim_selectors:
+            for provider in dkim_index.get(selector.lower(), ()):
+                evidence.setdefault(provider, set()).add('dkim')
+
+        if not evidence:
+            return NO_MATCH
+
+        # Strongest evidence wins; ties go to the provider listed first in the table
+        provider, signals = max(
+            evidence.items(),
+            key=lambda item: (sum(SIGNAL_WEIGHTS[signal] for signal in item[1]), -order[item[0]])
+        )
+        confidence = round(min(1.0, sum(SIGNAL_WEIGHTS[signal] for signal in signals)), 2)
+        return ProviderMatch(provider, confidence, tuple(s for s in SIGNAL_WEIGHTS if s in signals))
+
+    def selectors_for(self, mx_servers: Sequence[str]) -> List[str]:
+        """DKIM selectors to probe first for the provider behind these MX hosts"""
+        match = self.detect(mx_servers=mx_servers)
+        return list(self._compiled[3].get(match.provider, []))
+
+    def provider_selectors(self, provider: str) -> List[str]:
+        """DKIM selectors to probe for a named provider"""
+        return list(self._compiled[3].get(provider, []))
+
+
+# Global instance
+provider_detector = ProviderDetector()
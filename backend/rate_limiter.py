@@ -1,16 +1,763 @@
-from datetime import datetime, timedelta
-from typing import Dict, Tuple, Optional, Any
+import abc
+from datetime import datetime
+from typing import Dict, List, Tuple, Optional, Any
+import math
 import time
-from collections import defaultdict
 import threading
-import redis
 import os
 import logging
+from redis_pool import redis_manager
+from api_key_registry import api_key_registry, TierResolution
 
 logger = logging.getLogger(__name__)
 
+
+# Per-tier 'algorithm' in the rate limit config
+ALGORITHM_FIXED_WINDOW = 'fixed_window'
+ALGORITHM_GCRA = 'gcra'
+RATE_LIMIT_SHARDS = int(os.environ.get('RATE_LIMIT_SHARDS', '64'))
+RATE_LIMIT_SWEEP_INTERVAL = float(os.environ.get('RATE_LIMIT_SWEEP_INTERVAL', '60'))  # seconds
+# Fixed-window requests are admitted locally while the identifier's known usage stays below
+# this fraction of every limit; locally admitted requests reach Redis in batches every
+# RATE_LIMIT_SYNC_INTERVAL seconds. 0 sends every request to Redis.
+RATE_LIMIT_LOCAL_THRESHOLD = float(os.environ.get('RATE_LIMIT_LOCAL_THRESHOLD', '0.8'))
+RATE_LIMIT_SYNC_INTERVAL = float(os.environ.get('RATE_LIMIT_SYNC_INTERVAL', '0.25'))  # seconds
+
+# Rate limit windows: (name, limit key, bucket format, length/TTL in seconds)
+WINDOWS = (
+    ('minute', 'requests_per_minute', '%Y%m%d%H%M', 60),
+    ('hour', 'requests_per_hour', '%Y%m%d%H', 3600),
+    ('day', 'requests_per_day', '%Y%m%d', 86400)
+)
+
+# First records any requests already admitted locally (deltas), then checks every counter
+# and, only if all are under their limit, increments them all. The counters are one
+# identifier's windows, which share a hash tag and so a Redis Cluster slot.
+# KEYS: the counters; ARGV: limit, TTL and delta of each counter, in the same order.
+# Returns {allowed, count per counter...}.
+WINDOW_SCRIPT = """
+local n = #KEYS
+local counts = {}
+local allowed = 1
+for i = 1, n do
+    local delta = tonumber(ARGV[3 * i])
+    if delta > 0 and redis.call('INCRBY', KEYS[i], delta) == delta then
+        redis.call('EXPIRE', KEYS[i], ARGV[3 * i - 1])
+    end
+end
+for i = 1, n do
+    counts[i] = tonumber(redis.call('GET', KEYS[i]) or 0)
+    if counts[i] >= tonumber(ARGV[3 * i - 2]) then
+        allowed = 0
+    end
+end
+if allowed == 1 then
+    for i = 1, n do
+        counts[i] = redis.call('INCR', KEYS[i])
+        if counts[i] == 1 then
+            redis.call('EXPIRE', KEYS[i], ARGV[3 * i - 1])
+        end
+    end
+end
+local result = {allowed}
+for i = 1, n do
+    result[i + 1] = counts[i]
+end
+return result
+"""
+
+# Undoes one admission counted by WINDOW_SCRIPT, for a request another identifier's
+# limit then denied. KEYS: the counters (one identifier's). Counters that have
+# expired meanwhile are left alone.
+WINDOW_REFUND_SCRIPT = """
+for i = 1, #KEYS do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('DECR', KEYS[i])
+    end
+end
+return 1
+"""
+
+# GCRA: admits a request if it is no earlier than its theoretical arrival time (TAT)
+# minus the burst allowance, then pushes the TAT one emission interval on.
+# KEYS: the identifier's TAT; ARGV: now, emission interval (seconds), burst.
+# Returns {allowed, seconds until a request would be allowed, seconds until the TAT}
+# (floats as strings, since Redis truncates Lua numbers to integers).
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or 0)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - interval * burst
+if now < allow_at then
+    return {0, tostring(allow_at - now), tostring(tat - now)}
+end
+redis.call('SET', KEYS[1], string.format('%.6f', new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, '0', tostring(new_tat - now)}
+"""
+
+# Undoes one GCRA admission: moves the TAT back one emission interval.
+# KEYS: the identifier's TAT; ARGV: now, emission interval (seconds).
+GCRA_REFUND_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tat = tonumber(redis.call('GET', KEYS[1]) or 0) - tonumber(ARGV[2])
+if tat > now then
+    redis.call('SET', KEYS[1], string.format('%.6f', tat), 'PX', math.ceil((tat - now) * 1000))
+else
+    redis.call('DEL', KEYS[1])
+end
+return 1
+"""
+
+
+class RateLimitDecision:
+    """Outcome of one rate limit check"""
+
+    __slots__ = ('allowed', 'usage', 'remaining', 'retry_after', 'reset_at')
+
+    def __init__(self, allowed: bool, usage: Dict[str, int], remaining: Dict[str, int],
+                 retry_after: int, reset_at: int):
+        self.allowed = allowed
+        self.usage = usage  # requests counted per window
+        self.remaining = remaining  # requests left per window
+        self.retry_after = retry_after  # seconds until a denied request would be allowed
+        self.reset_at = reset_at  # epoch seconds at which the reported window resets
+
+
+def remaining_quota(limits: Dict[str, int], usage: Dict[str, int]) -> Dict[str, int]:
+    """Requests left in each window"""
+    return {name: max(0, limits[limit] - usage[name]) for name, limit, _, _ in WINDOWS}
+
+
+def window_retry_after(limits: Dict[str, int], usage: Dict[str, int], now: float) -> int:
+    """Seconds until every exhausted window has rolled over"""
+    seconds = int(now)
+    return max([(seconds // length + 1) * length - seconds
+                for name, limit, _, length in WINDOWS if usage[name] >= limits[limit]], default=0)
+
+
+def window_decision(allowed: bool, limits: Dict[str, int], usage: Dict[str, int],
+                    retry_after: int, now: float) -> RateLimitDecision:
+    """Decision of a fixed-window check; X-RateLimit-Reset reports the minute window"""
+    seconds = int(now)
+    reset_at = seconds + retry_after if not allowed else (seconds // 60 + 1) * 60
+    return RateLimitDecision(allowed, usage, remaining_quota(limits, usage), retry_after, reset_at)
+
+
+def gcra_parameters(limits: Dict[str, Any]) -> Tuple[float, int]:
+    """Emission interval (seconds per request) and burst size of a GCRA tier.
+
+    The tier's requests_per_minute is the sustained rate and 'burst' (default: the
+    same number) how many requests may arrive at once.
+    """
+    rate = limits['requests_per_minute']
+    return 60.0 / rate, int(limits.get('burst', rate))
+
+
+def gcra_decision(allowed: bool, limits: Dict[str, Any], delay: float,
+                  reset_after: float, now: float) -> RateLimitDecision:
+    """Decision of a GCRA check from the wait for the next allowed request and the time to drain"""
+    interval, burst = gcra_parameters(limits)
+    remaining = 0 if not allowed else max(0, int((burst * interval - reset_after) / interval + 1e-9))
+    return RateLimitDecision(
+        allowed,
+        {'minute': burst - remaining},
+        {'minute': remaining},
+        math.ceil(delay) if not allowed else 0,
+        math.ceil(now + reset_after)
+    )
+
+
+def uses_gcra(limits: Dict[str, Any]) -> bool:
+    return limits.get('algorithm', ALGORITHM_FIXED_WINDOW) == ALGORITHM_GCRA
+
+
+class RedisWindowCounter:
+    """Atomic minute/hour/day check-and-increment, one Redis round trip per request.
+
+    The check and the increments run in a single server-side script, so concurrent
+    requests on any number of instances can't overshoot a limit. The script is sent
+    once; later calls use EVALSHA and reload it only if Redis lost it.
+    """
+
+    def __init__(self, prefix: str = 'rate_limit'):
+        self.prefix = prefix
+        self._script = None
+        self._refund_script = None
+
+    def keys(self, identifier: str, now: datetime) -> list:
+        # The {identifier} hash tag keeps all of an identifier's windows in one cluster slot,
+        # so each script call stays within one slot; identifiers differ in slot
+        return [f"{self.prefix}:{{{identifier}}}:{now.strftime(bucket)}" for _, _, bucket, _ in WINDOWS]
+
+    def key(self, identifier: str, window: int, bucket: int) -> str:
+        """Key of one window's counter, from the window's index in WINDOWS and its bucket number"""
+        _, _, bucket_format, length = WINDOWS[window]
+        return f"{self.prefix}:{{{identifier}}}:{datetime.utcfromtimestamp(bucket * length).strftime(bucket_format)}"
+
+    def check(self, client, identifier: str, limits: Dict[str, int],
+              now: Optional[float] = None, deltas: Optional[List[int]] = None) -> RateLimitDecision:
+        """Count a request if it is within limits, after adding any per-window deltas already admitted"""
+        return self.check_many(client, [(identifier, limits)], now, [deltas] if deltas else None)[0]
+
+    def check_many(self, client, entries: List[Tuple[str, Dict[str, int]]], now: Optional[float] = None,
+                   deltas: Optional[List[List[int]]] = None) -> List[RateLimitDecision]:
+        """Count a request against several (identifier, limits) at once, in one round trip.
+
+        Each identifier is checked by its own script call (its keys share one cluster
+        slot; different identifiers' keys don't), all sent in one pipeline. The request
+        is admitted only if every identifier allows it; if any denies, the identifiers
+        that counted it are refunded. A denied decision's retry_after is non-zero only
+        for the identifiers that are exhausted.
+        """
+        if self._script is None:
+            self._script = client.register_script(WINDOW_SCRIPT)
+        now = time.time() if now is None else now
+        bucket_time = datetime.utcfromtimestamp(now)
+        calls = []
+        for j, (identifier, limits) in enumerate(entries):
+            args = []
+            for i, (_, limit, _, ttl) in enumerate(WINDOWS):
+                args += [limits[limit], ttl, deltas[j][i] if deltas else 0]
+            calls.append((self.keys(identifier, bucket_time), args))
+        if len(calls) == 1:
+            results = [self._script(keys=calls[0][0], args=calls[0][1], client=client)]
+        else:
+            pipe = client.pipeline(transaction=False)
+            for keys, args in calls:
+                self._script(keys=keys, args=args, client=pipe)
+            results = pipe.execute()
+
+        allowed = all(int(result[0]) for result in results)
+        if not allowed:
+            counted = [j for j, result in enumerate(results) if int(result[0])]
+            if counted:
+                self._refund(client, [calls[j][0] for j in counted])
+                for j in counted:
+                    results[j] = [0] + [int(count) - 1 for count in results[j][1:]]
+        decisions = []
+        for (_, limits), result in zip(entries, results):
+            usage = {name: int(count) for (name, _, _, _), count in zip(WINDOWS, result[1:])}
+            retry_after = 0 if allowed else window_retry_after(limits, usage, now)
+            decisions.append(window_decision(allowed, limits, usage, retry_after, now))
+        return decisions
+
+    def _refund(self, client, key_sets: List[list]):
+        if self._refund_script is None:
+            self._refund_script = client.register_script(WINDOW_REFUND_SCRIPT)
+        try:
+            pipe = client.pipeline(transaction=False)
+            for keys in key_sets:
+                self._refund_script(keys=keys, client=pipe)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not refund rate limit windows: {e}")
+
+
+class RedisGCRA:
+    """GCRA (generic cell rate algorithm) limiting in Redis: one key per identifier.
+
+    The key holds the theoretical arrival time (TAT) of the identifier's next request;
+    the check and update run in one script, so enforcement is exact across instances.
+    """
+
+    def __init__(self, prefix: str = 'rate_limit'):
+        self.prefix = prefix
+        self._script = None
+        self._refund_script = None
+
+    def key(self, identifier: str) -> str:
+        return f"{self.prefix}:{{{identifier}}}:gcra"
+
+    def check(self, client, identifier: str, limits: Dict[str, Any],
+              now: Optional[float] = None) -> RateLimitDecision:
+        """Admit a request if it conforms to the tier's rate and burst"""
+        if self._script is None:
+            self._script = client.register_script(GCRA_SCRIPT)
+        now = time.time() if now is None else now
+        interval, burst = gcra_parameters(limits)
+        allowed, delay, reset_after = self._script(keys=[self.key(identifier)],
+                                                   args=[repr(now), repr(interval), burst], client=client)
+        return gcra_decision(bool(int(allowed)), limits, float(delay), float(reset_after), now)
+
+    def refund(self, client, identifier: str, limits: Dict[str, Any], now: Optional[float] = None):
+        """Give back an admission, for a request another limit then denied"""
+        if self._refund_script is None:
+            self._refund_script = client.register_script(GCRA_REFUND_SCRIPT)
+        now = time.time() if now is None else now
+        interval, _ = gcra_parameters(limits)
+        self._refund_script(keys=[self.key(identifier)], args=[repr(now), repr(interval)], client=client)
+
+
+class _OrderedLocks:
+    """Acquires several locks in a fixed order (so concurrent holders can't deadlock)"""
+
+    __slots__ = ('locks',)
+
+    def __init__(self, locks: List[threading.Lock]):
+        self.locks = locks
+
+    def __enter__(self):
+        for lock in self.locks:
+            lock.acquire()
+
+    def __exit__(self, *exc_info):
+        for lock in reversed(self.locks):
+            lock.release()
+
+
+class _ShardedState(abc.ABC):
+    """Per-identifier state spread over independently locked shards, swept in the background"""
+
+    def __init__(self, shards: int = RATE_LIMIT_SHARDS, sweep_interval: float = RATE_LIMIT_SWEEP_INTERVAL):
+        self.shards = [({}, threading.Lock()) for _ in range(max(1, shards))]
+        self.sweep_interval = sweep_interval
+        self.evicted = 0
+        self._sweeper = None
+        self._sweeper_lock = threading.Lock()
+
+    def _shard(self, identifier: str):
+        if self._sweeper is None:
+            self._start_sweeper()
+        return self.shards[hash(identifier) % len(self.shards)]
+
+    def _shard_indexes(self, identifiers: List[str]) -> List[int]:
+        if self._sweeper is None:
+            self._start_sweeper()
+        return [hash(identifier) % len(self.shards) for identifier in identifiers]
+
+    def _locked(self, indexes: List[int]):
+        """Context manager holding the locks of the given shards"""
+        if len(indexes) == 1:
+            return self.shards[indexes[0]][1]
+        return _OrderedLocks([self.shards[index][1] for index in sorted(set(indexes))])
+
+    @abc.abstractmethod
+    def _expired(self, state, now: float) -> bool:
+        """Whether an identifier's state can be dropped"""
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drop identifiers whose state has expired; returns how many were dropped"""
+        now = time.time() if now is None else now
+        dropped = 0
+        for states, lock in self.shards:
+            with lock:
+                expired = [identifier for identifier, state in states.items() if self._expired(state, now)]
+                for identifier in expired:
+                    del states[identifier]
+            dropped += len(expired)
+        self.evicted += dropped
+        return dropped
+
+    def _start_sweeper(self):
+        with self._sweeper_lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep_forever, name='rate-limit-sweeper', daemon=True)
+                self._sweeper.start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                dropped = self.sweep()
+                if dropped:
+                    logger.debug(f"Rate limit sweeper dropped {dropped} expired identifiers")
+            except Exception as e:
+                logger.error(f"Rate limit sweep failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'identifiers': sum(len(states) for states, _ in self.shards),
+            'shards': len(self.shards),
+            'evicted': self.evicted
+        }
+
+
+class MemoryWindowCounter(_ShardedState):
+    """In-memory minute/hour/day counters with a constant cost per check.
+
+    Each identifier keeps one (bucket, count) slot per window, reset in place when
+    the window rolls over, so a check only touches that identifier's slots.
+    Identifiers whose day window has ended are dropped by the sweeper.
+    """
+
+    def check(self, identifier: str, limits: Dict[str, int],
+              now: Optional[float] = None) -> RateLimitDecision:
+        """Count a request if it is within limits"""
+        return self.check_many([(identifier, limits)], now)[0]
+
+    def check_many(self, entries: List[Tuple[str, Dict[str, int]]],
+                   now: Optional[float] = None) -> List[RateLimitDecision]:
+        """Count a request against several (identifier, limits) at once, only if all are within limits"""
+        now = time.time() if now is None else now
+        seconds = int(now)
+        indexes = self._shard_indexes([identifier for identifier, _ in entries])
+        with self._locked(indexes):
+            all_slots = []
+            allowed = True
+            for (identifier, limits), index in zip(entries, indexes):
+                counters = self.shards[index][0]
+                slots = counters.get(identifier)
+                if slots is None:
+                    slots = counters[identifier] = [0] * (2 * len(WINDOWS))
+                for i, (_, limit, _, length) in enumerate(WINDOWS):
+                    bucket = seconds // length
+                    if slots[2 * i] != bucket:
+                        slots[2 * i] = bucket
+                        slots[2 * i + 1] = 0
+                    if slots[2 * i + 1] >= limits[limit]:
+                        allowed = False
+                all_slots.append(slots)
+            if allowed:
+                for slots in all_slots:
+                    for i in range(len(WINDOWS)):
+                        slots[2 * i + 1] += 1
+            usages = [{name: slots[2 * i + 1] for i, (name, _, _, _) in enumerate(WINDOWS)} for slots in all_slots]
+        return [window_decision(allowed, limits, usage, 0 if allowed else window_retry_after(limits, usage, now), now)
+                for (_, limits), usage in zip(entries, usages)]
+
+    def _expired(self, slots, now: float) -> bool:
+        _, _, _, length = WINDOWS[-1]
+        return slots[-2] < int(now) // length
+
+
+class MemoryGCRA(_ShardedState):
+    """In-memory GCRA: one theoretical arrival time per identifier"""
+
+    def check(self, identifier: str, limits: Dict[str, Any],
+              now: Optional[float] = None) -> RateLimitDecision:
+        """Admit a request if it conforms to the tier's rate and burst"""
+        now = time.time() if now is None else now
+        interval, burst = gcra_parameters(limits)
+        arrivals, lock = self._shard(identifier)
+        with lock:
+            tat = max(arrivals.get(identifier, now), now)
+            new_tat = tat + interval
+            allow_at = new_tat - interval * burst
+            if now < allow_at:
+                return gcra_decision(False, limits, allow_at - now, tat - now, now)
+            arrivals[identifier] = new_tat
+        return gcra_decision(True, limits, 0.0, new_tat - now, now)
+
+    def refund(self, identifier: str, limits: Dict[str, Any], now: Optional[float] = None):
+        """Give back an admission, for a request another limit then denied"""
+        now = time.time() if now is None else now
+        interval, _ = gcra_parameters(limits)
+        arrivals, lock = self._shard(identifier)
+        with lock:
+            tat = arrivals.get(identifier, now) - interval
+            if tat > now:
+                arrivals[identifier] = tat
+            else:
+                arrivals.pop(identifier, None)
+
+    def _expired(self, tat: float, now: float) -> bool:
+        return tat <= now
+
+
+class LocalWindowCache(_ShardedState):
+    """Local pre-check in front of the Redis window counters.
+
+    Each instance remembers the last usage Redis reported for an identifier and
+    admits requests locally while that usage plus its own unsynced requests stays
+    below local_threshold of every limit. Local admissions are pushed to Redis in
+    one pipeline every sync_interval, which also refreshes the remembered usage.
+    Identifiers seen for the first time, or close to a limit, are checked in Redis
+    synchronously (carrying their unsynced requests along), so the answer near a
+    limit is exact.
+
+    The error is bounded: across N instances at most N x local_threshold x limit
+    requests can be admitted on stale usage before the next sync reports it.
+    """
+
+    def __init__(self, counter: RedisWindowCounter, local_threshold: float = RATE_LIMIT_LOCAL_THRESHOLD,
+                 sync_interval: float = RATE_LIMIT_SYNC_INTERVAL, **kwargs):
+        super().__init__(**kwargs)
+        self.counter = counter
+        self.local_threshold = local_threshold
+        self.sync_interval = sync_interval
+        self.pending = [{} for _ in self.shards]  # per shard: (identifier, window, bucket) -> unsynced requests
+        self.local_checks = 0
+        self.redis_checks = 0
+        self.syncs = 0
+        self._syncer = None
+
+    def check(self, client, identifier: str, limits: Dict[str, int],
+              now: Optional[float] = None) -> RateLimitDecision:
+        """Admit a request locally when far from every limit, otherwise check it in Redis"""
+        return self.check_many(client, [(identifier, limits)], now)[0]
+
+    def check_many(self, client, entries: List[Tuple[str, Dict[str, int]]],
+                   now: Optional[float] = None) -> List[RateLimitDecision]:
+        """Admit a request locally when every (identifier, limits) is far from its limits,
+        otherwise check them all in Redis in one call"""
+        now = time.time() if now is None else now
+        seconds = int(now)
+        indexes = self._shard_indexes([identifier for identifier, _ in entries])
+        if self._syncer is None:
+            self._start_syncer()
+
+        with self._locked(indexes):
+            all_slots = []
+            local = True
+            for (identifier, limits), index in zip(entries, indexes):
+                slots = self.shards[index][0].get(identifier)
+                all_slots.append(slots)
+                if slots is None:
+                    local = False
+                    continue
+                for i, (_, limit, _, length) in enumerate(WINDOWS):
+                    bucket = seconds // length
+                    if slots[2 * i] != bucket:
+                        slots[2 * i] = bucket
+                        slots[2 * i + 1] = 0
+                    if slots[2 * i + 1] + 1 > limits[limit] * self.local_threshold:
+                        local = False
+            if local:
+                decisions = []
+                for (identifier, limits), index, slots in zip(entries, indexes, all_slots):
+                    pending = self.pending[index]
+                    for i in range(len(WINDOWS)):
+                        slots[2 * i + 1] += 1
+                        entry = (identifier, i, slots[2 * i])
+                        pending[entry] = pending.get(entry, 0) + 1
+                    usage = {name: slots[2 * i + 1] for i, (name, _, _, _) in enumerate(WINDOWS)}
+                    decisions.append(window_decision(True, limits, usage, 0, now))
+                self.local_checks += 1
+                return decisions
+            deltas = [[self.pending[index].pop((identifier, i, seconds // length), 0)
+                       for i, (_, _, _, length) in enumerate(WINDOWS)]
+                      for (identifier, _), index in zip(entries, indexes)]
+
+        try:
+            decisions = self.counter.check_many(client, entries, now, deltas)
+        except Exception:
+            # Keep the unsynced requests for the next attempt
+            with self._locked(indexes):
+                for (identifier, _), index, identifier_deltas in zip(entries, indexes, deltas):
+                    for i, delta in enumerate(identifier_deltas):
+                        if delta:
+                            entry = (identifier, i, seconds // WINDOWS[i][3])
+                            self.pending[index][entry] = self.pending[index].get(entry, 0) + delta
+            raise
+        self.redis_checks += 1
+        with self._locked(indexes):
+            for (identifier, _), index, decision in zip(entries, indexes, decisions):
+                usages, pending = self.shards[index][0], self.pending[index]
+                slots = usages.setdefault(identifier, [0] * (2 * len(WINDOWS)))
+                for i, (name, _, _, length) in enumerate(WINDOWS):
+                    bucket = seconds // length
+                    known = decision.usage[name] + pending.get((identifier, i, bucket), 0)
+                    if slots[2 * i] != bucket or slots[2 * i + 1] < known:
+                        slots[2 * i] = bucket
+                        slots[2 * i + 1] = known
+        return decisions
+
+    def sync(self):
+        """Push every shard's unsynced requests to Redis in one pipeline and refresh the known usage"""
+        client = redis_manager.client
+        if client is None:
+            return
+        batch = []
+        for index, (_, lock) in enumerate(self.shards):
+            with lock:
+                if self.pending[index]:
+                    batch.append((index, self.pending[index]))
+                    self.pending[index] = {}
+        if not batch:
+            return
+
+        entries = [(index, entry, delta) for index, pending in batch for entry, delta in pending.items()]
+        try:
+            pipe = client.pipeline(transaction=False)
+            for _, (identifier, window, bucket), delta in entries:
+                key = self.counter.key(identifier, window, bucket)
+                pipe.incrby(key, delta)
+                pipe.expire(key, WINDOWS[window][3])
+            totals = pipe.execute()[::2]
+        except Exception as e:
+            logger.warning(f"Rate limit sync failed, retrying next interval: {e}")
+            redis_manager.record_failure(e)
+            for index, entry, delta in entries:
+                with self.shards[index][1]:
+                    self.pending[index][entry] = self.pending[index].get(entry, 0) + delta
+            return
+
+        for (index, entry, _), total in zip(entries, totals):
+            identifier, window, bucket = entry
+            usages, lock = self.shards[index]
+            with lock:
+                slots = usages.get(identifier)
+                if slots is not None and slots[2 * window] == bucket:
+                    known = int(total) + self.pending[index].get(entry, 0)
+                    if known > slots[2 * window + 1]:
+                        slots[2 * window + 1] = known
+        self.syncs += 1
+
+    def _start_syncer(self):
+        with self._sweeper_lock:
+            if self._syncer is None:
+                self._syncer = threading.Thread(target=self._sync_forever, name='rate-limit-sync', daemon=True)
+                self._syncer.start()
+
+    def _sync_forever(self):
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Rate limit sync failed: {e}")
+
+    def _expired(self, slots, now: float) -> bool:
+        _, _, _, length = WINDOWS[-1]
+        return slots[-2] < int(now) // length
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        checks = self.local_checks + self.redis_checks
+        stats.update({
+            'local_threshold': self.local_threshold,
+            'sync_interval': self.sync_interval,
+            'local_checks': self.local_checks,
+            'redis_checks': self.redis_checks,
+            'local_rate': self.local_checks / checks if checks else 0.0,
+            'syncs': self.syncs,
+            'unsynced': sum(sum(pending.values()) for pending in self.pending)
+        })
+        return stats
+
+
+# Shared by every limiter that counts in Redis
+redis_window_counter = RedisWindowCounter()
+redis_gcra = RedisGCRA()
+local_window_cache = LocalWindowCache(redis_window_counter)
+
+
+# Request dimensions limited independently; every metered request counts against each that applies
+DIMENSION_IP = 'ip'
+DIMENSION_API_KEY = 'api_key'
+DIMENSION_DOMAIN = 'domain'
+DIMENSION_GLOBAL = 'global'
+
+
+def resolved_limits(tiers: Dict[str, Dict[str, Any]], resolution: TierResolution) -> Dict[str, Any]:
+    """Limits for a resolved tier, with the API key's custom quota applied over them"""
+    limits = tiers.get(resolution.tier, tiers['free'])
+    return {**limits, **resolution.limits} if resolution.limits else limits
+
+
+def dimension_identifier(dimension: str, value: str) -> str:
+    # IP counters keep the plain key layout used before dimensions existed
+    return value if dimension == DIMENSION_IP else f"{dimension}:{value}"
+
+
+def check_dimensions(client, memory_counter: 'MemoryWindowCounter', memory_gcra: 'MemoryGCRA',
+                     dimensions: List[Tuple[str, str, Dict[str, Any]]]) -> Tuple[bool, List[Tuple[str, Dict, RateLimitDecision]]]:
+    """Check one request against every (dimension, value, limits) at once.
+
+    GCRA dimensions are checked first, each on its own, and fixed-window dimensions
+    after them together, in one local pass or one Redis round trip that counts the
+    request for all of them only if all allow it. A request denied by any dimension
+    is not charged to the others: GCRA admissions made before the denial are refunded.
+    With client None the in-memory limiters are used; if Redis fails part-way, only
+    the dimensions not yet checked move to memory. Returns (allowed, [(dimension, limits, decision)]).
+    """
+    gcra = [(dimension, dimension_identifier(dimension, value), limits)
+            for dimension, value, limits in dimensions if uses_gcra(limits)]
+    windows = [(dimension, dimension_identifier(dimension, value), limits)
+               for dimension, value, limits in dimensions if not uses_gcra(limits)]
+    now = time.time()
+    redis_client = client
+    decisions = []
+    refunds = []
+    allowed = True
+
+    def redis_failed(error: Exception):
+        logger.error(f"Redis rate limiting error: {error}")
+        redis_manager.record_failure(error)
+
+    for dimension, identifier, limits in gcra:
+        decision = None
+        if redis_client is not None:
+            try:
+                decision = redis_gcra.check(redis_client, identifier, limits, now)
+                refunds.append((redis_gcra.refund, (redis_client, identifier, limits)))
+            except Exception as e:
+                redis_failed(e)
+                redis_client = None
+        if decision is None:
+            decision = memory_gcra.check(identifier, limits, now)
+            refunds.append((memory_gcra.refund, (identifier, limits)))
+        decisions.append((dimension, limits, decision))
+        if not decision.allowed:
+            refunds.pop()
+            allowed = False
+            break
+
+    if allowed and windows:
+        entries = [(identifier, limits) for _, identifier, limits in windows]
+        window_decisions = None
+        if redis_client is not None:
+            try:
+                counter = local_window_cache if local_window_cache.local_threshold > 0 else redis_window_counter
+                window_decisions = counter.check_many(redis_client, entries, now)
+            except Exception as e:
+                redis_failed(e)
+                redis_client = None
+        if window_decisions is None:
+            window_decisions = memory_counter.check_many(entries, now)
+        decisions.extend((dimension, limits, decision)
+                         for (dimension, _, limits), decision in zip(windows, window_decisions))
+        allowed = all(decision.allowed for decision in window_decisions)
+
+    if not allowed:
+        for refund, args in refunds:
+            try:
+                refund(*args)
+            except Exception as e:
+                logger.warning(f"Could not refund a GCRA admission: {e}")
+    if client is not None and redis_client is not None:
+        redis_manager.record_success()
+    return allowed, decisions
+
+
+def dimension_result(allowed: bool, decisions: List[Tuple[str, Dict, RateLimitDecision]]) -> Dict[str, Any]:
+    """Rate limit info for a multi-dimension check: details of the dimension that tripped
+    (or of the first one when allowed), plus every dimension's remaining quota"""
+    tripped = [entry for entry in decisions if entry[2].retry_after > 0]
+    dimension, limits, decision = tripped[0] if tripped else decisions[0]
+    return {
+        'limit_exceeded': not allowed,
+        'retry_after': max((d.retry_after for _, _, d in tripped), default=0),
+        'dimension': dimension if not allowed else None,
+        'limits': limits,
+        'current_usage': decision.usage,
+        'remaining': decision.remaining,
+        'reset': decision.reset_at,
+        'dimensions': {
+            name: {'limit_exceeded': d.retry_after > 0, 'remaining': d.remaining}
+            for name, _, d in decisions
+        }
+    }
+
+
+def redis_limiter_for(limits: Dict[str, Any]):
+    """The Redis-backed limiter for a tier: GCRA, or fixed windows behind the local pre-check"""
+    if uses_gcra(limits):
+        return redis_gcra
+    if local_window_cache.local_threshold > 0:
+        return local_window_cache
+    return redis_window_counter
+
+
 class RateLimiter:
     def __init__(self):
+        # Tiers count fixed minute/hour/day windows unless they set 'algorithm': ALGORITHM_GCRA,
+        # which smooths requests_per_minute with an optional 'burst' (hour/day limits then don't apply)
         self.rate_limits = {
             'free': {
                 'requests_per_minute': 10,
@@ -29,46 +776,26 @@ class RateLimiter:
             }
         }
         
-        # Try to connect to Redis, fallback to in-memory
-        self.redis_client = None
-        try:
-            redis_url = os.environ.get('REDIS_URL', 'redis://localhost:6379')
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
-            self.redis_client.ping()
-            logger.info("Connected to Redis for rate limiting")
-        except Exception as e:
-            logger.warning(f"Redis not available, using in-memory rate limiting: {e}")
-            self.redis_client = None
-        
-        # In-memory storage for rate limiting (fallback)
-        self.request_counts = defaultdict(int)
-        self.last_reset = defaultdict(datetime.utcnow)
-        self.lock = threading.Lock()
+        # In-memory rate limiting (fallback)
+        self.memory_counter = MemoryWindowCounter()
+        self.memory_gcra = MemoryGCRA()
+    
+    @property
+    def redis_client(self):
+        """Shared pooled Redis client; None while Redis is unavailable, falling back to in-memory"""
+        return redis_manager.client
     
     def get_user_tier(self, api_key: Optional[str] = None, ip: str = None) -> str:
         """Determine user tier based on API key or IP reputation"""
-        if api_key:
-            # Check if API key exists and is valid
-            if self._is_valid_api_key(api_key):
-                return 'authenticated'
-        
-        # Check IP reputation
-        if self._is_premium_ip(ip):
-            return 'premium'
-        
-        return 'free'
+        return api_key_registry.get_tier(api_key, ip)
     
     def _is_valid_api_key(self, api_key: str) -> bool:
-        """Check if API key is valid"""
-        # For now, check against environment variable
-        valid_keys = os.environ.get('VALID_API_KEYS', '').split(',')
-        return api_key in valid_keys
+        """Check if API key is registered"""
+        return api_key_registry.is_valid_api_key(api_key)
     
     def _is_premium_ip(self, ip: str) -> bool:
         """Check if IP is premium (trusted)"""
-        # For now, check against environment variable
-        premium_ips = os.environ.get('PREMIUM_IPS', '').split(',')
-        return ip in premium_ips
+        return api_key_registry.is_premium_ip(ip)
     
     def check_rate_limit(self, identifier: str, tier: str = 'free') -> Tuple[bool, Dict[str, Any]]:
         """Check if request is within rate limits"""
@@ -77,139 +804,41 @@ class RateLimiter:
         else:
             return self._check_rate_limit_memory(identifier, tier)
     
+    def check_dimensions(self, dimensions: List[Tuple[str, str, Dict[str, Any]]]) -> Tuple[bool, Dict[str, Any]]:
+        """Check a request against several (dimension, value, limits) at once, e.g. its IP,
+        API key and target domain; the result names the dimension that tripped"""
+        allowed, decisions = check_dimensions(self.redis_client, self.memory_counter, self.memory_gcra, dimensions)
+        return allowed, dimension_result(allowed, decisions)
+    
     def _check_rate_limit_redis(self, identifier: str, tier: str) -> Tuple[bool, Dict[str, Any]]:
         """Check rate limits using Redis"""
         try:
             limits = self.rate_limits[tier]
-            now = datetime.utcnow()
-            
-            # Create keys for different time windows
-            minute_key = f"rate_limit:{identifier}:{now.strftime('%Y%m%d%H%M')}"
-            hour_key = f"rate_limit:{identifier}:{now.strftime('%Y%m%d%H')}"
-            day_key = f"rate_limit:{identifier}:{now.strftime('%Y%m%d')}"
-            
-            # Get current counts
-            minute_count = int(self.redis_client.get(minute_key) or 0)
-            hour_count = int(self.redis_client.get(hour_key) or 0)
-            day_count = int(self.redis_client.get(day_key) or 0)
-            
-            # Check if any limit is exceeded
-            if (minute_count >= limits['requests_per_minute'] or
-                hour_count >= limits['requests_per_hour'] or
-                day_count >= limits['requests_per_day']):
-                
-                return False, {
-                    'limit_exceeded': True,
-                    'retry_after': self._get_retry_after_redis(identifier, limits),
-                    'limits': limits,
-                    'current_usage': {
-                        'minute': minute_count,
-                        'hour': hour_count,
-                        'day': day_count
-                    }
-                }
-            
-            # Increment counters with expiration
-            pipe = self.redis_client.pipeline()
-            pipe.incr(minute_key)
-            pipe.expire(minute_key, 60)  # 1 minute
-            pipe.incr(hour_key)
-            pipe.expire(hour_key, 3600)  # 1 hour
-            pipe.incr(day_key)
-            pipe.expire(day_key, 86400)  # 1 day
-            pipe.execute()
-            
-            return True, {
-                'limit_exceeded': False,
-                'limits': limits,
-                'current_usage': {
-                    'minute': minute_count + 1,
-                    'hour': hour_count + 1,
-                    'day': day_count + 1
-                }
-            }
+            decision = redis_limiter_for(limits).check(self.redis_client, identifier, limits)
+            redis_manager.record_success()
+            return self._result(limits, decision)
             
         except Exception as e:
             logger.error(f"Redis rate limiting error: {e}")
+            redis_manager.record_failure(e)
             # Fallback to memory-based rate limiting
             return self._check_rate_limit_memory(identifier, tier)
     
     def _check_rate_limit_memory(self, identifier: str, tier: str) -> Tuple[bool, Dict[str, Any]]:
         """Check rate limits using in-memory storage"""
-        with self.lock:
-            now = datetime.utcnow()
-            limits = self.rate_limits[tier]
-            
-            # Reset counters if needed
-            self._reset_counters_if_needed(identifier, now)
-            
-            # Check limits
-            minute_key = f"{identifier}:{now.strftime('%Y%m%d%H%M')}"
-            hour_key = f"{identifier}:{now.strftime('%Y%m%d%H')}"
-            day_key = f"{identifier}:{now.strftime('%Y%m%d')}"
-            
-            minute_count = self.request_counts[minute_key]
-            hour_count = self.request_counts[hour_key]
-            day_count = self.request_counts[day_key]
-            
-            # Check if any limit is exceeded
-            if (minute_count >= limits['requests_per_minute'] or
-                hour_count >= limits['requests_per_hour'] or
-                day_count >= limits['requests_per_day']):
-                
-                return False, {
-                    'limit_exceeded': True,
-                    'retry_after': self._get_retry_after_memory(identifier, limits),
-                    'limits': limits,
-                    'current_usage': {
-                        'minute': minute_count,
-                        'hour': hour_count,
-                        'day': day_count
-                    }
-                }
-            
-            # Increment counters
-            self.request_counts[minute_key] += 1
-            self.request_counts[hour_key] += 1
-            self.request_counts[day_key] += 1
-            
-            return True, {
-                'limit_exceeded': False,
-                'limits': limits,
-                'current_usage': {
-                    'minute': minute_count + 1,
-                    'hour': hour_count + 1,
-                    'day': day_count + 1
-                }
-            }
-    
-    def _get_retry_after_redis(self, identifier: str, limits: Dict) -> int:
-        """Get retry after time for Redis-based rate limiting"""
-        # Return 60 seconds for now (simplified)
-        return 60
+        limits = self.rate_limits[tier]
+        counter = self.memory_gcra if uses_gcra(limits) else self.memory_counter
+        return self._result(limits, counter.check(identifier, limits))
     
-    def _get_retry_after_memory(self, identifier: str, limits: Dict) -> int:
-        """Get retry after time for memory-based rate limiting"""
-        # Return 60 seconds for now (simplified)
-        return 60
-    
-    def _reset_counters_if_needed(self, identifier: str, now: datetime):
-        """Reset counters for old time periods"""
-        # Clean up old entries (older than 24 hours)
-        cutoff = now - timedelta(hours=24)
-        keys_to_remove = []
-        
-        for key in self.request_counts:
-            if key.startswith(f"{identifier}:"):
-                try:
-                    # Extract timestamp from key and check if it's old
-                    timestamp_str = key.split(':', 1)[1]
-                    if len(timestamp_str) >= 8:  # YYYYMMDD format
-                        key_date = datetime.strptime(timestamp_str[:8], '%Y%m%d')
-                        if key_date < cutoff.date():
-                            keys_to_remove.append(key)
-                except:
-                    pass
-        
-        for key in keys_to_remove:
-            del self.request_counts[key]
+    @staticmethod
+    def _result(limits: Dict[str, Any], decision: RateLimitDecision) -> Tuple[bool, Dict[str, Any]]:
+        result = {
+            'limit_exceeded': not decision.allowed,
+            'limits': limits,
+            'current_usage': decision.usage,
+            'remaining': decision.remaining,
+            'reset': decision.reset_at
+        }
+        if not decision.allowed:
+            result['retry_after'] = decision.retry_after
+        return decision.allowed, result
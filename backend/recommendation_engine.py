@@ -1,136 +1,176 @@
 import logging
-from typing import Dict, Any, List
-from config_loader import ConfigLoader
+from operator import itemgetter
+from typing import Dict, Any, List, Mapping, Optional, Tuple
+from config_loader import ConfigLoader, RecommendationCatalog
+from features import DomainFeatures, extract_features
+from score_cache import ScoreCache, score_cache
 
 logger = logging.getLogger(__name__)
 
+# A catalog record and its precomputed sort key
+RecommendationEntry = Tuple[Mapping[str, Any], Tuple[int, bool, bool]]
+
 class RecommendationEngine:
     """Generate specific, actionable recommendations based on granular analysis"""
     
-    def __init__(self, config_loader: ConfigLoader):
+    def __init__(self, config_loader: ConfigLoader, cache: Optional[ScoreCache] = None):
         self.config = config_loader
+        self.cache = cache if cache is not None else score_cache
         self.recommendations = []
     
     def generate_recommendations(self, component_scores: Dict[str, Dict[str, Any]], 
-                                parsed_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Generate comprehensive recommendations based on granular analysis"""
+                                parsed_data: Dict[str, Any],
+                                features: Optional[DomainFeatures] = None) -> List[Dict[str, Any]]:
+        """Generate comprehensive recommendations based on granular analysis.
+        
+        The result is memoized (see _cache_key) and shared between callers; treat it as read-only.
+        """
+        if features is None:
+            features = extract_features(dmarc_result=parsed_data.get('dmarc', {}))
+        snapshot = self.config.snapshot
+        return self.cache.get_or_compute(
+            'recommendations',
+            self._cache_key(snapshot.version, component_scores, features),
+            lambda: self._generate(component_scores, parsed_data, features, snapshot.recommendation_catalog)
+        )
+    
+    @staticmethod
+    def _cache_key(config_version: str, component_scores: Dict[str, Dict[str, Any]],
+                   features: DomainFeatures) -> Tuple:
+        """Everything the generators below read: detail points, component totals and DMARC features"""
+        def points(component, detail):
+            return component_scores.get(component, {}).get('details', {}).get(detail, {}).get('points', 0)
+        
+        return (
+            config_version,
+            points('mx', 'redundancy'), points('mx', 'provider'),
+            points('spf', 'policy'), points('spf', 'mechanisms'),
+            points('dkim', 'selectors'), points('dkim', 'algorithm'),
+            tuple(sorted((name, score.get('total', 0)) for name, score in component_scores.items())),
+            features.key('recommendations')
+        )
+    
+    def _generate(self, component_scores: Dict[str, Dict[str, Any]], parsed_data: Dict[str, Any],
+                  features: DomainFeatures, catalog: RecommendationCatalog) -> List[Dict[str, Any]]:
+        """Run every recommendation generator and prioritize the results"""
         recommendations = []
         
         # Component-specific recommendations
-        mx_recs = self._generate_mx_recommendations(component_scores.get('mx', {}), parsed_data.get('mx', {}))
+        mx_recs = self._generate_mx_recommendations(component_scores.get('mx', {}), parsed_data.get('mx', {}), catalog)
         recommendations.extend(mx_recs)
         
-        spf_recs = self._generate_spf_recommendations(component_scores.get('spf', {}), parsed_data.get('spf', {}))
+        spf_recs = self._generate_spf_recommendations(component_scores.get('spf', {}), parsed_data.get('spf', {}), catalog)
         recommendations.extend(spf_recs)
         
-        dmarc_recs = self._generate_dmarc_recommendations(component_scores.get('dmarc', {}), parsed_data.get('dmarc', {}))
+        dmarc_recs = self._generate_dmarc_recommendations(component_scores.get('dmarc', {}), features, catalog)
         recommendations.extend(dmarc_recs)
         
-        dkim_recs = self._generate_dkim_recommendations(component_scores.get('dkim', {}), parsed_data.get('dkim', {}))
+        dkim_recs = self._generate_dkim_recommendations(component_scores.get('dkim', {}), parsed_data.get('dkim', {}), catalog)
         recommendations.extend(dkim_recs)
         
         # Cross-component recommendations
-        cross_recs = self._generate_cross_component_recommendations(component_scores, parsed_data)
+        cross_recs = self._generate_cross_component_recommendations(component_scores, parsed_data, catalog)
         recommendations.extend(cross_recs)
         
         return self._prioritize_recommendations(recommendations)
     
-    def _generate_mx_recommendations(self, mx_score: Dict[str, Any], mx_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _generate_mx_recommendations(self, mx_score: Dict[str, Any], mx_data: Dict[str, Any],
+                                     catalog: RecommendationCatalog) -> List[RecommendationEntry]:
         """Generate MX-specific recommendations"""
         recommendations = []
         
         # Check redundancy
         redundancy_score = mx_score.get('details', {}).get('redundancy', {}).get('points', 0)
         if redundancy_score < 3:
-            rec = self._get_recommendation('mx', 'mx_redundancy_score < 3')
+            rec = self._get_recommendation(catalog, 'mx', 'mx_redundancy_score < 3')
             if rec:
                 recommendations.append(rec)
         
         # Check provider quality
         provider_score = mx_score.get('details', {}).get('provider', {}).get('points', 0)
         if provider_score < 3:
-            rec = self._get_recommendation('mx', 'mx_provider_score < 3')
+            rec = self._get_recommendation(catalog, 'mx', 'mx_provider_score < 3')
             if rec:
                 recommendations.append(rec)
         
         return recommendations
     
-    def _generate_spf_recommendations(self, spf_score: Dict[str, Any], spf_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _generate_spf_recommendations(self, spf_score: Dict[str, Any], spf_data: Dict[str, Any],
+                                      catalog: RecommendationCatalog) -> List[RecommendationEntry]:
         """Generate SPF-specific recommendations"""
         recommendations = []
         
         # Check policy strength
         policy_score = spf_score.get('details', {}).get('policy', {}).get('points', 0)
         if policy_score < 5:
-            rec = self._get_recommendation('spf', 'spf_policy_score < 5')
+            rec = self._get_recommendation(catalog, 'spf', 'spf_policy_score < 5')
             if rec:
                 recommendations.append(rec)
         
         # Check mechanisms
         mechanism_score = spf_score.get('details', {}).get('mechanisms', {}).get('points', 0)
         if mechanism_score < 3:
-            rec = self._get_recommendation('spf', 'spf_mechanism_score < 3')
+            rec = self._get_recommendation(catalog, 'spf', 'spf_mechanism_score < 3')
             if rec:
                 recommendations.append(rec)
         
         return recommendations
     
-    def _generate_dmarc_recommendations(self, dmarc_score: Dict[str, Any], dmarc_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _generate_dmarc_recommendations(self, dmarc_score: Dict[str, Any], features: DomainFeatures,
+                                        catalog: RecommendationCatalog) -> List[RecommendationEntry]:
         """Generate DMARC-specific recommendations"""
         recommendations = []
         
-        # Get parsed DMARC data
-        dmarc_records = dmarc_data.get('records', [])
-        if dmarc_records:
-            from parsers import parse_dmarc_record
-            parsed_dmarc = parse_dmarc_record(dmarc_records[0].get('record', ''))
-            
+        # Use the DMARC record parsed during feature extraction
+        if features.dmarc_parsed:
             # Check policy
-            if parsed_dmarc.get('policy') == 'none':
-                rec = self._get_recommendation('dmarc', 'dmarc_policy == \'none\'')
+            if features.dmarc_policy == 'none':
+                rec = self._get_recommendation(catalog, 'dmarc', 'dmarc_policy == \'none\'')
                 if rec:
                     recommendations.append(rec)
-            elif parsed_dmarc.get('policy') == 'quarantine':
-                rec = self._get_recommendation('dmarc', 'dmarc_policy == \'quarantine\'')
+            elif features.dmarc_policy == 'quarantine':
+                rec = self._get_recommendation(catalog, 'dmarc', 'dmarc_policy == \'quarantine\'')
                 if rec:
                     recommendations.append(rec)
             
             # Check coverage
-            if parsed_dmarc.get('percentage') != 100:
-                rec = self._get_recommendation('dmarc', 'dmarc_percentage != 100')
+            if features.dmarc_pct != 100:
+                rec = self._get_recommendation(catalog, 'dmarc', 'dmarc_percentage != 100')
                 if rec:
                     recommendations.append(rec)
             
             # Check reporting
-            if not parsed_dmarc.get('rua'):
-                rec = self._get_recommendation('dmarc', 'dmarc_rua_missing')
+            if not features.dmarc_rua:
+                rec = self._get_recommendation(catalog, 'dmarc', 'dmarc_rua_missing')
                 if rec:
                     recommendations.append(rec)
         
         return recommendations
     
-    def _generate_dkim_recommendations(self, dkim_score: Dict[str, Any], dkim_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _generate_dkim_recommendations(self, dkim_score: Dict[str, Any], dkim_data: Dict[str, Any],
+                                       catalog: RecommendationCatalog) -> List[RecommendationEntry]:
         """Generate DKIM-specific recommendations"""
         recommendations = []
         
         # Check selectors
         selector_score = dkim_score.get('details', {}).get('selectors', {}).get('points', 0)
         if selector_score < 3:
-            rec = self._get_recommendation('dkim', 'dkim_selector_score < 3')
+            rec = self._get_recommendation(catalog, 'dkim', 'dkim_selector_score < 3')
             if rec:
                 recommendations.append(rec)
         
         # Check algorithm
         algorithm_score = dkim_score.get('details', {}).get('algorithm', {}).get('points', 0)
         if algorithm_score < 3:
-            rec = self._get_recommendation('dkim', 'dkim_algorithm_score < 3')
+            rec = self._get_recommendation(catalog, 'dkim', 'dkim_algorithm_score < 3')
             if rec:
                 recommendations.append(rec)
         
         return recommendations
     
     def _generate_cross_component_recommendations(self, component_scores: Dict[str, Dict[str, Any]], 
-                                                parsed_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+                                                parsed_data: Dict[str, Any],
+                                                catalog: RecommendationCatalog) -> List[RecommendationEntry]:
         """Generate recommendations that span multiple components"""
         recommendations = []
         
@@ -144,57 +184,31 @@ class RecommendationEngine:
             missing_components.append('DMARC')
         
         if len(missing_components) >= 2:
-            rec = self._get_recommendation('cross_component', 'missing_critical_components >= 2')
+            rec = self._get_recommendation(catalog, 'cross_component', 'missing_critical_components >= 2')
             if rec:
-                rec['description'] = rec['description'].replace('critical email security components', 
-                                                               f'{", ".join(missing_components)} records')
-                recommendations.append(rec)
+                record, sort_key = rec
+                record = dict(record)
+                record['description'] = record['description'].replace('critical email security components', 
+                                                                     f'{", ".join(missing_components)} records')
+                recommendations.append((record, sort_key))
         
         # Check for weak overall configuration
         total_score = sum(comp.get('total', 0) for comp in component_scores.values())
         if total_score < 60:
-            rec = self._get_recommendation('cross_component', 'total_score < 60')
+            rec = self._get_recommendation(catalog, 'cross_component', 'total_score < 60')
             if rec:
                 recommendations.append(rec)
         
         return recommendations
     
-    def _get_recommendation(self, component: str, condition: str) -> Dict[str, Any]:
-        """Get recommendation from configuration"""
-        recs = self.config.recommendations[
-            (self.config.recommendations['component'] == component) &
-            (self.config.recommendations['condition'] == condition)
-        ]
-        
-        if recs.empty:
+    def _get_recommendation(self, catalog: RecommendationCatalog, component: str,
+                            condition: str) -> Optional[RecommendationEntry]:
+        """Get a (record, sort key) entry from the recommendation catalog"""
+        entry = catalog.get(component, condition)
+        if entry is None:
             logger.warning(f"No recommendation found for {component}.{condition}")
-            return None
-        
-        rec = recs.iloc[0]
-        return {
-            'component': rec['component'],
-            'type': rec['type'],
-            'priority': rec['priority'],
-            'title': rec['title'],
-            'description': rec['description'],
-            'impact': rec['impact'],
-            'effort': rec['effort'],
-            'action': rec['action'],
-            'example': rec['example'],
-            'estimated_time': rec['estimated_time'],
-            'technical_details': rec['technical_details']
-        }
+        return entry
     
-    def _prioritize_recommendations(self, recommendations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Sort recommendations by priority and type"""
-        priority_order = {
-            'critical': 1,
-            'important': 2,
-            'info': 3
-        }
-        
-        return sorted(recommendations, key=lambda x: (
-            priority_order.get(x['type'], 4),
-            x['priority'] == 'high',
-            x['component'] != 'cross_component'
-        ))
+    def _prioritize_recommendations(self, recommendations: List[RecommendationEntry]) -> List[Dict[str, Any]]:
+        """Sort recommendations by priority and type, returning fresh dicts for the response"""
+        return [dict(record) for record, _ in sorted(recommendations, key=itemgetter(1))]
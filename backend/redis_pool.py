@@ -0,0 +1,180 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any
+from lazy_imports import lazy_module
+
+redis = lazy_module('redis')
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379')
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', '50'))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', '0.25'))  # seconds
+REDIS_CONNECT_TIMEOUT = float(os.environ.get('REDIS_CONNECT_TIMEOUT', '0.5'))  # seconds
+REDIS_BREAKER_FAILURES = int(os.environ.get('REDIS_BREAKER_FAILURES', '3'))  # consecutive failures that open it
+REDIS_RECONNECT_INTERVAL = float(os.environ.get('REDIS_RECONNECT_INTERVAL', '5'))  # seconds between probes
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    Closed: calls go through. After failure_threshold consecutive failures it opens
+    and callers fail fast until reset() closes it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+
+    def __init__(self, failure_threshold: int = REDIS_BREAKER_FAILURES):
+        self.failure_threshold = failure_threshold
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.times_opened = 0
+        self.lock = threading.Lock()
+
+    @property
+    def closed(self) -> bool:
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        if self.failures:
+            with self.lock:
+                self.failures = 0
+
+    def record_failure(self, error: Exception) -> bool:
+        """Count a failure; returns True if this failure opened the breaker"""
+        with self.lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self.times_opened += 1
+                return True
+        return False
+
+    def trip(self, error: Exception):
+        """Open immediately"""
+        with self.lock:
+            self.failures = max(self.failures, self.failure_threshold)
+        self.record_failure(error)
+
+    def reset(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'failure_threshold': self.failure_threshold,
+            'opened_at': self.opened_at,
+            'times_opened': self.times_opened,
+            'last_error': self.last_error
+        }
+
+
+class RedisClientManager:
+    """One pooled Redis client shared by everything that talks to Redis.
+
+    The pool is explicitly sized and uses short socket timeouts, so a slow or dead
+    Redis costs milliseconds rather than a default socket timeout. Callers report
+    failures; after a few in a row the circuit breaker opens, `client` returns None
+    and callers fall back to their local path at once. A background thread probes
+    Redis while the breaker is open and closes it when Redis answers again.
+    """
+
+    def __init__(self, url: str = REDIS_URL, max_connections: int = REDIS_MAX_CONNECTIONS,
+                 socket_timeout: float = REDIS_SOCKET_TIMEOUT, connect_timeout: float = REDIS_CONNECT_TIMEOUT,
+                 reconnect_interval: float = REDIS_RECONNECT_INTERVAL):
+        self.url = url
+        self.max_connections = max_connections
+        self.socket_timeout = socket_timeout
+        self.connect_timeout = connect_timeout
+        self.reconnect_interval = reconnect_interval
+        self.breaker = CircuitBreaker()
+        self._client = None
+        self._connected = False
+        self._lock = threading.Lock()
+        self._reconnector = None
+
+    def _create_client(self):
+        pool = redis.ConnectionPool.from_url(
+            self.url,
+            max_connections=self.max_connections,
+            socket_timeout=self.socket_timeout,
+            socket_connect_timeout=self.connect_timeout,
+            decode_responses=True
+        )
+        return redis.Redis(connection_pool=pool)
+
+    def _connect(self):
+        """Create the pooled client and check Redis once; a failure opens the breaker"""
+        with self._lock:
+            if self._connected:
+                return
+            try:
+                self._client = self._create_client()
+                self._client.ping()
+                logger.info(f"Connected to Redis (pool of {self.max_connections})")
+            except Exception as e:
+                logger.warning(f"Redis not available, using in-memory fallbacks until it is: {e}")
+                self.breaker.trip(e)
+                self._start_reconnector()
+            self._connected = True
+
+    @property
+    def client(self):
+        """The shared client, or None while the breaker is open"""
+        if not self._connected:
+            self._connect()
+        return self._client if self.breaker.closed else None
+
+    def record_success(self):
+        self.breaker.record_success()
+
+    def record_failure(self, error: Exception):
+        if self.breaker.record_failure(error):
+            logger.warning(f"Redis circuit breaker opened after {self.breaker.failures} failures: {error}")
+            self._start_reconnector()
+
+    def _start_reconnector(self):
+        if self._reconnector is None or not self._reconnector.is_alive():
+            self._reconnector = threading.Thread(target=self._reconnect, name='redis-reconnect', daemon=True)
+            self._reconnector.start()
+
+    def _reconnect(self):
+        while not self.breaker.closed:
+            time.sleep(self.reconnect_interval)
+            try:
+                if self._client is None:
+                    self._client = self._create_client()
+                self._client.ping()
+            except Exception as e:
+                logger.debug(f"Redis still unavailable: {e}")
+                continue
+            self.breaker.reset()
+            logger.info("Redis reachable again, circuit breaker closed")
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {
+            'url': self.url.split('@')[-1],  # no credentials
+            'connected': self._connected,
+            'max_connections': self.max_connections,
+            'socket_timeout': self.socket_timeout,
+            'breaker': self.breaker.get_stats()
+        }
+        pool = self._client.connection_pool if self._client is not None else None
+        if pool is not None:
+            stats['pool_connections'] = getattr(pool, '_created_connections', None)
+        return stats
+
+
+# Global instance
+redis_manager = RedisClientManager()
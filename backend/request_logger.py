@@ -1,9 +1,9 @@
 import logging
 from datetime import datetime, timedelta
 from flask import request, g
-import json
 from typing import Dict, Any, Optional
 from firestore_config import firestore_manager
+from structured_logging import StructuredLogger
 import time
 
 logger = logging.getLogger(__name__)
@@ -11,6 +11,7 @@ logger = logging.getLogger(__name__)
 class RequestLogger:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        self.slog = StructuredLogger(__name__)
         
     def get_client_ip(self) -> str:
         """Extract real client IP considering proxies and load balancers"""
@@ -51,6 +52,7 @@ class RequestLogger:
             **fingerprint,
             'response_status': getattr(g, 'response_status', 200),
             'response_time_ms': getattr(g, 'response_time', 0),
+            'request_id': getattr(g, 'request_id', None),
             'error': error,
             'response_size': len(str(response_data)) if response_data else 0
         }
@@ -58,7 +60,8 @@ class RequestLogger:
         # Store in Firestore for analytics
         firestore_manager.store_request_log(log_entry)
         
-        # Log to application logs
-        self.logger.info(f"Request: {json.dumps(log_entry, default=str)}")
+        # Log to application logs (sampled; errors are always emitted)
+        is_error = bool(error) or log_entry['response_status'] >= 400
+        self.slog.event('request', logging.WARNING if is_error else logging.INFO, force=is_error, **log_entry)
         
         return log_entry
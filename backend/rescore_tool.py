@@ -0,0 +1,173 @@
+import os
+import csv
+import json
+import time
+import logging
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DELTA_COLUMNS = ['domain', 'id', 'before_score', 'after_score', 'delta', 'before_grade', 'after_grade']
+
+# Per-process scoring engines, created once by the pool initializer
+_engines = {}
+
+
+def iter_export(path: str) -> Iterator[Dict[str, Any]]:
+    """Read analyses from a JSONL export, one stored document (or bare analysis_results) per line"""
+    with open(path, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            doc = json.loads(line)
+            results = doc.get('analysis_results', doc)
+            yield {
+                'id': doc.get('id', str(line_number)),
+                'domain': doc.get('domain') or results.get('domain'),
+                'analysis_results': results
+            }
+
+
+def parsed_data_from_stored(analysis_results: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert stored analysis_results components back into lookup-result form"""
+    parsed = {}
+    for component in ('mx', 'spf', 'dmarc', 'dkim'):
+        stored = analysis_results.get(component) or {}
+        parsed[component] = {
+            f'has_{component}': bool(stored.get('enabled', False)),
+            'records': stored.get('records') or []
+        }
+    return parsed
+
+
+def _init_worker(baseline_dir: str, candidate_dir: str):
+    from config_loader import ConfigLoader
+    from scoring_engine import ScoringEngine
+    _engines['before'] = ScoringEngine(ConfigLoader(baseline_dir))
+    _engines['after'] = ScoringEngine(ConfigLoader(candidate_dir))
+
+
+def _rescore_chunk(chunk: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Process-pool entry point: score one chunk under both configs"""
+    before_engine = _engines['before']
+    after_engine = _engines['after']
+    rows = [before_engine.batch_features(parsed_data_from_stored(doc['analysis_results'])) for doc in chunk]
+    before = before_engine.score_batch_rows(rows)
+    after = after_engine.score_batch_rows(rows)
+
+    deltas = []
+    for i, doc in enumerate(chunk):
+        before_score = float(before['score'][i])
+        after_score = float(after['score'][i])
+        deltas.append({
+            'domain': doc['domain'],
+            'id': doc['id'],
+            'before_score': before_score,
+            'after_score': after_score,
+            'delta': round(after_score - before_score, 1),
+            'before_grade': before['grade'][i],
+            'after_grade': after['grade'][i]
+        })
+    return {
+        'deltas': deltas,
+        'before': Counter(before['grade'].tolist()),
+        'after': Counter(after['grade'].tolist())
+    }
+
+
+def _chunks(analyses: Iterable[Dict[str, Any]], chunk_size: int, latest_only: bool) -> Iterator[List[Dict[str, Any]]]:
+    """Group analyses into chunks, optionally keeping only the first (newest) one per domain"""
+    seen = set()
+    chunk = []
+    for doc in analyses:
+        if not doc.get('domain') or not doc.get('analysis_results'):
+            continue
+        if latest_only:
+            if doc['domain'] in seen:
+                continue
+            seen.add(doc['domain'])
+        chunk.append(doc)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class RescoreTool:
+    """What-if rescoring of stored analyses under a candidate scoring configuration"""
+
+    def __init__(self, candidate_dir: str, baseline_dir: str = 'config', workers: Optional[int] = None,
+                 chunk_size: int = 5000, latest_only: bool = True, changed_only: bool = False):
+        self.candidate_dir = candidate_dir
+        self.baseline_dir = baseline_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.latest_only = latest_only
+        self.changed_only = changed_only
+
+    def run(self, analyses: Iterable[Dict[str, Any]], deltas_path: str) -> Dict[str, Any]:
+        """Rescore a stream of analyses, writing per-domain deltas and returning histograms"""
+        start_time = time.time()
+        before_histogram = Counter()
+        after_histogram = Counter()
+        transitions = Counter()
+        rescored = 0
+        changed = 0
+        max_in_flight = self.workers * 2
+
+        with open(deltas_path, 'w', newline='') as f, \
+                ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                    initargs=(self.baseline_dir, self.candidate_dir)) as executor:
+            writer = csv.DictWriter(f, fieldnames=DELTA_COLUMNS)
+            writer.writeheader()
+
+            def collect(done):
+                nonlocal rescored, changed
+                for future in done:
+                    result = future.result()
+                    before_histogram.update(result['before'])
+                    after_histogram.update(result['after'])
+                    for row in result['deltas']:
+                        rescored += 1
+                        if row['before_grade'] != row['after_grade'] or row['delta']:
+                            changed += 1
+                            transitions[(row['before_grade'], row['after_grade'])] += 1
+                        elif self.changed_only:
+                            continue
+                        writer.writerow(row)
+
+            # Keep a bounded number of chunks in flight so the input is streamed, not loaded
+            pending = set()
+            for chunk in _chunks(analyses, self.chunk_size, self.latest_only):
+                pending.add(executor.submit(_rescore_chunk, chunk))
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                    logger.info(f"Rescored {rescored} analyses ({rescored / (time.time() - start_time):.0f}/s)")
+            collect(pending)
+
+        return {
+            'rescored': rescored,
+            'changed': changed,
+            'before': dict(before_histogram),
+            'after': dict(after_histogram),
+            'transitions': [
+                {'from': before, 'to': after, 'count': count}
+                for (before, after), count in transitions.most_common()
+            ],
+            'duration': time.time() - start_time
+        }
+
+
+def format_histograms(summary: Dict[str, Any], grade_order: List[str]) -> str:
+    """Render before/after grade histograms as a text table"""
+    lines = [f"{'grade':<6}{'before':>10}{'after':>10}{'change':>10}"]
+    for grade in grade_order:
+        before = summary['before'].get(grade, 0)
+        after = summary['after'].get(grade, 0)
+        lines.append(f"{grade:<6}{before:>10}{after:>10}{after - before:>+10}")
+    return '\n'.join(lines)
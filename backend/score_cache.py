@@ -0,0 +1,82 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+SCORE_CACHE_MAX_ENTRIES = int(os.environ.get('SCORE_CACHE_MAX_ENTRIES', '50000'))
+SCORE_CACHE_ENABLED = os.environ.get('SCORE_CACHE_ENABLED', 'true').lower() == 'true'
+
+
+class ScoreCache:
+    """Bounded LRU memo of scoring and recommendation output.
+
+    Keys are canonical feature tuples (plus the config version where the output
+    depends on it), so the many domains that share a configuration are scored once.
+    Cached values are shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = SCORE_CACHE_MAX_ENTRIES, enabled: bool = SCORE_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.evictions = 0
+
+    def get_or_compute(self, namespace: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the memoized value for (namespace, key), computing and storing it on a miss"""
+        if not self.enabled:
+            return compute()
+        cache_key = (namespace, key)
+        with self.lock:
+            value = self.entries.get(cache_key)
+            if value is not None:
+                self.entries.move_to_end(cache_key)
+                self.hits[namespace] = self.hits.get(namespace, 0) + 1
+                return value
+            self.misses[namespace] = self.misses.get(namespace, 0) + 1
+
+        value = compute()
+        with self.lock:
+            self.entries[cache_key] = value
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            namespaces = sorted(set(self.hits) | set(self.misses))
+            by_namespace = {}
+            for namespace in namespaces:
+                hits = self.hits.get(namespace, 0)
+                misses = self.misses.get(namespace, 0)
+                by_namespace[namespace] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': hits / (hits + misses) if hits + misses else 0.0
+                }
+            hits = sum(self.hits.values())
+            misses = sum(self.misses.values())
+            return {
+                'enabled': self.enabled,
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+                'evictions': self.evictions,
+                'namespaces': by_namespace
+            }
+
+
+# Global instance
+score_cache = ScoreCache()
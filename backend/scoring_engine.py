@@ -1,25 +1,73 @@
 import logging
-from typing import Dict, Any, List
-from config_loader import ConfigLoader
-from parsers import parse_dmarc_record, parse_spf_record, parse_dkim_record, analyze_mx_records
+from typing import Dict, Any, List, Mapping, Optional, Sequence
+from config_loader import ConfigLoader, ScoringPlan
+from features import DomainFeatures, FEATURE_KEYS, extract_features
+from lazy_imports import lazy_module
+from score_cache import ScoreCache, score_cache
+
+np = lazy_module('numpy')  # batch scoring only
+
+# Version of the scoring logic itself, independent of the config. Bump it whenever the same
+# records and config would score differently, so stored analyses aren't reused across the change.
+# 2: DKIM algorithm and key length come from the decoded public keys
+SCORING_LOGIC_VERSION = 2
 
 logger = logging.getLogger(__name__)
 
+# Columns accepted by ScoringEngine.score_batch (one array per column, one row per domain)
+BATCH_FEATURE_COLUMNS = (
+    'has_mx', 'mx_count', 'mx_trusted_provider', 'mx_secure',
+    'has_spf', 'spf_policy', 'spf_include', 'spf_direct_ip', 'spf_domain_records', 'spf_redirect',
+    'has_dmarc', 'dmarc_policy', 'dmarc_pct', 'dmarc_rua', 'dmarc_ruf',
+    'has_dkim', 'dkim_selector_count', 'dkim_strong_algorithm', 'dkim_key_length'
+)
+
+# Rows without DKIM key columns score as a strong 2048-bit key, extract_features' default
+BATCH_FEATURE_DEFAULTS = {
+    'dkim_strong_algorithm': True,
+    'dkim_key_length': 2048
+}
+
 class ScoringEngine:
     """Configurable scoring engine for email security analysis"""
     
-    def __init__(self, config_loader: ConfigLoader):
+    def __init__(self, config_loader: ConfigLoader, cache: Optional[ScoreCache] = None):
         self.config = config_loader
-        self.version = config_loader.scoring_structure.get('version', '1.0.0')
+        self.cache = cache if cache is not None else score_cache
+    
+    @property
+    def version(self) -> str:
+        """Version of the live scoring configuration (changes on every reload that edits it)"""
+        return self.config.version
     
-    def calculate_component_score(self, component_name: str, component_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Calculate score for a specific component"""
-        if component_name not in self.config.scoring_structure['components']:
+    def calculate_component_score(self, component_name: str, component_data: Dict[str, Any],
+                                  features: Optional[DomainFeatures] = None) -> Dict[str, Any]:
+        """Calculate score for a specific component.
+        
+        Pass the analysis's DomainFeatures to reuse records already parsed by extract_features.
+        Results are memoized by the features the component's scorer reads and the config
+        version, and are shared between callers, so treat them as read-only.
+        """
+        snapshot = self.config.snapshot
+        plan = snapshot.plan
+        if component_name not in plan.component_max_scores:
             logger.warning(f"Unknown component: {component_name}")
             return {'score': 0, 'bonus': 0, 'total': 0, 'details': {}}
         
-        component_config = self.config.scoring_structure['components'][component_name]
-        scoring_rules = self.config.get_component_rules(component_name)
+        if features is None:
+            features = extract_features(**{f'{component_name}_result': component_data})
+        if component_name not in FEATURE_KEYS:
+            return self._score_component(component_name, features, plan)
+        return self.cache.get_or_compute(
+            f'component_{component_name}',
+            (snapshot.version, features.key(component_name)),
+            lambda: self._score_component(component_name, features, plan)
+        )
+    
+    def _score_component(self, component_name: str, features: DomainFeatures, plan: ScoringPlan) -> Dict[str, Any]:
+        """Score one component from its features under a compiled plan"""
+        max_score = plan.component_max_scores[component_name]
+        scoring_rules = plan.component_rules[component_name]
         
         base_score = 0
         bonus_score = 0
@@ -27,61 +75,58 @@ class ScoringEngine:
         
         # Calculate scores based on component type
         if component_name == 'mx':
-            score_result = self._calculate_mx_score(component_data, scoring_rules)
+            score_result = self._calculate_mx_score(features, scoring_rules, plan)
         elif component_name == 'spf':
-            score_result = self._calculate_spf_score(component_data, scoring_rules)
+            score_result = self._calculate_spf_score(features, scoring_rules, plan)
         elif component_name == 'dmarc':
-            score_result = self._calculate_dmarc_score(component_data, scoring_rules)
+            score_result = self._calculate_dmarc_score(features, scoring_rules, plan)
         elif component_name == 'dkim':
-            score_result = self._calculate_dkim_score(component_data, scoring_rules)
+            score_result = self._calculate_dkim_score(features, scoring_rules, plan)
         else:
             score_result = {'base_score': 0, 'bonus_score': 0, 'details': {}}
         
         return {
             'score': score_result['base_score'],
             'bonus': score_result['bonus_score'],
-            'total': min(score_result['base_score'] + score_result['bonus_score'], component_config['max_score']),
+            'total': min(score_result['base_score'] + score_result['bonus_score'], max_score),
             'details': score_result['details']
         }
     
-    def _calculate_mx_score(self, mx_data: Dict[str, Any], rules: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _calculate_mx_score(self, features: DomainFeatures, rules: Sequence[Mapping[str, Any]], plan: ScoringPlan) -> Dict[str, Any]:
         """Calculate MX component score"""
         base_score = 0
         bonus_score = 0
         details = {}
         
-        # Analyze MX records
-        mx_analysis = analyze_mx_records(mx_data.get('records', []))
-        
         # Base score
-        if mx_data.get('has_mx', False):
-            base_score += self.config.get_rule_points('mx', 'base', 'has_mx_records')
+        if features.has_mx:
+            base_score += plan.points('mx', 'base', 'has_mx_records')
             details['base'] = {
-                'points': self.config.get_rule_points('mx', 'base', 'has_mx_records'),
+                'points': plan.points('mx', 'base', 'has_mx_records'),
                 'description': 'Basic MX record presence'
             }
         
         # Redundancy score
-        if mx_analysis['count'] >= 3:
-            points = self.config.get_rule_points('mx', 'redundancy', 'mx_count >= 3')
-        elif mx_analysis['count'] == 2:
-            points = self.config.get_rule_points('mx', 'redundancy', 'mx_count == 2')
-        elif mx_analysis['count'] == 1:
-            points = self.config.get_rule_points('mx', 'redundancy', 'mx_count == 1')
+        if features.mx_count >= 3:
+            points = plan.points('mx', 'redundancy', 'mx_count >= 3')
+        elif features.mx_count == 2:
+            points = plan.points('mx', 'redundancy', 'mx_count == 2')
+        elif features.mx_count == 1:
+            points = plan.points('mx', 'redundancy', 'mx_count == 1')
         else:
             points = 0
         
         base_score += points
         details['redundancy'] = {
             'points': points,
-            'description': f'{mx_analysis["count"]} MX records'
+            'description': f'{features.mx_count} MX records'
         }
         
         # Provider score
-        if mx_analysis['has_trusted_provider']:
-            points = self.config.get_rule_points('mx', 'provider', 'has_trusted_provider')
-        elif mx_analysis['has_provider']:
-            points = self.config.get_rule_points('mx', 'provider', 'has_provider')
+        if features.mx_trusted_provider:
+            points = plan.points('mx', 'provider', 'has_trusted_provider')
+        elif features.mx_has_provider:
+            points = plan.points('mx', 'provider', 'has_provider')
         else:
             points = 0
         
@@ -92,8 +137,8 @@ class ScoringEngine:
         }
         
         # Security score
-        if mx_analysis['secure_configuration']:
-            points = self.config.get_rule_points('mx', 'security', 'secure_configuration')
+        if features.mx_secure:
+            points = plan.points('mx', 'security', 'secure_configuration')
         else:
             points = 0
         
@@ -109,36 +154,32 @@ class ScoringEngine:
             'details': details
         }
     
-    def _calculate_spf_score(self, spf_data: Dict[str, Any], rules: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _calculate_spf_score(self, features: DomainFeatures, rules: Sequence[Mapping[str, Any]], plan: ScoringPlan) -> Dict[str, Any]:
         """Calculate SPF component score"""
         base_score = 0
         bonus_score = 0
         details = {}
         
-        if not spf_data.get('has_spf', False):
+        if not features.has_spf:
             return {'base_score': 0, 'bonus_score': 0, 'details': {}}
         
-        # Parse SPF record
-        spf_record = spf_data.get('records', [{}])[0].get('record', '')
-        spf_analysis = parse_spf_record(spf_record)
-        
         # Base score
-        base_score += self.config.get_rule_points('spf', 'base', 'has_spf_records')
+        base_score += plan.points('spf', 'base', 'has_spf_records')
         details['base'] = {
-            'points': self.config.get_rule_points('spf', 'base', 'has_spf_records'),
+            'points': plan.points('spf', 'base', 'has_spf_records'),
             'description': 'Basic SPF record presence'
         }
         
         # Policy score
-        policy = spf_analysis.get('policy', 'permissive')
+        policy = features.spf_policy
         if policy == 'reject':
-            points = self.config.get_rule_points('spf', 'policy', 'spf_policy == \'reject\'')
+            points = plan.points('spf', 'policy', 'spf_policy == \'reject\'')
         elif policy == 'softfail':
-            points = self.config.get_rule_points('spf', 'policy', 'spf_policy == \'softfail\'')
+            points = plan.points('spf', 'policy', 'spf_policy == \'softfail\'')
         elif policy == 'neutral':
-            points = self.config.get_rule_points('spf', 'policy', 'spf_policy == \'neutral\'')
+            points = plan.points('spf', 'policy', 'spf_policy == \'neutral\'')
         else:
-            points = self.config.get_rule_points('spf', 'policy', 'spf_policy == \'permissive\'')
+            points = plan.points('spf', 'policy', 'spf_policy == \'permissive\'')
         
         base_score += points
         details['policy'] = {
@@ -147,15 +188,15 @@ class ScoringEngine:
         }
         
         # Mechanisms score
-        mechanisms = spf_analysis.get('mechanisms', [])
+        mechanisms = features.spf_mechanisms
         mechanism_points = 0
         
         if 'include' in mechanisms:
-            mechanism_points += self.config.get_rule_points('spf', 'mechanisms', 'has_include_mechanisms')
+            mechanism_points += plan.points('spf', 'mechanisms', 'has_include_mechanisms')
         if 'direct_ip' in mechanisms:
-            mechanism_points += self.config.get_rule_points('spf', 'mechanisms', 'has_direct_ip')
+            mechanism_points += plan.points('spf', 'mechanisms', 'has_direct_ip')
         if 'domain_a' in mechanisms or 'domain_mx' in mechanisms:
-            mechanism_points += self.config.get_rule_points('spf', 'mechanisms', 'has_domain_records')
+            mechanism_points += plan.points('spf', 'mechanisms', 'has_domain_records')
         
         base_score += mechanism_points
         details['mechanisms'] = {
@@ -165,7 +206,7 @@ class ScoringEngine:
         
         # Security score
         if 'redirect' not in mechanisms:
-            points = self.config.get_rule_points('spf', 'security', 'no_redirect_mechanisms')
+            points = plan.points('spf', 'security', 'no_redirect_mechanisms')
         else:
             points = 0
         
@@ -181,36 +222,32 @@ class ScoringEngine:
             'details': details
         }
     
-    def _calculate_dmarc_score(self, dmarc_data: Dict[str, Any], rules: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _calculate_dmarc_score(self, features: DomainFeatures, rules: Sequence[Mapping[str, Any]], plan: ScoringPlan) -> Dict[str, Any]:
         """Calculate DMARC component score"""
         base_score = 0
         bonus_score = 0
         details = {}
         
-        if not dmarc_data.get('has_dmarc', False):
+        if not features.has_dmarc:
             return {'base_score': 0, 'bonus_score': 0, 'details': {}}
         
-        # Parse DMARC record
-        dmarc_record = dmarc_data.get('records', [{}])[0].get('record', '')
-        dmarc_analysis = parse_dmarc_record(dmarc_record)
-        
         # Base score
-        base_score += self.config.get_rule_points('dmarc', 'base', 'has_dmarc_records')
+        base_score += plan.points('dmarc', 'base', 'has_dmarc_records')
         details['base'] = {
-            'points': self.config.get_rule_points('dmarc', 'base', 'has_dmarc_records'),
+            'points': plan.points('dmarc', 'base', 'has_dmarc_records'),
             'description': 'Basic DMARC record presence'
         }
         
         # Policy score
-        policy = dmarc_analysis.get('policy', 'missing')
+        policy = features.dmarc_policy
         if policy == 'reject':
-            points = self.config.get_rule_points('dmarc', 'policy', 'dmarc_policy == \'reject\'')
+            points = plan.points('dmarc', 'policy', 'dmarc_policy == \'reject\'')
         elif policy == 'quarantine':
-            points = self.config.get_rule_points('dmarc', 'policy', 'dmarc_policy == \'quarantine\'')
+            points = plan.points('dmarc', 'policy', 'dmarc_policy == \'quarantine\'')
         elif policy == 'none':
-            points = self.config.get_rule_points('dmarc', 'policy', 'dmarc_policy == \'none\'')
+            points = plan.points('dmarc', 'policy', 'dmarc_policy == \'none\'')
         else:
-            points = self.config.get_rule_points('dmarc', 'policy', 'dmarc_policy == \'missing\'')
+            points = plan.points('dmarc', 'policy', 'dmarc_policy == \'missing\'')
         
         base_score += points
         details['policy'] = {
@@ -219,17 +256,17 @@ class ScoringEngine:
         }
         
         # Coverage score
-        percentage = dmarc_analysis.get('percentage', 0)
+        percentage = features.dmarc_pct
         if percentage is None:
             percentage = 0
         if percentage == 100:
-            points = self.config.get_rule_points('dmarc', 'coverage', 'dmarc_percentage == 100')
+            points = plan.points('dmarc', 'coverage', 'dmarc_percentage == 100')
         elif percentage >= 50:
-            points = self.config.get_rule_points('dmarc', 'coverage', 'dmarc_percentage >= 50')
+            points = plan.points('dmarc', 'coverage', 'dmarc_percentage >= 50')
         elif percentage >= 1:
-            points = self.config.get_rule_points('dmarc', 'coverage', 'dmarc_percentage >= 1')
+            points = plan.points('dmarc', 'coverage', 'dmarc_percentage >= 1')
         else:
-            points = self.config.get_rule_points('dmarc', 'coverage', 'dmarc_percentage == 0')
+            points = plan.points('dmarc', 'coverage', 'dmarc_percentage == 0')
         
         base_score += points
         details['coverage'] = {
@@ -239,10 +276,10 @@ class ScoringEngine:
         
         # Reporting score
         reporting_points = 0
-        if dmarc_analysis.get('rua'):
-            reporting_points += self.config.get_rule_points('dmarc', 'reporting', 'dmarc_rua_present')
-        if dmarc_analysis.get('ruf'):
-            reporting_points += self.config.get_rule_points('dmarc', 'reporting', 'dmarc_ruf_present')
+        if features.dmarc_rua:
+            reporting_points += plan.points('dmarc', 'reporting', 'dmarc_rua_present')
+        if features.dmarc_ruf:
+            reporting_points += plan.points('dmarc', 'reporting', 'dmarc_ruf_present')
         
         base_score += reporting_points
         details['reporting'] = {
@@ -256,29 +293,29 @@ class ScoringEngine:
             'details': details
         }
     
-    def _calculate_dkim_score(self, dkim_data: Dict[str, Any], rules: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _calculate_dkim_score(self, features: DomainFeatures, rules: Sequence[Mapping[str, Any]], plan: ScoringPlan) -> Dict[str, Any]:
         """Calculate DKIM component score"""
         base_score = 0
         bonus_score = 0
         details = {}
         
-        if not dkim_data.get('has_dkim', False):
+        if not features.has_dkim:
             return {'base_score': 0, 'bonus_score': 0, 'details': {}}
         
         # Base score - only basic DKIM record presence
-        base_score += self.config.get_rule_points('dkim', 'base', 'has_dkim_records')
+        base_score += plan.points('dkim', 'base', 'has_dkim_records')
         details['base'] = {
-            'points': self.config.get_rule_points('dkim', 'base', 'has_dkim_records'),
+            'points': plan.points('dkim', 'base', 'has_dkim_records'),
             'description': 'Basic DKIM record presence'
         }
         
         # Bonus scores - selectors, algorithm, and key length
         # Selectors score
-        selector_count = len(dkim_data.get('records', []))
+        selector_count = features.dkim_selector_count
         if selector_count > 1:
-            points = self.config.get_rule_points('dkim', 'selectors', 'dkim_selector_count > 1')
+            points = plan.points('dkim', 'selectors', 'dkim_selector_count > 1')
         elif selector_count == 1:
-            points = self.config.get_rule_points('dkim', 'selectors', 'dkim_selector_count == 1')
+            points = plan.points('dkim', 'selectors', 'dkim_selector_count == 1')
         else:
             points = 0
         
@@ -288,13 +325,12 @@ class ScoringEngine:
             'description': f'{selector_count} DKIM selectors'
         }
         
-        # Algorithm score (simplified)
-        # In a real implementation, you'd parse the DKIM records
-        algorithm = 'strong'  # Default assumption
+        # Algorithm score (weakest decodable key, see extract_features)
+        algorithm = 'strong' if features.dkim_strong_algorithm else 'weak'
         if algorithm == 'strong':
-            points = self.config.get_rule_points('dkim', 'algorithm', 'strong_algorithm')
+            points = plan.points('dkim', 'algorithm', 'strong_algorithm')
         else:
-            points = self.config.get_rule_points('dkim', 'algorithm', 'weak_algorithm')
+            points = plan.points('dkim', 'algorithm', 'weak_algorithm')
         
         bonus_score += points
         details['algorithm'] = {
@@ -302,12 +338,12 @@ class ScoringEngine:
             'description': f'DKIM algorithm: {algorithm}'
         }
         
-        # Key length score (simplified)
-        key_length = 2048  # Default assumption
+        # Key length score (shortest RSA key, see extract_features)
+        key_length = features.dkim_key_length
         if key_length >= 2048:
-            points = self.config.get_rule_points('dkim', 'key_length', 'key_length >= 2048')
+            points = plan.points('dkim', 'key_length', 'key_length >= 2048')
         else:
-            points = self.config.get_rule_points('dkim', 'key_length', 'key_length < 2048')
+            points = plan.points('dkim', 'key_length', 'key_length < 2048')
         
         bonus_score += points
         details['key_length'] = {
@@ -333,12 +369,14 @@ class ScoringEngine:
             base_score += component_score['score']
         
         # Apply bonus cap
-        max_bonus = self.config.scoring_structure['max_bonus_points']
+        snapshot = self.config.snapshot
+        plan = snapshot.plan
+        max_bonus = plan.max_bonus_points
         total_bonus = min(total_bonus, max_bonus)
-        final_score = min(total_score, self.config.scoring_structure['max_total_score'])
+        final_score = min(total_score, plan.max_total_score)
         
         # Get grade and status
-        grade_info = self.config.get_grade(final_score)
+        grade_info = dict(plan.grade_for(final_score))
         status = self.config.get_status(final_score)
         
         return {
@@ -347,8 +385,142 @@ class ScoringEngine:
             'status': status,
             'base_score': base_score,
             'bonus_points': round(total_bonus, 1),
-            'max_score': self.config.scoring_structure['max_total_score'],
+            'max_score': plan.max_total_score,
             'max_bonus': max_bonus,
             'scoring_details': component_scores,
-            'grade_info': grade_info
+            'grade_info': grade_info,
+            'config_version': snapshot.version
         }
+    
+    def batch_features(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract one score_batch feature row from mx/spf/dmarc/dkim lookup results"""
+        return extract_features(parsed_data.get('mx'), parsed_data.get('spf'),
+                                parsed_data.get('dmarc'), parsed_data.get('dkim')).batch_row()
+    
+    def score_batch(self, features: Mapping[str, Any]) -> Dict[str, 'np.ndarray']:
+        """Score N domains at once from a columnar feature table.
+        
+        features maps each name in BATCH_FEATURE_COLUMNS to an array-like of length N
+        (a dict of lists/arrays or a pandas DataFrame both work); the DKIM key columns
+        are optional. Returns per-component score/bonus/total columns plus score, grade,
+        status, base_score and bonus_points, matching calculate_component_score and
+        calculate_total_score row for row.
+        """
+        plan = self.config.plan
+        points = plan.points
+        
+        def column(name, dtype):
+            if name not in features and name in BATCH_FEATURE_DEFAULTS:
+                return np.full(size, BATCH_FEATURE_DEFAULTS[name], dtype=dtype)
+            return np.asarray(features[name], dtype=dtype)
+        
+        size = len(features['has_mx'])
+        zeros = np.zeros(size)
+        
+        # MX (redundancy, provider and security don't depend on has_mx in the scalar scorer)
+        mx_count = column('mx_count', np.int64)
+        mx_base = (
+            np.where(column('has_mx', bool), points('mx', 'base', 'has_mx_records'), 0.0)
+            + np.select([mx_count >= 3, mx_count == 2, mx_count == 1],
+                        [points('mx', 'redundancy', 'mx_count >= 3'),
+                         points('mx', 'redundancy', 'mx_count == 2'),
+                         points('mx', 'redundancy', 'mx_count == 1')], 0.0)
+            + np.select([column('mx_trusted_provider', bool), mx_count > 0],
+                        [points('mx', 'provider', 'has_trusted_provider'),
+                         points('mx', 'provider', 'has_provider')], 0.0)
+            + np.where(column('mx_secure', bool), points('mx', 'security', 'secure_configuration'), 0.0)
+        )
+        mx_bonus = zeros
+        
+        # SPF (a missing or unknown policy scores as permissive)
+        spf_policy = column('spf_policy', str)
+        spf_base = (
+            points('spf', 'base', 'has_spf_records')
+            + np.select([spf_policy == 'reject', spf_policy == 'softfail', spf_policy == 'neutral'],
+                        [points('spf', 'policy', "spf_policy == 'reject'"),
+                         points('spf', 'policy', "spf_policy == 'softfail'"),
+                         points('spf', 'policy', "spf_policy == 'neutral'")],
+                        points('spf', 'policy', "spf_policy == 'permissive'"))
+            + np.where(column('spf_include', bool), points('spf', 'mechanisms', 'has_include_mechanisms'), 0.0)
+            + np.where(column('spf_direct_ip', bool), points('spf', 'mechanisms', 'has_direct_ip'), 0.0)
+            + np.where(column('spf_domain_records', bool), points('spf', 'mechanisms', 'has_domain_records'), 0.0)
+            + np.where(column('spf_redirect', bool), 0.0, points('spf', 'security', 'no_redirect_mechanisms'))
+        )
+        spf_base = np.where(column('has_spf', bool), spf_base, 0.0)
+        spf_bonus = zeros
+        
+        # DMARC (a missing or unknown policy scores as missing)
+        dmarc_policy = column('dmarc_policy', str)
+        dmarc_pct = column('dmarc_pct', np.int64)
+        dmarc_base = (
+            points('dmarc', 'base', 'has_dmarc_records')
+            + np.select([dmarc_policy == 'reject', dmarc_policy == 'quarantine', dmarc_policy == 'none'],
+                        [points('dmarc', 'policy', "dmarc_policy == 'reject'"),
+                         points('dmarc', 'policy', "dmarc_policy == 'quarantine'"),
+                         points('dmarc', 'policy', "dmarc_policy == 'none'")],
+                        points('dmarc', 'policy', "dmarc_policy == 'missing'"))
+            + np.select([dmarc_pct == 100, dmarc_pct >= 50, dmarc_pct >= 1],
+                        [points('dmarc', 'coverage', 'dmarc_percentage == 100'),
+                         points('dmarc', 'coverage', 'dmarc_percentage >= 50'),
+                         points('dmarc', 'coverage', 'dmarc_percentage >= 1')],
+                        points('dmarc', 'coverage', 'dmarc_percentage == 0'))
+            + np.where(column('dmarc_rua', bool), points('dmarc', 'reporting', 'dmarc_rua_present'), 0.0)
+            + np.where(column('dmarc_ruf', bool), points('dmarc', 'reporting', 'dmarc_ruf_present'), 0.0)
+        )
+        dmarc_base = np.where(column('has_dmarc', bool), dmarc_base, 0.0)
+        dmarc_bonus = zeros
+        
+        # DKIM (selectors, algorithm and key length are bonus points)
+        has_dkim = column('has_dkim', bool)
+        selector_count = column('dkim_selector_count', np.int64)
+        dkim_base = np.where(has_dkim, points('dkim', 'base', 'has_dkim_records'), 0.0)
+        dkim_bonus = (
+            np.select([selector_count > 1, selector_count == 1],
+                      [points('dkim', 'selectors', 'dkim_selector_count > 1'),
+                       points('dkim', 'selectors', 'dkim_selector_count == 1')], 0.0)
+            + np.where(column('dkim_strong_algorithm', bool),
+                       points('dkim', 'algorithm', 'strong_algorithm'),
+                       points('dkim', 'algorithm', 'weak_algorithm'))
+            + np.where(column('dkim_key_length', np.int64) >= 2048,
+                       points('dkim', 'key_length', 'key_length >= 2048'),
+                       points('dkim', 'key_length', 'key_length < 2048'))
+        )
+        dkim_bonus = np.where(has_dkim, dkim_bonus, 0.0)
+        
+        result = {}
+        total_score = zeros
+        total_bonus = zeros
+        base_score = zeros
+        for name, base, bonus in (('mx', mx_base, mx_bonus), ('spf', spf_base, spf_bonus),
+                                  ('dmarc', dmarc_base, dmarc_bonus), ('dkim', dkim_base, dkim_bonus)):
+            total = np.minimum(base + bonus, plan.component_max_scores[name])
+            result[f'{name}_score'] = base
+            result[f'{name}_bonus'] = bonus
+            result[f'{name}_total'] = total
+            total_score = total_score + total
+            total_bonus = total_bonus + bonus
+            base_score = base_score + base
+        
+        final_score = np.minimum(total_score, plan.max_total_score)
+        
+        # Grades: highest threshold <= score, falling back to F below the lowest one
+        grade_index = np.searchsorted(np.asarray(plan.grade_thresholds), final_score, side='right') - 1
+        grade_names = np.asarray([grade['grade'] for grade in plan.grades] + ['F'], dtype=object)
+        grade_index[grade_index < 0] = len(plan.grades)
+        
+        result['score'] = np.round(final_score, 1)
+        result['grade'] = grade_names[grade_index]
+        result['status'] = np.select(
+            [final_score >= 90, final_score >= 75, final_score >= 50, final_score >= 25],
+            ['Excellent', 'Good', 'Fair', 'Poor'], 'Very Poor'
+        ).astype(object)
+        result['base_score'] = base_score
+        result['bonus_points'] = np.round(np.minimum(total_bonus, plan.max_bonus_points), 1)
+        return result
+    
+    def score_batch_rows(self, rows: List[Dict[str, Any]]) -> Dict[str, 'np.ndarray']:
+        """score_batch for a list of batch_features rows"""
+        return self.score_batch({
+            name: [row.get(name, BATCH_FEATURE_DEFAULTS.get(name)) for row in rows]
+            for name in BATCH_FEATURE_COLUMNS
+        })
@@ -0,0 +1,175 @@
+import os
+import sys
+import json
+import queue
+import random
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Per-event sampling rates, e.g. "request=0.1,mx_records=0.01"
+LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', '')
+LOG_SAMPLE_DEFAULT = float(os.environ.get('LOG_SAMPLE_DEFAULT', '1.0'))
+
+# Verbose payload logging is opt-in per domain or request ID
+LOG_VERBOSE_DOMAINS = os.environ.get('LOG_VERBOSE_DOMAINS', '')
+LOG_VERBOSE_REQUEST_IDS = os.environ.get('LOG_VERBOSE_REQUEST_IDS', '')
+
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+
+
+def _parse_csv_set(value: str) -> Set[str]:
+    """Parse a comma separated environment value into a set"""
+    return {item.strip().lower() for item in value.split(',') if item.strip()}
+
+
+def _parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse 'event=rate' pairs into a rate map"""
+    rates = {}
+    for pair in spec.split(','):
+        if '=' not in pair:
+            continue
+        event, rate = pair.split('=', 1)
+        try:
+            rates[event.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            logger.warning(f"Ignoring invalid log sample rate: {pair}")
+    return rates
+
+
+# Verbose targets are process-wide: every StructuredLogger reads and updates these sets
+_verbose_domains = _parse_csv_set(LOG_VERBOSE_DOMAINS)
+_verbose_request_ids = _parse_csv_set(LOG_VERBOSE_REQUEST_IDS)
+
+
+def get_request_id(headers) -> Optional[str]:
+    """Extract request ID from X-Request-ID or the Cloud Run trace header"""
+    request_id = headers.get('X-Request-ID')
+    if request_id:
+        return request_id
+    trace = headers.get('X-Cloud-Trace-Context')
+    if trace:
+        return trace.split('/', 1)[0]
+    return None
+
+
+class LazyFields:
+    """Log message whose fields are only rendered when a handler formats it"""
+
+    __slots__ = ('event', 'fields')
+
+    def __init__(self, event: str, fields: Dict[str, Any]):
+        self.event = event
+        self.fields = fields
+
+    def __str__(self) -> str:
+        rendered = {'event': self.event}
+        for key, value in self.fields.items():
+            rendered[key] = value() if callable(value) else value
+        return json.dumps(rendered, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that never blocks the request thread and defers formatting"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the listener thread, not here
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class StructuredLogger:
+    """Structured event logger with per-event sampling and lazy field rendering"""
+
+    def __init__(self, name: str, sample_rates: Optional[Dict[str, float]] = None,
+                 default_rate: float = LOG_SAMPLE_DEFAULT):
+        self.logger = logging.getLogger(name)
+        self.sample_rates = sample_rates if sample_rates is not None else _parse_sample_rates(LOG_SAMPLE_RATES)
+        self.default_rate = default_rate
+
+    def should_sample(self, event: str) -> bool:
+        """Decide whether an occurrence of an event is emitted"""
+        rate = self.sample_rates.get(event, self.default_rate)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        return random.random() < rate
+
+    def event(self, name: str, level: int = logging.INFO, force: bool = False, **fields):
+        """Emit a structured event; callable field values are rendered lazily"""
+        if not self.logger.isEnabledFor(level):
+            return
+        if not force and not self.should_sample(name):
+            return
+        self.logger.log(level, '%s', LazyFields(name, fields))
+
+    def is_verbose(self, domain: Optional[str] = None, request_id: Optional[str] = None) -> bool:
+        """Check whether verbose payload logging is enabled for a domain or request"""
+        if domain and domain.lower() in _verbose_domains:
+            return True
+        if request_id and request_id.lower() in _verbose_request_ids:
+            return True
+        return False
+
+    def payload(self, name: str, domain: Optional[str] = None, request_id: Optional[str] = None, **fields):
+        """Log a full result payload, only for opted-in domains or request IDs"""
+        if self.is_verbose(domain, request_id):
+            self.event(name, logging.INFO, force=True, domain=domain, request_id=request_id, **fields)
+
+    def set_verbose(self, domain: Optional[str] = None, request_id: Optional[str] = None, enabled: bool = True):
+        """Enable or disable verbose payload logging at runtime, for every StructuredLogger"""
+        for value, target in ((domain, _verbose_domains), (request_id, _verbose_request_ids)):
+            if not value:
+                continue
+            if enabled:
+                target.add(value.lower())
+            else:
+                target.discard(value.lower())
+
+    def get_verbose_targets(self) -> Dict[str, Any]:
+        """Get current verbose logging targets"""
+        return {
+            'domains': sorted(_verbose_domains),
+            'request_ids': sorted(_verbose_request_ids)
+        }
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def setup_logging(level: int = logging.INFO) -> Optional[QueueListener]:
+    """Route root logging through a bounded queue drained by a background thread"""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return _listener
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter('%(levelname)s:%(name)s:%(message)s'))
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(NonBlockingQueueHandler(log_queue))
+
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _listener
@@ -0,0 +1,71 @@
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', 'true').lower() == 'true'
+WARMUP_DELAY = float(os.environ.get('WARMUP_DELAY', '0.5'))  # seconds, lets the server start listening first
+
+
+class Warmup:
+    """Runs deferred start-up work (heavy imports, connections, config) in a background thread"""
+
+    def __init__(self):
+        self.tasks: List[Tuple[str, Callable[[], Any]]] = []
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.started_at = None
+        self.completed_at = None
+        self._done = threading.Event()
+        self._thread = None
+
+    def add(self, name: str, task: Callable[[], Any]):
+        """Register a warm-up task; tasks run in the order they were added"""
+        self.tasks.append((name, task))
+
+    def start(self, delay: float = WARMUP_DELAY):
+        """Start warming up in a daemon thread"""
+        if not WARMUP_ENABLED or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(delay,), name='warmup', daemon=True)
+        self._thread.start()
+
+    def _run(self, delay: float):
+        if delay > 0:
+            time.sleep(delay)
+        self.started_at = time.time()
+        for name, task in self.tasks:
+            start_time = time.perf_counter()
+            try:
+                task()
+            except Exception as e:
+                self.errors[name] = str(e)
+                logger.error(f"Warm-up task {name} failed: {e}")
+            self.timings[name] = round((time.perf_counter() - start_time) * 1000, 1)
+        self.completed_at = time.time()
+        self._done.set()
+        logger.info(f"Warm-up complete in {self.completed_at - self.started_at:.2f}s: {self.timings}")
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+    @property
+    def status(self) -> str:
+        if self._done.is_set():
+            return 'complete'
+        return 'running' if self.started_at else 'pending'
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'status': self.status,
+            'timings_ms': dict(self.timings),
+            'errors': dict(self.errors),
+            'duration': (self.completed_at - self.started_at) if self.completed_at else None
+        }
+
+
+# Global instance
+warmup = Warmup()